@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        if getattr(settings, 'STREAMLINK_PRELOAD', False):
+            from .services.streamlink import preload
+            preload()
+        # Last-known-good upstream data saved by previous processes, for outages right after a restart
+        from .services.lastknowngood import get_lkg_store
+        store = get_lkg_store()
+        if store is not None:
+            store.load()
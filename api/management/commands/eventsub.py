@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.errors import TwitchAPIError
+from api.services.eventsub import EventSubService, mark_subscribed
+from api.services.streams import TwitchStreamService
+
+
+class Command(BaseCommand):
+    help = 'Manage Twitch EventSub subscriptions that keep cached live data fresh'
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest='action', required=True)
+        subcommands.add_parser('list', help='List existing subscriptions')
+        sync = subcommands.add_parser('sync', help='Subscribe channels to online/offline/update events')
+        sync.add_argument('--channels', default='', help='Comma-separated channel logins')
+        sync.add_argument('--top', type=int, default=0, help='Also subscribe the current top N live channels')
+        delete = subcommands.add_parser('delete', help='Delete subscriptions')
+        delete.add_argument('ids', nargs='*', help='Subscription ids')
+        delete.add_argument('--failed', action='store_true', help='Delete every subscription that is not enabled')
+
+    def handle(self, *args, **options):
+        service = EventSubService()
+        try:
+            getattr(self, f"handle_{options['action']}")(service, options)
+        except TwitchAPIError as e:
+            raise CommandError(str(e))
+
+    def handle_list(self, service, options):
+        for subscription in service.list_subscriptions():
+            condition = subscription.get('condition', {})
+            self.stdout.write(f"{subscription['id']}  {subscription['type']:15} {subscription['status']:40} "
+                              f"broadcaster={condition.get('broadcaster_user_id')}")
+
+    def handle_sync(self, service, options):
+        logins = [login.strip().lower() for login in options['channels'].split(',') if login.strip()]
+        if options['top']:
+            snapshot = TwitchStreamService().get_live_snapshot(limit=options['top'])
+            logins.extend(login for login in snapshot if login not in logins)
+        if not logins:
+            raise CommandError('Nothing to subscribe: pass --channels and/or --top')
+
+        ids = service.broadcaster_ids(logins)
+        missing = sorted(set(logins) - ids.keys())
+        if missing:
+            self.stderr.write(f"Unknown channels skipped: {', '.join(missing)}")
+        summary = service.sync(list(ids.values()))
+        # Their live status may now be cached for EVENTSUB_STREAM_CACHE_TTL
+        mark_subscribed(ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(ids)} channels: {summary['created']} subscriptions created, {summary['existing']} already present"
+        ))
+
+    def handle_delete(self, service, options):
+        ids = list(options['ids'])
+        if options['failed']:
+            ids.extend(s['id'] for s in service.list_subscriptions() if s.get('status') != 'enabled')
+        for subscription_id in ids:
+            service.delete_subscription(subscription_id)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {len(ids)} subscriptions"))
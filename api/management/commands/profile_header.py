@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import profiling
+
+
+class Command(BaseCommand):
+    help = 'Print an X-Profile header value that profiles one request to the given path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Request path, e.g. /api/v1/channels/<login>/vods/')
+        parser.add_argument('--ttl', type=float, default=300.0,
+                            help='Seconds the header stays valid (default: 300)')
+
+    def handle(self, *args, **options):
+        if not settings.PROFILE_SECRET:
+            raise CommandError('Set PROFILE_SECRET to enable profiling by header')
+        self.stdout.write(f"X-Profile: {profiling.sign(options['path'], options['ttl'])}")
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.resolver import ResolverDaemon
+
+
+class Command(BaseCommand):
+    help = 'Run the Streamlink resolver daemon that web workers reach over a Unix socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.STREAMLINK_RESOLVER_SOCKET,
+                            help='Unix socket path (default: STREAMLINK_RESOLVER_SOCKET)')
+        parser.add_argument('--workers', type=int, default=settings.STREAMLINK_RESOLVER_WORKERS,
+                            help='Resolver processes, each with a warm Streamlink session')
+        parser.add_argument('--result-ttl', type=float, default=settings.STREAMLINK_RESOLVER_RESULT_TTL,
+                            help='Seconds a resolution is reused for repeated requests')
+
+    def handle(self, *args, **options):
+        if not options['socket']:
+            raise CommandError('Pass --socket or set STREAMLINK_RESOLVER_SOCKET')
+        daemon = ResolverDaemon(options['socket'], options['workers'], options['result_ttl'])
+        self.stdout.write(f"Streamlink resolver on {options['socket']} with {options['workers']} workers")
+        daemon.serve_forever()
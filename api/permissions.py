@@ -0,0 +1,13 @@
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+from api.services.ratelimit import has_api_key
+
+
+class IsOperator(BasePermission):
+    """Internal state (credential labels, upstream error messages): API key holders, or anyone under DEBUG"""
+
+    message = 'An API key is required'
+
+    def has_permission(self, request, view):
+        return settings.DEBUG or has_api_key(request)
@@ -0,0 +1,35 @@
+import json
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets EventSource clients (Accept: text/event-stream) through content negotiation
+
+    The events themselves are written by a streaming response; this only renders the
+    JSON error bodies returned before a stream starts.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode(self.charset)
+
+
+class PlaylistRenderer(BaseRenderer):
+    """Lets HLS players (Accept: application/vnd.apple.mpegurl) through content negotiation
+
+    Playlists are returned as ready-made responses; this only renders error bodies, as JSON.
+    """
+
+    media_type = 'application/vnd.apple.mpegurl'
+    format = 'm3u8'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode(self.charset)
@@ -1,4 +1,20 @@
 from rest_framework import serializers
+from api.services import profiling
+
+class SparseFieldsMixin:
+    """List response serializer whose items can be trimmed with fields={...}"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            item_fields = self.fields['data'].child.fields
+            for name in set(item_fields) - set(fields):
+                item_fields.pop(name)
+
+    @property
+    def data(self):
+        with profiling.stage('serialize'):
+            return super().data
 
 class StreamThumbnailSerializer(serializers.Serializer):
     small = serializers.URLField()
@@ -26,7 +42,7 @@ class LiveStreamSerializer(serializers.Serializer):
     stream_url = serializers.URLField()
     profile_image_url = serializers.URLField(allow_null=True)
 
-class StreamResponseSerializer(serializers.Serializer):
+class StreamResponseSerializer(SparseFieldsMixin, serializers.Serializer):
     """Serializer for stream response with pagination"""
     data = LiveStreamSerializer(many=True)
     pagination = serializers.DictField(child=serializers.CharField(allow_null=True))
@@ -39,9 +55,21 @@ class CategorySerializer(serializers.Serializer):
     igdb_id = serializers.CharField(allow_blank=True)
     thumbnail = StreamThumbnailSerializer()
 
-class CategoryResponseSerializer(serializers.Serializer):
+class CategoryLanguageSerializer(serializers.Serializer):
+    """Serializer for one language's share of a category's live viewers"""
+    language = serializers.CharField()
+    viewer_count = serializers.IntegerField()
+    stream_count = serializers.IntegerField()
+
+class TopCategorySerializer(CategorySerializer):
+    """Serializer for a top category with its live totals (null until first computed)"""
+    viewer_count = serializers.IntegerField(allow_null=True)
+    stream_count = serializers.IntegerField(allow_null=True)
+    languages = CategoryLanguageSerializer(many=True, allow_null=True)
+
+class CategoryResponseSerializer(SparseFieldsMixin, serializers.Serializer):
     """Serializer for category response with pagination"""
-    data = CategorySerializer(many=True)
+    data = TopCategorySerializer(many=True)
     pagination = serializers.DictField(child=serializers.CharField(allow_null=True))
 
 class SidebarStreamSerializer(serializers.Serializer):
@@ -53,7 +81,7 @@ class SidebarStreamSerializer(serializers.Serializer):
     stream_url = serializers.URLField()
     hls_url = serializers.URLField(required=False, allow_null=True) 
 
-class SidebarResponseSerializer(serializers.Serializer):
+class SidebarResponseSerializer(SparseFieldsMixin, serializers.Serializer):
     """Serializer for sidebar stream response with pagination"""
     data = SidebarStreamSerializer(many=True)
     pagination = serializers.DictField(child=serializers.CharField(allow_null=True))
@@ -83,22 +111,22 @@ class VODSerializer(serializers.Serializer):
     type = serializers.CharField()
     thumbnail = StreamThumbnailSerializer()
 
-class SearchChannelResponseSerializer(serializers.Serializer):
+class SearchChannelResponseSerializer(SparseFieldsMixin, serializers.Serializer):
     """Serializer for channel search response"""
     data = ChannelSerializer(many=True)
     pagination = serializers.DictField(child=serializers.CharField(allow_null=True))
 
-class SearchGameResponseSerializer(serializers.Serializer):
+class SearchGameResponseSerializer(SparseFieldsMixin, serializers.Serializer):
     """Serializer for game search response"""
     data = CategorySerializer(many=True)
     pagination = serializers.DictField(child=serializers.CharField(allow_null=True))
 
-class ChannelVODResponseSerializer(serializers.Serializer):
+class ChannelVODResponseSerializer(SparseFieldsMixin, serializers.Serializer):
     """Serializer for channel VOD response"""
     data = VODSerializer(many=True)
     pagination = serializers.DictField(child=serializers.CharField(allow_null=True))
 
-class ChannelLiveResponseSerializer(serializers.Serializer):
+class ChannelLiveResponseSerializer(SparseFieldsMixin, serializers.Serializer):
     """Serializer for channel live stream response"""
     data = LiveStreamSerializer(many=True)
     pagination = serializers.DictField(child=serializers.CharField(allow_null=True))
\ No newline at end of file
@@ -4,6 +4,7 @@ from .streams import TwitchStreamService
 from .channels import TwitchChannelService
 from .categories import TwitchCategoryService
 from .videos import TwitchVideoService
+from .streamlink import StreamlinkService
 
 __all__ = [
     'TwitchAPIError',
@@ -0,0 +1,119 @@
+import threading
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, Optional
+from django.conf import settings
+from . import metrics
+
+# Service levels a request can be admitted at, from full service to no upstream work at all
+NORMAL = 'normal'
+# Admitted, but optional enrichment (Streamlink HLS lookups) is dropped
+DEGRADED = 'degraded'
+# Shed: answered from stale data only, without any upstream call
+STALE_ONLY = 'stale_only'
+
+_level: ContextVar[str] = ContextVar('admission_level', default=NORMAL)
+
+
+class AdmissionController:
+    """Concurrency limit for one endpoint with a short, bounded wait queue
+
+    Requests beyond `limit` wait at most `queue_timeout` seconds in a queue of `queue_size`;
+    anything beyond that is shed. Requests admitted while the endpoint is above `degrade_at`
+    in-flight requests, or after queueing, run degraded.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float, degrade_at: int):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.degrade_at = degrade_at
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Service level to run the request at, or None if it was shed; admitted requests must release()"""
+        wait = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                level = DEGRADED if self.active > self.degrade_at else NORMAL
+                metrics.increment(f"admission.{self.name}.{'degraded' if level == DEGRADED else 'admitted'}")
+                return level
+
+            if self.waiting >= self.queue_size or wait <= 0:
+                metrics.increment(f"admission.{self.name}.shed")
+                return None
+
+            self.waiting += 1
+            metrics.increment(f"admission.{self.name}.queued")
+            try:
+                expires = time.monotonic() + wait
+                while self.active >= self.limit:
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        metrics.increment(f"admission.{self.name}.shed")
+                        return None
+                    self._cond.wait(remaining)
+                self.active += 1
+                # Having had to queue means the endpoint is saturated
+                metrics.increment(f"admission.{self.name}.degraded")
+                return DEGRADED
+            finally:
+                self.waiting -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def status(self) -> Dict:
+        return {'active': self.active, 'waiting': self.waiting, 'limit': self.limit, 'queue_size': self.queue_size}
+
+
+_controllers: Dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(name: str) -> AdmissionController:
+    """Controller for an endpoint (view class name), configured from ADMISSION_* settings"""
+    with _controllers_lock:
+        controller = _controllers.get(name)
+        if controller is None:
+            limit = getattr(settings, 'ADMISSION_LIMITS', {}).get(name, getattr(settings, 'ADMISSION_DEFAULT_LIMIT', 16))
+            controller = AdmissionController(
+                name,
+                limit,
+                getattr(settings, 'ADMISSION_QUEUE_SIZE', 8),
+                getattr(settings, 'ADMISSION_QUEUE_TIMEOUT', 1.0),
+                int(limit * getattr(settings, 'ADMISSION_DEGRADE_RATIO', 0.75))
+            )
+            _controllers[name] = controller
+        return controller
+
+
+def controller_states() -> Dict[str, Dict]:
+    """Snapshot of every endpoint's admission state, for the health endpoint"""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return {controller.name: controller.status() for controller in sorted(controllers, key=lambda c: c.name)}
+
+
+def start(level: str) -> Token:
+    return _level.set(level)
+
+
+def reset(token: Token) -> None:
+    _level.reset(token)
+
+
+def degraded() -> bool:
+    """True when the current request must skip optional enrichment"""
+    return _level.get() != NORMAL
+
+
+def stale_only() -> bool:
+    """True when the current request was shed and may only use stale data"""
+    return _level.get() == STALE_ONLY
@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from . import deadline, metrics
+from .cache import KEY_PREFIX
+from .errors import TwitchAPIError
+
+logger = logging.getLogger(__name__)
+
+
+class AppTokenManager:
+    """App access token from the client-credentials flow, shared by all workers through the cache
+
+    Tokens are refreshed well before they expire. One worker refreshes under a cache lock while
+    the others keep using the current token. With no client secret configured, the static
+    TWITCH_ACCESS_TOKEN is used as before.
+    """
+
+    TOKEN_TIMEOUT = 10
+    LOCK_TIMEOUT = 30
+    WAIT_FOR_REFRESH = 5.0
+
+    def __init__(self, client_id: str, client_secret: Optional[str] = None, static_token: Optional[str] = None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.static_token = static_token
+        self.cache_key = f"{KEY_PREFIX}:apptoken:{client_id}"
+        self.lock_key = f"{self.cache_key}:lock"
+        self._local: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    @property
+    def managed(self) -> bool:
+        return bool(self.client_secret)
+
+    def get_token(self) -> str:
+        """Current token, refreshing it first if it is inside its refresh window"""
+        if not self.managed:
+            return self.static_token
+        entry = self._local
+        if entry and time.time() < entry['refresh_at']:
+            return entry['access_token']
+
+        with self._lock:
+            entry = cache.get(self.cache_key)
+            if entry and time.time() < entry['refresh_at']:
+                self._local = entry
+                return entry['access_token']
+            return self._refresh(entry)
+
+    def invalidate(self, rejected_token: str) -> str:
+        """Single-flight re-auth after a 401: only the first caller with the rejected token refreshes"""
+        if not self.managed:
+            return self.static_token
+        with self._lock:
+            entry = cache.get(self.cache_key)
+            if entry and entry['access_token'] != rejected_token:
+                # Someone already replaced the token
+                self._local = entry
+                return entry['access_token']
+            logger.warning("Twitch rejected the app access token, re-authenticating")
+            metrics.increment('auth.token_rejected')
+            # Wait for a token other than the rejected one if another worker is refreshing
+            return self._refresh(entry or {'access_token': rejected_token}, rejected=True)
+
+    def _refresh(self, current: Optional[Dict], rejected: bool = False) -> str:
+        """Refresh under the shared lock; other workers keep using a still-valid token meanwhile
+
+        A rejected current token is never handed out again, even before it expires.
+        """
+        if cache.add(self.lock_key, os.getpid(), self.LOCK_TIMEOUT):
+            try:
+                entry = self._request_token()
+                cache.set(self.cache_key, entry, max(1, int(entry['expires_at'] - time.time())))
+                self._local = entry
+                return entry['access_token']
+            finally:
+                cache.delete(self.lock_key)
+
+        if current and not rejected and time.time() < current['expires_at']:
+            self._local = current
+            return current['access_token']
+
+        # No usable token and another worker is refreshing: wait for it
+        waited_until = time.monotonic() + self.WAIT_FOR_REFRESH
+        while time.monotonic() < waited_until:
+            time.sleep(0.05)
+            entry = cache.get(self.cache_key)
+            if entry and entry is not current and time.time() < entry['expires_at']:
+                if current is None or entry['access_token'] != current['access_token']:
+                    self._local = entry
+                    return entry['access_token']
+        raise TwitchAPIError("Timed out waiting for app access token refresh", 503)
+
+    def _request_token(self) -> Dict:
+        url = f"{settings.TWITCH_OAUTH_URL.rstrip('/')}/token"
+        data = {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'grant_type': 'client_credentials'
+        }
+        try:
+            logger.info(f"Requesting app access token for client {self.client_id}")
+            response = requests.post(url, data=data, timeout=deadline.timeout_for(self.TOKEN_TIMEOUT))
+        except requests.exceptions.RequestException as e:
+            logger.error(f"App access token request failed: {e}")
+            raise TwitchAPIError(f"Failed to obtain app access token: {str(e)}", 503)
+
+        if response.status_code != 200:
+            logger.error(f"App access token request returned {response.status_code}: {response.text}")
+            raise TwitchAPIError(f"Failed to obtain app access token: HTTP {response.status_code}", 503)
+
+        payload = response.json()
+        lifetime = float(payload.get('expires_in', 3600))
+        issued_at = time.time()
+        # Refresh with a tenth of the lifetime (at least the configured margin) to spare
+        margin = max(getattr(settings, 'TWITCH_TOKEN_REFRESH_MARGIN', 300), lifetime * 0.1)
+        metrics.increment('auth.token_refreshed')
+        return {
+            'access_token': payload['access_token'],
+            'expires_at': issued_at + lifetime,
+            'refresh_at': issued_at + max(lifetime - margin, lifetime / 2)
+        }
+
+
+_managers: Dict[Tuple[str, Optional[str]], AppTokenManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(client_id: str, client_secret: Optional[str] = None,
+                      static_token: Optional[str] = None) -> AppTokenManager:
+    """Process-wide token manager per client credential"""
+    key = (client_id, client_secret)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = AppTokenManager(client_id, client_secret, static_token)
+            _managers[key] = manager
+        return manager
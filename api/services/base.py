@@ -1,52 +1,249 @@
 import requests
 import logging
-from typing import Dict, Optional
+import time
+from typing import Dict, Optional, Set
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from . import admission, batching, deadline, metrics, profiling
+from .cache import get_stale, make_key, mark_stale_served, set_stale
+from .cassette import get_cassette, helix_key, record_response, replay_response
+from .credentials import Credential, get_credential_pool
 from .errors import TwitchAPIError
+from .resilience import backoff_delay, get_breaker, get_retry_budget, hedged_call
 
 logger = logging.getLogger(__name__)
 
 class TwitchAPIBaseService:
     """Base service class for Twitch API configuration and request handling"""
-    
+
     BASE_URL = 'https://api.twitch.tv/helix'
-    
+    REQUEST_TIMEOUT = 30
+    # Timeouts and connection errors surface with no status code
+    RETRYABLE_STATUS_CODES = {None, 429, 500, 502, 503, 504}
+    # Hot datasets whose first pages are kept in the durable last-known-good store
+    DURABLE_ENDPOINTS = {'streams', 'games/top', 'users'}
+
     def __init__(self):
         # Validate required settings
-        if not all([settings.TWITCH_CLIENT_ID, settings.TWITCH_ACCESS_TOKEN]):
+        if not settings.TWITCH_CLIENT_ID or not (settings.TWITCH_CLIENT_SECRET or settings.TWITCH_ACCESS_TOKEN):
             raise ImproperlyConfigured(
-                "TWITCH_CLIENT_ID and TWITCH_ACCESS_TOKEN must be set in environment variables"
+                "TWITCH_CLIENT_ID and either TWITCH_CLIENT_SECRET or TWITCH_ACCESS_TOKEN must be set in environment variables"
             )
-        
-        self.client_id = settings.TWITCH_CLIENT_ID
-        self.access_token = settings.TWITCH_ACCESS_TOKEN
-        self.headers = {
-            'Client-ID': self.client_id,
-            'Authorization': f'Bearer {self.access_token}',
+
+        self.base_url = getattr(settings, 'TWITCH_API_BASE_URL', self.BASE_URL).rstrip('/')
+        # Helix calls are spread across every configured Twitch app (TWITCH_CREDENTIALS)
+        self.credentials = get_credential_pool()
+
+    @staticmethod
+    def _wants(fields: Optional[Set[str]], name: str) -> bool:
+        """Whether a response field (and the work to produce it) was requested; None requests all"""
+        return fields is None or name in fields
+
+    def _headers(self, client_id: str, access_token: str) -> Dict:
+        return {
+            'Client-ID': client_id,
+            'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
         }
-    
-    def _make_request(self, endpoint: str, params: Optional[Dict] = None, method: str = 'GET') -> Dict:
-        """Make authenticated request to Twitch API with comprehensive error handling"""
-        url = f"{self.BASE_URL}/{endpoint.lstrip('/')}"
-        
+
+    def _make_request(self, endpoint: str, params: Optional[Dict] = None, method: str = 'GET',
+                      background: bool = False) -> Dict:
+        """Make authenticated request to Twitch API behind a per-endpoint circuit breaker
+
+        background=True is for traffic no user waits on (crawls): the response is neither kept for
+        nor answered from stale data, and it has its own breaker and no share of the retry budget,
+        so its failures and retries cannot fail or starve user requests to the same endpoint.
+        """
+        endpoint = endpoint.strip('/')
+        method = method.upper()
+        memo = batching.current()
+        with profiling.stage(f"helix.{endpoint}"):
+            if memo is not None and method == 'GET':
+                # Inside a batch: identical lookups from sibling sub-requests share one call
+                return memo.call(batching.request_key(endpoint, params),
+                                 lambda: self._call_helix(endpoint, params, method, background))
+            return self._call_helix(endpoint, params, method, background)
+
+    def _call_helix(self, endpoint: str, params: Optional[Dict], method: str, background: bool = False) -> Dict:
+        breaker = get_breaker(f"helix:{endpoint}:background" if background else f"helix:{endpoint}")
+        keep_stale = method == 'GET' and not background
+        stale_key = make_key('helix', method, endpoint, params) if keep_stale else None
+        if admission.stale_only():
+            # Shed by admission control: answer from stale data without calling Twitch, or 503
+            return self._serve_stale(stale_key, "Server is overloaded, try again shortly")
+        retry_budget = None if background else get_retry_budget()
+        if retry_budget is not None:
+            retry_budget.record_call()
+        metrics.increment('helix.calls')
+
+        attempt = 0
+        # Client IDs re-authenticated during this call (with the token they got), and those it moved away from
+        reauthenticated: Dict[str, str] = {}
+        switched = set()
+        while True:
+            if not breaker.allow_request():
+                logger.warning(f"Circuit open for Twitch API endpoint '{endpoint}', failing fast")
+                return self._serve_stale(stale_key, f"Twitch API endpoint '{endpoint}' is temporarily unavailable")
+
+            credential = access_token = None
+            try:
+                credential = self.credentials.acquire(exclude=switched)
+                try:
+                    access_token = reauthenticated.get(credential.client_id) or credential.token_manager.get_token()
+                    data = self._execute_request(endpoint, params, method, credential, access_token)
+                finally:
+                    self.credentials.release(credential)
+                self.credentials.record_success(credential)
+                break
+            except TwitchAPIError as e:
+                if credential is not None and self._switch_credential(credential, e, access_token, reauthenticated, switched):
+                    # Only this credential is spent or broken, which says nothing about Twitch
+                    breaker.release()
+                    continue
+
+                # Client errors mean Twitch answered; only outages should trip the breaker
+                current = deadline.current()
+                if current is not None and current.expired():
+                    # Our own budget ran out, which says nothing about upstream health
+                    breaker.release()
+                elif e.status_code is None or e.status_code == 429 or e.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+                if e.status_code == 401 and credential is not None and credential.client_id not in reauthenticated \
+                        and credential.token_manager.managed:
+                    # Token expired or was revoked: re-authenticate once and replay the call
+                    reauthenticated[credential.client_id] = credential.token_manager.invalidate(access_token)
+                    continue
+
+                delay = self._retry_delay(e, method, attempt)
+                if delay is None:
+                    return self._stale_after_failure(stale_key, e)
+                if retry_budget is not None and not retry_budget.try_spend():
+                    metrics.increment('helix.retry_budget_exhausted')
+                    logger.warning(f"Retry budget exhausted, not retrying {method} {endpoint}")
+                    return self._stale_after_failure(stale_key, e)
+
+            attempt += 1
+            metrics.increment('helix.retries')
+            metrics.increment(f"helix.{endpoint}.retries")
+            logger.info(f"Retrying Twitch API request {method} {endpoint} in {delay:.2f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+
+        breaker.record_success()
+        if stale_key:
+            durable = endpoint in self.DURABLE_ENDPOINTS and 'after' not in (params or {})
+            set_stale(stale_key, data, durable=durable)
+        return data
+
+    def _switch_credential(self, credential: Credential, error: TwitchAPIError, access_token: Optional[str],
+                           reauthenticated: Dict[str, str], switched: Set[str]) -> bool:
+        """Book a failure that belongs to one credential; True if the call should move to another one"""
+        if error.status_code == 429 and access_token is not None:
+            self.credentials.exhaust(credential, error.retry_after)
+        elif access_token is None or (error.status_code == 401 and (
+                credential.client_id in reauthenticated or not credential.token_manager.managed)):
+            # No token could be obtained, or Twitch rejects a fresh one
+            self.credentials.record_failure(credential, error)
+        else:
+            return False
+
+        # Only exclude the credential once the call moves elsewhere: with no other credential left,
+        # a backoff retry has to be able to pick this one up again when it is back in rotation
+        if not self.credentials.available(exclude=switched | {credential.client_id}):
+            return False
+        switched.add(credential.client_id)
+        logger.info(f"Moving Twitch API request off credential {credential.label} after: {error}")
+        metrics.increment('credentials.failover')
+        return True
+
+    def _retry_delay(self, error: TwitchAPIError, method: str, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a failed call, or None if it must not be retried"""
+        if method != 'GET' or attempt >= getattr(settings, 'TWITCH_RETRY_MAX_ATTEMPTS', 2):
+            return None
+        if error.status_code not in self.RETRYABLE_STATUS_CODES:
+            return None
+
+        delay = backoff_delay(
+            attempt,
+            getattr(settings, 'TWITCH_RETRY_BASE_DELAY', 0.2),
+            getattr(settings, 'TWITCH_RETRY_MAX_DELAY', 2.0)
+        )
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+
+        # Waiting past the request deadline (or an unreasonable Retry-After) is pointless
+        limit = getattr(settings, 'TWITCH_RETRY_MAX_WAIT', 5.0)
+        current = deadline.current()
+        if current is not None:
+            limit = min(limit, current.remaining())
+        return delay if delay < limit else None
+
+    def _stale_after_failure(self, stale_key: Optional[str], error: TwitchAPIError) -> Dict:
+        """Answer a GET that failed because of an upstream outage from its last good response"""
+        outage = error.status_code is None or error.status_code == 429 or error.status_code >= 500
+        stale = get_stale(stale_key) if stale_key and outage else None
+        if stale is None:
+            raise error
+        logger.warning(f"Twitch API request failed ({error}), serving stale data for {stale_key}")
+        metrics.increment('helix.stale_fallback')
+        mark_stale_served()
+        return stale
+
+    def _serve_stale(self, stale_key: Optional[str], message: str) -> Dict:
+        """Return the last good response for a request, or fail fast with 503"""
+        stale = get_stale(stale_key) if stale_key else None
+        if stale is None:
+            raise TwitchAPIError(message, 503)
+        logger.info(f"Serving stale Twitch API data for {stale_key}")
+        mark_stale_served()
+        return stale
+
+    def _send(self, endpoint: str, url: str, params: Optional[Dict], method: str, headers: Dict) -> requests.Response:
+        """Send the HTTP request within the request deadline; idempotent GETs may be hedged"""
+        timeout = deadline.timeout_for(self.REQUEST_TIMEOUT)
+        cassette = get_cassette()
+        key = helix_key(method, endpoint, params)
+        if cassette and cassette.replaying:
+            return replay_response(cassette, key, url)
+
+        started = time.monotonic()
+        if method == 'POST':
+            response = requests.post(url, headers=headers, json=params or {}, timeout=timeout)
+        elif method == 'DELETE':
+            response = requests.delete(url, headers=headers, params=params or {}, timeout=timeout)
+        else:
+            response = hedged_call(
+                f"helix:{endpoint}",
+                lambda: requests.get(url, headers=headers, params=params or {}, timeout=timeout)
+            )
+        if cassette and cassette.recording:
+            record_response(cassette, key, response, time.monotonic() - started)
+        return response
+
+    def _execute_request(self, endpoint: str, params: Optional[Dict], method: str,
+                         credential: Credential, access_token: str) -> Dict:
+        """Perform the request and translate Twitch-specific status codes into TwitchAPIError"""
+        url = f"{self.base_url}/{endpoint}"
+
         try:
             logger.info(f"Making Twitch API request: {method} {url}")
-            response = (
-                requests.post(url, headers=self.headers, json=params or {}, timeout=30)
-                if method.upper() == 'POST'
-                else requests.get(url, headers=self.headers, params=params or {}, timeout=30)
-            )
-            
+            response = self._send(endpoint, url, params, method, self._headers(credential.client_id, access_token))
+            self.credentials.observe(credential, response.headers)
+
+            if response.status_code == 204:
+                logger.info("Twitch API request successful: no content")
+                return {}
+
             # Attempt to parse JSON for error details
             try:
                 error_data = response.json()
             except (ValueError, KeyError):
                 error_data = {'error': 'Unknown', 'message': response.text}
-            
+
             # Handle Twitch-specific HTTP status codes
-            if response.status_code == 200:
+            if response.status_code in (200, 202):
                 logger.info(f"Twitch API request successful: {len(error_data.get('data', []))} items returned")
                 return error_data
             elif response.status_code == 400:
@@ -67,21 +264,28 @@ class TwitchAPIBaseService:
                 raise TwitchAPIError(f"Not Found: {error_msg}", 404)
             elif response.status_code == 429:
                 error_msg = error_data.get('message', 'Rate limit exceeded')
-                retry_after = error_data.get('retry_after', 0)
+                retry_after = self._parse_retry_after(response) or error_data.get('retry_after', 0)
                 logger.warning(f"Twitch API 429 Rate limit exceeded: {error_msg}. Retry after: {retry_after}s")
-                raise TwitchAPIError(f"Rate limit exceeded: {error_msg}. Retry after {retry_after}s", 429)
+                raise TwitchAPIError(f"Rate limit exceeded: {error_msg}. Retry after {retry_after}s", 429, retry_after)
             elif response.status_code == 500:
                 error_msg = error_data.get('message', 'Internal Server Error')
                 logger.error(f"Twitch API 500 Internal Server Error: {error_msg}")
-                raise TwitchAPIError(f"Internal Server Error: {error_msg}", 500)
+                raise TwitchAPIError(f"Internal Server Error: {error_msg}", 500, self._parse_retry_after(response))
             else:
                 error_msg = error_data.get('message', f'HTTP {response.status_code}')
                 logger.error(f"Twitch API error {response.status_code}: {error_msg}")
-                raise TwitchAPIError(f"API request failed: {error_msg}", response.status_code)
-            
+                raise TwitchAPIError(
+                    f"API request failed: {error_msg}", response.status_code, self._parse_retry_after(response)
+                )
+
+        except TwitchAPIError:
+            raise
         except requests.exceptions.Timeout:
             logger.error("Twitch API request timeout")
-            raise TwitchAPIError("Request timeout after 30 seconds", None)
+            current = deadline.current()
+            if current is not None and current.expired():
+                raise TwitchAPIError("Request deadline exceeded waiting for Twitch API", 504)
+            raise TwitchAPIError(f"Request timeout after {self.REQUEST_TIMEOUT} seconds", None)
         except requests.exceptions.ConnectionError:
             logger.error("Twitch API connection error")
             raise TwitchAPIError("Failed to connect to Twitch API", None)
@@ -91,3 +295,20 @@ class TwitchAPIBaseService:
         except Exception as e:
             logger.error(f"Unexpected error in Twitch API request: {e}")
             raise TwitchAPIError(f"Unexpected error: {str(e)}", None)
+
+    @staticmethod
+    def _parse_retry_after(response: requests.Response) -> Optional[float]:
+        """Read Retry-After (seconds) or Twitch's Ratelimit-Reset (epoch seconds) from a response"""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                return None
+        reset = response.headers.get('Ratelimit-Reset')
+        if reset:
+            try:
+                return max(0.0, float(reset) - time.time())
+            except ValueError:
+                return None
+        return None
@@ -0,0 +1,114 @@
+import copy
+import logging
+import threading
+from concurrent.futures import Future
+from contextvars import ContextVar, Token
+from typing import Callable, Dict, List, Optional
+from django.core.cache import cache
+from . import metrics
+from .cache import live_key, make_key, mark_stale_served, stale_served
+
+logger = logging.getLogger(__name__)
+
+
+class HelixMemo:
+    """Helix GET results shared by every sub-request of one batch
+
+    The first caller for a (endpoint, params) pair performs the call; concurrent and later callers
+    wait for and reuse its result. Waiters get their own copy so services may modify what they receive.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Future] = {}
+
+    def call(self, key: str, fetch: Callable[[], Dict]) -> Dict:
+        with self._lock:
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._entries[key] = future
+        if not owner:
+            metrics.increment('batch.helix_shared')
+            data = copy.deepcopy(future.result())
+            if getattr(future, 'stale', False):
+                mark_stale_served()
+            return data
+
+        already_stale = stale_served()
+        try:
+            data = fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        # Sharers of a stale fallback must flag their responses as stale too
+        future.stale = stale_served() and not already_stale
+        future.set_result(copy.deepcopy(data))
+        return data
+
+    def seed(self, key: str, data: Dict) -> None:
+        """Provide the result for key up front (from a combined lookup) unless it is already known"""
+        with self._lock:
+            if key not in self._entries:
+                future = Future()
+                future.set_result(data)
+                self._entries[key] = future
+
+
+_current: ContextVar[Optional[HelixMemo]] = ContextVar('helix_memo', default=None)
+
+
+def start() -> Token:
+    return _current.set(HelixMemo())
+
+
+def reset(token: Token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[HelixMemo]:
+    return _current.get()
+
+
+def request_key(endpoint: str, params: Optional[Dict]) -> str:
+    return make_key('helix', 'GET', endpoint, params)
+
+
+def prefetch_channels(service, live_logins: List[str], user_logins: List[str]) -> None:
+    """Look up several channels' live streams and users with one Helix call each
+
+    Seeds the current memo with per-login results in exactly the form the single-channel lookups
+    (TwitchStreamService.get_channel_live_stream, TwitchChannelService.get_user_by_login) request,
+    so N channel sub-requests cost one /streams and one /users call instead of N each.
+    """
+    memo = current()
+    if memo is None:
+        return
+
+    # Channels whose live status is already cached will not reach Helix at all
+    live_logins = [login for login in dict.fromkeys(live_logins) if login and cache.get(live_key(login)) is None]
+    user_logins = [login for login in dict.fromkeys(user_logins) if login]
+
+    if len(live_logins) > 1:
+        for i in range(0, len(live_logins), 100):
+            batch = live_logins[i:i + 100]
+            data = service._make_request('streams', {'user_login': batch, 'type': 'live', 'first': 100})
+            live = {stream['user_login'].lower(): stream for stream in data.get('data', [])}
+            for login in batch:
+                stream = live.get(login.lower())
+                memo.seed(
+                    request_key('streams', {'user_login': login, 'type': 'live', 'first': 1}),
+                    {'data': [stream] if stream else [], 'pagination': {}}
+                )
+        metrics.increment('batch.prefetch.streams')
+
+    if len(user_logins) > 1:
+        for i in range(0, len(user_logins), 100):
+            batch = user_logins[i:i + 100]
+            data = service._make_request('users', {'login': batch})
+            users = {user['login'].lower(): user for user in data.get('data', [])}
+            for login in batch:
+                user = users.get(login.lower())
+                memo.seed(request_key('users', {'login': login}), {'data': [user] if user else []})
+        metrics.increment('batch.prefetch.users')
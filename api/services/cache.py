@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics
+from .lastknowngood import get_lkg_store
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'twitchback'
+
+_stale_served: ContextVar[bool] = ContextVar('stale_served', default=False)
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    """Build a short, cache-safe key from arbitrary JSON-serializable parts"""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f"{KEY_PREFIX}:{namespace}:{digest}"
+
+
+def get_stale(key: str) -> Optional[Any]:
+    """Return the last known good value stored under key, if any, falling back to the durable store"""
+    value = cache.get(f"{key}:stale")
+    if value is None:
+        store = get_lkg_store()
+        if store is not None:
+            value = store.get(key)
+    return value
+
+
+def set_stale(key: str, value: Any, durable: bool = False) -> None:
+    """Remember a successful upstream result so it can be served while upstream is down
+
+    Durable results (hot datasets) are also saved to disk and survive restarts.
+    """
+    cache.set(f"{key}:stale", value, getattr(settings, 'TWITCH_STALE_TTL', 600))
+    if durable:
+        store = get_lkg_store()
+        if store is not None:
+            store.remember(key, value)
+
+
+def mark_stale_served() -> None:
+    """Flag the current request as answered (at least partly) from stale data"""
+    _stale_served.set(True)
+
+
+def reset_stale_flag() -> None:
+    _stale_served.set(False)
+
+
+def stale_served() -> bool:
+    return _stale_served.get()
+
+
+def live_key(user_login: str) -> str:
+    """Cached live status of one channel; readable so EventSub handlers can address it"""
+    return f"{KEY_PREFIX}:live:{user_login.lower()}"
+
+
+def hls_key(user_login: str) -> str:
+    """Cached HLS variants of one channel's live stream"""
+    return f"{KEY_PREFIX}:hls:{user_login.lower()}"
+
+
+def vod_hls_key(vod_id: str) -> str:
+    """Cached HLS variants of one VOD; archived VODs keep their playlists, so these live long"""
+    return f"{KEY_PREFIX}:vodhls:{vod_id}"
+
+
+def get_generation(name: str) -> int:
+    """Current generation of a family of list entries; part of their keys so a bump invalidates all"""
+    return cache.get_or_set(f"{KEY_PREFIX}:gen:{name}", 1, None)
+
+
+def bump_generation(name: str) -> None:
+    key = f"{KEY_PREFIX}:gen:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def get_or_compute(key: str, ttl: int, compute: Callable[[], Any]) -> Any:
+    """Return the cached value for key, computing and caching it on a miss
+
+    Results built from stale upstream data are not cached, so they are not served past the outage.
+    """
+    namespace = key.split(':')[1]
+    value = cache.get(key)
+    if value is not None:
+        metrics.increment(f"cache.{namespace}.hit")
+        return value
+    metrics.increment(f"cache.{namespace}.miss")
+    value = compute()
+    if ttl > 0 and value is not None and not stale_served():
+        cache.set(key, value, ttl)
+    return value
@@ -0,0 +1,122 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+import requests
+from requests.structures import CaseInsensitiveDict
+from django.conf import settings
+from .errors import TwitchAPIError
+
+logger = logging.getLogger(__name__)
+
+# Only headers that influence our behaviour are kept, to keep cassettes small
+RECORDED_HEADERS = ('Content-Type', 'Retry-After', 'Ratelimit-Limit', 'Ratelimit-Remaining', 'Ratelimit-Reset')
+
+
+class Cassette:
+    """Gzipped JSON-lines recording of upstream interactions (Helix responses, Streamlink resolutions)"""
+
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict]] = defaultdict(list)
+        self._positions: Dict[str, int] = defaultdict(int)
+        if mode == self.REPLAY:
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == self.RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == self.REPLAY
+
+    def record(self, key: str, entry: Dict[str, Any]) -> None:
+        """Append one interaction; each write is its own gzip member so workers can share a file"""
+        line = json.dumps({'k': key, **entry}, separators=(',', ':')) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(line)
+
+    def play(self, key: str) -> Dict[str, Any]:
+        """Return the next recorded interaction for key (cycling), after its recorded latency"""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise TwitchAPIError(f"No recorded upstream response for {key}", 503)
+            entry = entries[self._positions[key] % len(entries)]
+            self._positions[key] += 1
+        if self.latency_scale > 0:
+            time.sleep(entry.get('t', 0) * self.latency_scale)
+        return entry
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            logger.warning(f"Cassette {self.path} does not exist; every upstream call will fail")
+            return
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                self._entries[entry.pop('k')].append(entry)
+        logger.info(f"Loaded {sum(len(e) for e in self._entries.values())} recorded interactions from {self.path}")
+
+
+def helix_key(method: str, endpoint: str, params: Optional[Dict]) -> str:
+    return f"helix {method} {endpoint} {json.dumps(params or {}, sort_keys=True)}"
+
+
+def streamlink_key(url: str) -> str:
+    return f"streamlink {url}"
+
+
+def record_response(cassette: Cassette, key: str, response: requests.Response, elapsed: float) -> None:
+    cassette.record(key, {
+        's': response.status_code,
+        'h': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+        'b': response.text,
+        't': round(elapsed, 4)
+    })
+
+
+def replay_response(cassette: Cassette, key: str, url: str) -> requests.Response:
+    """Rebuild a requests.Response from a recorded interaction"""
+    entry = cassette.play(key)
+    response = requests.Response()
+    response.status_code = entry['s']
+    response.headers = CaseInsensitiveDict(entry.get('h', {}))
+    response._content = entry['b'].encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = url
+    return response
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Process-wide cassette, or None when UPSTREAM_CASSETTE_MODE is off"""
+    global _cassette
+    mode = getattr(settings, 'UPSTREAM_CASSETTE_MODE', '')
+    if mode not in (Cassette.RECORD, Cassette.REPLAY):
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(
+                    str(settings.UPSTREAM_CASSETTE_PATH),
+                    mode,
+                    getattr(settings, 'UPSTREAM_CASSETTE_LATENCY_SCALE', 1.0)
+                )
+    return _cassette
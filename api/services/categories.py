@@ -1,14 +1,17 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import logging
 from .base import TwitchAPIBaseService
+from .category_stats import get_category_stats
 from .errors import TwitchAPIError
+from .records import CategoryRecord
 
 logger = logging.getLogger(__name__)
 
 class TwitchCategoryService(TwitchAPIBaseService):
     """Service class for Twitch category-related operations"""
     
-    def get_top_categories(self, limit: int = 10, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    def get_top_categories(self, limit: int = 10, cursor: Optional[str] = None,
+                           fields: Optional[Set[str]] = None) -> Tuple[List[Dict], Optional[str]]:
         """Get top game categories with cursor support"""
         limit = min(max(1, limit), 100)
         
@@ -25,9 +28,10 @@ class TwitchCategoryService(TwitchAPIBaseService):
             
             formatted_categories = []
             for category in categories:
-                formatted_category = self._format_category_data(category)
+                formatted_category = self._format_category_data(category, fields)
                 formatted_categories.append(formatted_category)
             
+            self._add_live_stats(formatted_categories, fields)
             return formatted_categories, cursor
             
         except TwitchAPIError:
@@ -36,7 +40,8 @@ class TwitchCategoryService(TwitchAPIBaseService):
             logger.error(f"Error processing categories data: {e}")
             raise TwitchAPIError(f"Error processing categories: {str(e)}", None)
     
-    def get_search_games(self, query: str, limit: int = 5, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    def get_search_games(self, query: str, limit: int = 5, cursor: Optional[str] = None,
+                         fields: Optional[Set[str]] = None) -> Tuple[List[Dict], Optional[str]]:
         """Search for games matching the query"""
         limit = min(max(1, limit), 100)
         
@@ -54,7 +59,7 @@ class TwitchCategoryService(TwitchAPIBaseService):
             
             formatted_games = []
             for game in games:
-                formatted_game = self._format_category_data(game)
+                formatted_game = self._format_category_data(game, fields)
                 formatted_games.append(formatted_game)
             
             return formatted_games, cursor
@@ -65,20 +70,71 @@ class TwitchCategoryService(TwitchAPIBaseService):
             logger.error(f"Error processing search games: {e}")
             raise TwitchAPIError(f"Error processing search games: {str(e)}", None)
     
-    def _format_category_data(self, category: Dict) -> Dict:
+    def get_live_aggregates(self, max_pages: int, top_languages: int = 3) -> Tuple[Dict[str, Dict], int, bool]:
+        """Viewer and stream totals per game from one walk over the live streams, most watched first
+        
+        Returns the totals keyed by game id, the number of streams counted and whether the walk
+        reached the end of the live set within max_pages pages of 100.
+        """
+        query = {'first': 100, 'type': 'live'}
+        games: Dict[str, Dict] = {}
+        seen = set()
+        complete = False
+        
+        try:
+            for _ in range(max_pages):
+                # Crawl pages would only churn the last-known-good store, and a struggling crawl
+                # must not open the breaker or spend the retry budget user /streams calls rely on
+                data = self._make_request('streams', dict(query), background=True)
+                page = data.get('data', [])
+                for stream in page:
+                    # Streams that move down the ranking during the walk show up twice
+                    if not stream.get('game_id') or stream['id'] in seen:
+                        continue
+                    seen.add(stream['id'])
+                    viewers = stream.get('viewer_count', 0)
+                    totals = games.get(stream['game_id'])
+                    if totals is None:
+                        totals = games[stream['game_id']] = {'viewer_count': 0, 'stream_count': 0, 'languages': {}}
+                    totals['viewer_count'] += viewers
+                    totals['stream_count'] += 1
+                    language = totals['languages'].setdefault(stream.get('language') or 'other', [0, 0])
+                    language[0] += viewers
+                    language[1] += 1
+                cursor = data.get('pagination', {}).get('cursor')
+                if not cursor or not page:
+                    complete = True
+                    break
+                query['after'] = cursor
+        except TwitchAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing live streams for category stats: {e}")
+            raise TwitchAPIError(f"Error processing category stats: {str(e)}", None)
+        
+        for totals in games.values():
+            languages = sorted(totals['languages'].items(), key=lambda item: -item[1][0])[:top_languages]
+            totals['languages'] = [
+                {'language': language, 'viewer_count': viewers, 'stream_count': streams}
+                for language, (viewers, streams) in languages
+            ]
+        return games, len(seen), complete
+    
+    def _add_live_stats(self, categories: List[Dict], fields: Optional[Set[str]] = None) -> None:
+        """Fill in live viewer/stream totals from the background category stats; None until known"""
+        wanted = [name for name in ('viewer_count', 'stream_count', 'languages') if self._wants(fields, name)]
+        if not wanted:
+            return
+        stats = get_category_stats()
+        for category in categories:
+            totals = stats.get(category['id']) if stats is not None else None
+            for name in wanted:
+                category[name] = totals[name] if totals is not None else None
+    
+    def _format_category_data(self, category: Dict, fields: Optional[Set[str]] = None) -> Dict:
         """Format raw category data from Twitch API for consistent output"""
         try:
-            return {
-                'id': category['id'],
-                'name': category['name'],
-                'box_art_url': category['box_art_url'],
-                'igdb_id': category.get('igdb_id', ''),
-                'thumbnail': {
-                    'small': category['box_art_url'].replace('{width}', '320').replace('{height}', '180'),
-                    'medium': category['box_art_url'].replace('{width}', '640').replace('{height}', '360'),
-                    'large': category['box_art_url'].replace('{width}', '1920').replace('{height}', '1080')
-                }
-            }
+            return CategoryRecord.from_helix(category).to_response(fields)
         except KeyError as e:
             logger.error(f"Missing required field in category data: {e}")
             raise TwitchAPIError(f"Invalid category data format: missing {e}", None)
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics
+from .cache import KEY_PREFIX
+from .errors import TwitchAPIError
+
+logger = logging.getLogger(__name__)
+
+RESULT_KEY = f"{KEY_PREFIX}:category-stats"
+CRAWL_LOCK_KEY = f"{KEY_PREFIX}:category-stats-crawl"
+
+# Totals for a game with nobody live, once a walk has covered the whole live set
+NOT_LIVE = {'viewer_count': 0, 'stream_count': 0, 'languages': []}
+# Totals older than this many intervals (crawls keep failing) are no longer served
+MAX_AGE_INTERVALS = 5
+
+
+class CategoryStats:
+    """Live viewer totals, stream counts and top languages per game, refreshed in the background
+
+    One thread per process walks Helix /streams in pages of 100 every interval and folds the
+    live set into per-game totals, so category lists read them from memory. With a shared cache
+    backend one worker crawls per interval and the others pick up its result from the cache.
+    The thread starts on the first read and stops once nothing has read the stats for
+    idle_timeout seconds.
+    """
+
+    def __init__(self, interval: float, max_pages: int, top_languages: int, idle_timeout: float):
+        self.interval = interval
+        self.max_pages = max_pages
+        self.top_languages = top_languages
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._result: Optional[Dict] = None
+        self._last_read = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, game_id: str) -> Optional[Dict]:
+        """Totals for one game, or None while they are unknown"""
+        self._touch()
+        result = self._result
+        if result is None or time.time() - result['updated'] > self.interval * MAX_AGE_INTERVALS:
+            return None
+        totals = result['games'].get(game_id)
+        if totals is None and result['complete']:
+            return NOT_LIVE
+        return totals
+
+    def status(self) -> Dict:
+        result = self._result
+        if result is None:
+            return {'running': self._thread is not None, 'updated': None}
+        return {
+            'running': self._thread is not None,
+            'updated': round(time.time() - result['updated'], 1),
+            'games': len(result['games']),
+            'streams': result['streams'],
+            'complete': result['complete']
+        }
+
+    def _touch(self) -> None:
+        self._last_read = time.monotonic()
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='category-stats', daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        from .categories import TwitchCategoryService
+
+        service = TwitchCategoryService()
+        while True:
+            with self._lock:
+                if time.monotonic() - self._last_read > self.idle_timeout:
+                    self._thread = None
+                    return
+            started = time.monotonic()
+            try:
+                self.refresh(service)
+            except Exception as e:
+                logger.error(f"Category stats refresh failed: {e}")
+                metrics.increment('category_stats.errors')
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def refresh(self, service) -> None:
+        """Adopt another worker's recent crawl from the cache, or crawl the live set ourselves"""
+        shared = cache.get(RESULT_KEY)
+        if shared is not None and time.time() - shared['updated'] < self.interval:
+            if self._result is None or shared['updated'] > self._result['updated']:
+                self._result = shared
+            return
+        if not cache.add(CRAWL_LOCK_KEY, 1, timeout=max(1, int(self.interval))):
+            # Another worker is crawling; its result is picked up on the next round
+            if self._result is None and shared is not None:
+                self._result = shared
+            return
+
+        started = time.monotonic()
+        try:
+            games, streams, complete = service.get_live_aggregates(self.max_pages, self.top_languages)
+        except TwitchAPIError as e:
+            # Keep serving the previous totals; they age until a walk succeeds
+            logger.warning(f"Category stats crawl failed, keeping previous totals: {e}")
+            metrics.increment('category_stats.failed')
+            return
+        self._result = {'games': games, 'streams': streams, 'complete': complete, 'updated': time.time()}
+        cache.set(RESULT_KEY, self._result, int(self.interval * 3))
+        metrics.increment('category_stats.crawls')
+        logger.info(f"Category stats: {streams} live streams in {len(games)} games "
+                    f"({'complete' if complete else f'first {self.max_pages} pages'}) "
+                    f"in {time.monotonic() - started:.1f}s")
+
+
+_stats: Optional[CategoryStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_category_stats() -> Optional[CategoryStats]:
+    """The process-wide category stats, or None when CATEGORY_STATS_INTERVAL is 0"""
+    global _stats
+    interval = getattr(settings, 'CATEGORY_STATS_INTERVAL', 120.0)
+    if not interval:
+        return None
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = CategoryStats(
+                    interval,
+                    getattr(settings, 'CATEGORY_STATS_MAX_PAGES', 100),
+                    getattr(settings, 'CATEGORY_STATS_TOP_LANGUAGES', 3),
+                    getattr(settings, 'CATEGORY_STATS_IDLE_TIMEOUT', 900.0)
+                )
+    return _stats
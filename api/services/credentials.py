@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from . import metrics
+from .auth import AppTokenManager, get_token_manager
+from .errors import TwitchAPIError
+
+logger = logging.getLogger(__name__)
+
+
+class Credential:
+    """One Twitch app (client ID and token source) with its rate-limit budget and health"""
+
+    # Helix's default bucket per app, assumed until Twitch reports the real one
+    DEFAULT_LIMIT = 800
+
+    def __init__(self, client_id: str, token_manager: AppTokenManager):
+        self.client_id = client_id
+        self.token_manager = token_manager
+        self.limit = self.DEFAULT_LIMIT
+        # Last Ratelimit-Remaining reported by Twitch for the window ending at reset_at
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.in_flight = 0
+        # Out of rotation until then: rate limited, or failing authentication
+        self.unavailable_until = 0.0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.calls = 0
+
+    @property
+    def label(self) -> str:
+        """Client ID shortened for logs and metrics"""
+        return self.client_id[:8]
+
+    def budget(self, now: float) -> float:
+        """Share of this window's budget still unspent, counting calls in flight"""
+        remaining = self.limit if self.remaining is None or now >= self.reset_at else self.remaining
+        return (remaining - self.in_flight) / self.limit
+
+    def status(self, now: float) -> Dict:
+        if now < self.unavailable_until:
+            state = 'failing' if self.consecutive_failures else 'exhausted'
+        else:
+            state = 'available'
+        return {
+            'state': state,
+            'remaining': self.remaining if now < self.reset_at else None,
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'available_in': round(max(0.0, self.unavailable_until - now), 1),
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+            'calls': self.calls
+        }
+
+
+class CredentialPool:
+    """Spreads Helix calls across several Twitch apps, each with its own rate limit
+
+    Every call goes to the available credential with the largest share of its budget left,
+    as reported by Twitch's Ratelimit-* headers. A credential that is rate limited leaves the
+    rotation until its reset time; one that keeps failing authentication is benched for a
+    cooldown. Since Twitch reports each budget in its headers, workers converge on the same
+    picture without coordinating, and total throughput grows with the number of credentials.
+    """
+
+    def __init__(self, credentials: List[Credential], failure_threshold: int = 3, cooldown: float = 60.0):
+        self.credentials = credentials
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude: Set[str] = frozenset()) -> Credential:
+        """Credential for the next call, skipping client IDs in `exclude`; callers must release() it
+
+        Raises 429 if every credential is out of rotation or has its remaining budget in flight.
+        """
+        now = time.time()
+        with self._lock:
+            available = [c for c in self.credentials
+                         if now >= c.unavailable_until and c.client_id not in exclude and c.budget(now) > 0]
+            if not available:
+                resume = min(max(c.unavailable_until, c.reset_at if c.budget(now) <= 0 else 0.0)
+                             for c in self.credentials)
+                retry_after = max(resume - now, 0.0)
+                metrics.increment('credentials.all_unavailable')
+                raise TwitchAPIError("All Twitch credentials are rate limited or failing", 429, retry_after)
+            credential = max(available, key=lambda c: c.budget(now))
+            credential.in_flight += 1
+            credential.calls += 1
+        return credential
+
+    def release(self, credential: Credential) -> None:
+        with self._lock:
+            credential.in_flight -= 1
+
+    def available(self, exclude: Set[str] = frozenset()) -> bool:
+        """Whether any credential (other than those in `exclude`) can take a call right now"""
+        now = time.time()
+        with self._lock:
+            return any(now >= c.unavailable_until and c.client_id not in exclude and c.budget(now) > 0
+                       for c in self.credentials)
+
+    def observe(self, credential: Credential, headers) -> None:
+        """Update a credential's budget from the Ratelimit-* headers of a Helix response"""
+        try:
+            limit = int(headers['Ratelimit-Limit'])
+            remaining = int(headers['Ratelimit-Remaining'])
+            reset_at = float(headers['Ratelimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._lock:
+            # Responses arrive out of order; within a window the lowest count is the latest
+            if reset_at > credential.reset_at or credential.remaining is None:
+                credential.remaining = remaining
+            else:
+                credential.remaining = min(credential.remaining, remaining)
+            credential.limit = max(limit, 1)
+            credential.reset_at = reset_at
+
+    def exhaust(self, credential: Credential, retry_after: Optional[float]) -> None:
+        """Take a rate-limited credential out of rotation until its budget resets"""
+        now = time.time()
+        until = now + retry_after if retry_after else max(credential.reset_at, now + 1.0)
+        with self._lock:
+            credential.remaining = 0
+            credential.unavailable_until = max(credential.unavailable_until, until)
+        logger.warning(f"Twitch credential {credential.label} is rate limited for {until - now:.1f}s")
+        metrics.increment('credentials.exhausted')
+        metrics.increment(f"credentials.{credential.label}.exhausted")
+
+    def record_success(self, credential: Credential) -> None:
+        if credential.consecutive_failures:
+            with self._lock:
+                credential.consecutive_failures = 0
+
+    def record_failure(self, credential: Credential, error: TwitchAPIError) -> None:
+        """Count an authentication failure; repeated ones bench the credential for the cooldown"""
+        with self._lock:
+            credential.consecutive_failures += 1
+            credential.last_error = str(error)
+            benched = credential.consecutive_failures >= self.failure_threshold
+            if benched:
+                credential.unavailable_until = time.time() + self.cooldown
+        metrics.increment(f"credentials.{credential.label}.failures")
+        if benched:
+            logger.error(f"Twitch credential {credential.label} keeps failing ({error}), "
+                         f"out of rotation for {self.cooldown:.0f}s")
+            metrics.increment('credentials.benched')
+
+    def status(self) -> Dict[str, Dict]:
+        """Budget and health per credential, for the health endpoint"""
+        now = time.time()
+        with self._lock:
+            return {c.label: c.status(now) for c in self.credentials}
+
+
+def configured_credentials() -> List[Tuple[str, str, str]]:
+    """(client_id, client_secret, static_token) per configured Twitch app
+
+    TWITCH_CREDENTIALS lists extra apps as "client_id:client_secret,..." next to the
+    TWITCH_CLIENT_ID app.
+    """
+    credentials = [(settings.TWITCH_CLIENT_ID, settings.TWITCH_CLIENT_SECRET, settings.TWITCH_ACCESS_TOKEN)]
+    for client_id, client_secret in getattr(settings, 'TWITCH_CREDENTIALS', []):
+        if not client_secret:
+            raise ImproperlyConfigured("TWITCH_CREDENTIALS entries must be client_id:client_secret")
+        if client_id not in {c[0] for c in credentials}:
+            credentials.append((client_id, client_secret, ''))
+    return credentials
+
+
+_pool: Optional[CredentialPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_credential_pool() -> CredentialPool:
+    """Process-wide pool of the configured Twitch credentials"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CredentialPool(
+                    [Credential(client_id, get_token_manager(client_id, secret, token))
+                     for client_id, secret, token in configured_credentials()],
+                    getattr(settings, 'TWITCH_CREDENTIAL_FAILURE_THRESHOLD', 3),
+                    getattr(settings, 'TWITCH_CREDENTIAL_COOLDOWN', 60.0)
+                )
+    return _pool
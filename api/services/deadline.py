@@ -0,0 +1,72 @@
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+from django.conf import settings
+from .errors import TwitchAPIError
+
+
+class Deadline:
+    """Absolute point in time by which the current request must be answered"""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar('request_deadline', default=None)
+_enrichment_skipped: ContextVar[bool] = ContextVar('enrichment_skipped', default=False)
+
+
+def start(budget: Optional[float]) -> Token:
+    """Install a deadline for the current context; nested deadlines never extend an outer one"""
+    deadline = Deadline(budget) if budget else None
+    outer = _current.get()
+    if outer is not None and (deadline is None or outer.expires_at < deadline.expires_at):
+        deadline = outer
+    return _current.set(deadline)
+
+
+def reset(token: Token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+def timeout_for(default: float) -> float:
+    """Timeout for the next upstream call: the remaining budget, capped at the call's own default"""
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise TwitchAPIError("Request deadline exceeded", 504)
+    return min(default, remaining)
+
+
+def budget_low() -> bool:
+    """True once too little budget is left for optional enrichment work"""
+    deadline = _current.get()
+    if deadline is None:
+        return False
+    return deadline.remaining() < getattr(settings, 'API_ENRICHMENT_MIN_BUDGET', 3.0)
+
+
+def skip_enrichment() -> None:
+    """Flag the current request as answered without enrichment because budget_low()"""
+    _enrichment_skipped.set(True)
+
+
+def reset_enrichment_flag() -> None:
+    _enrichment_skipped.set(False)
+
+
+def enrichment_skipped() -> bool:
+    return _enrichment_skipped.get()
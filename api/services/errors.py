@@ -5,6 +5,8 @@ logger = logging.getLogger(__name__)
 
 class TwitchAPIError(Exception):
     """Custom exception for Twitch API errors"""
-    def __init__(self, message: str, status_code: Optional[int] = None):
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
         self.status_code = status_code
+        # Seconds upstream asked us to wait before trying again, if it said so
+        self.retry_after = retry_after
         super().__init__(message)
@@ -0,0 +1,196 @@
+import hashlib
+import hmac
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics
+from .base import TwitchAPIBaseService
+from .cache import KEY_PREFIX, bump_generation, hls_key, live_key
+from .errors import TwitchAPIError
+
+logger = logging.getLogger(__name__)
+
+# Subscription type -> version used when creating subscriptions
+SUBSCRIPTION_TYPES = {
+    'stream.online': '1',
+    'stream.offline': '1',
+    'channel.update': '2',
+}
+
+
+def verify_signature(secret: str, message_id: str, timestamp: str, body: bytes, signature: str) -> bool:
+    """Check Twitch-Eventsub-Message-Signature: sha256 HMAC over message id + timestamp + raw body"""
+    if not (secret and message_id and timestamp and signature):
+        return False
+    digest = hmac.new(secret.encode('utf-8'), message_id.encode('utf-8') + timestamp.encode('utf-8') + body,
+                      hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"sha256={digest}", signature)
+
+
+def message_too_old(timestamp: str) -> bool:
+    """True if the message timestamp is unparseable or outside EVENTSUB_MAX_MESSAGE_AGE"""
+    try:
+        # Twitch sends RFC3339 with nanoseconds; seconds precision is enough here
+        sent = datetime.strptime(timestamp[:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return True
+    age = abs((datetime.now(timezone.utc) - sent).total_seconds())
+    return age > getattr(settings, 'EVENTSUB_MAX_MESSAGE_AGE', 600)
+
+
+def _delivery_key(message_id: str) -> str:
+    return f"{KEY_PREFIX}:eventsub:msg:{message_id}"
+
+
+def already_delivered(message_id: str) -> bool:
+    """True if a message with this id was handled before (Twitch retries deliver the same id)"""
+    return cache.get(_delivery_key(message_id)) is not None
+
+
+def mark_delivered(message_id: str) -> None:
+    """Remember a handled message id; only call once handling succeeded, so failures are retried"""
+    ttl = getattr(settings, 'EVENTSUB_MAX_MESSAGE_AGE', 600) * 2
+    cache.set(_delivery_key(message_id), 1, ttl)
+
+
+def _subscribed_key(login: str) -> str:
+    return f"{KEY_PREFIX}:eventsub:subscribed:{login.lower()}"
+
+
+def _broadcaster_key(broadcaster_id: str) -> str:
+    return f"{KEY_PREFIX}:eventsub:login:{broadcaster_id}"
+
+
+def mark_subscribed(broadcasters: Dict[str, str]) -> None:
+    """Record logins (login -> broadcaster id) whose live status EventSub pushes to us"""
+    ttl = settings.EVENTSUB_SUBSCRIBED_TTL
+    cache.set_many({_subscribed_key(login): 1 for login in broadcasters}, ttl)
+    cache.set_many({_broadcaster_key(user_id): login.lower() for login, user_id in broadcasters.items()}, ttl)
+
+
+def mark_revoked(broadcaster_id: str) -> None:
+    """Forget a broadcaster whose subscription Twitch revoked; its live status expires quickly again"""
+    login = cache.get(_broadcaster_key(broadcaster_id))
+    if login:
+        cache.delete(_subscribed_key(login))
+
+
+def stream_cache_ttl(login: str) -> int:
+    """How long a channel's live status may be cached: long only if EventSub tells us about changes"""
+    if settings.EVENTSUB_SECRET and cache.get(_subscribed_key(login)):
+        return settings.EVENTSUB_STREAM_CACHE_TTL
+    return settings.STREAM_CACHE_TTL
+
+
+def apply_notification(subscription_type: str, event: Dict) -> None:
+    """Update or drop the cached entries affected by one EventSub notification"""
+    login = event.get('broadcaster_user_login', '')
+    if not login:
+        logger.warning(f"EventSub {subscription_type} notification without broadcaster login")
+        return
+    if event.get('broadcaster_user_id'):
+        # A notification proves the subscription is active
+        mark_subscribed({login: event['broadcaster_user_id']})
+
+    cached = cache.get(live_key(login))
+    # Whether list membership may now differ; an unknown channel state (not cached) counts as changed
+    changed = True
+    if subscription_type == 'stream.online':
+        # The new stream's details and playlist come from Helix/Streamlink on next use
+        cache.delete_many([live_key(login), hls_key(login)])
+    elif subscription_type == 'stream.offline':
+        changed = cached is None or bool(cached[0])
+        cache.set(live_key(login), ([], None), stream_cache_ttl(login))
+        cache.delete(hls_key(login))
+    elif subscription_type == 'channel.update':
+        # Titles change often; bumping the generation for them would retire every cached list
+        # and response process-wide, so lists pick up new titles when they expire. Only a
+        # category change of a live channel moves it between game lists.
+        changed = False
+        if cached and cached[0]:
+            streams, cursor = cached
+            for stream in streams:
+                game_id = stream.game_id
+                stream.title = event.get('title', stream.title)
+                stream.game_id = event.get('category_id') or stream.game_id
+                stream.game_name = event.get('category_name') or stream.game_name
+                changed = changed or stream.game_id != game_id
+            cache.set(live_key(login), (streams, cursor), stream_cache_ttl(login))
+    else:
+        logger.info(f"Ignoring EventSub notification of type {subscription_type}")
+        return
+
+    if changed:
+        # Membership or order of stream lists may have changed
+        bump_generation('streams')
+    metrics.increment(f"eventsub.{subscription_type}")
+    logger.info(f"Applied EventSub {subscription_type} for {login}")
+
+
+class EventSubService(TwitchAPIBaseService):
+    """Service class for managing EventSub webhook subscriptions"""
+
+    def list_subscriptions(self, status: Optional[str] = None) -> List[Dict]:
+        """All subscriptions of this client, following pagination"""
+        subscriptions = []
+        params = {'status': status} if status else {}
+        while True:
+            data = self._make_request('eventsub/subscriptions', params)
+            subscriptions.extend(data.get('data', []))
+            cursor = data.get('pagination', {}).get('cursor')
+            if not cursor:
+                return subscriptions
+            params = {**params, 'after': cursor}
+
+    def create_subscription(self, subscription_type: str, broadcaster_id: str) -> Optional[Dict]:
+        """Subscribe the configured callback to one event type; None if it already exists"""
+        if not settings.EVENTSUB_SECRET or not settings.EVENTSUB_CALLBACK_URL:
+            raise TwitchAPIError("EVENTSUB_SECRET and EVENTSUB_CALLBACK_URL must be set", 400)
+        body = {
+            'type': subscription_type,
+            'version': SUBSCRIPTION_TYPES[subscription_type],
+            'condition': {'broadcaster_user_id': broadcaster_id},
+            'transport': {
+                'method': 'webhook',
+                'callback': settings.EVENTSUB_CALLBACK_URL,
+                'secret': settings.EVENTSUB_SECRET
+            }
+        }
+        try:
+            data = self._make_request('eventsub/subscriptions', body, method='POST')
+        except TwitchAPIError as e:
+            if e.status_code == 409:
+                return None
+            raise
+        return (data.get('data') or [None])[0]
+
+    def delete_subscription(self, subscription_id: str) -> None:
+        self._make_request('eventsub/subscriptions', {'id': subscription_id}, method='DELETE')
+
+    def sync(self, broadcaster_ids: List[str]) -> Dict[str, int]:
+        """Make sure every broadcaster has all subscription types pointing at our callback"""
+        existing = {
+            (s['type'], s['condition'].get('broadcaster_user_id'))
+            for s in self.list_subscriptions()
+            if s.get('transport', {}).get('callback') == settings.EVENTSUB_CALLBACK_URL
+            and s.get('status') in ('enabled', 'webhook_callback_verification_pending')
+        }
+        summary = {'created': 0, 'existing': 0}
+        for broadcaster_id in broadcaster_ids:
+            for subscription_type in SUBSCRIPTION_TYPES:
+                if (subscription_type, broadcaster_id) in existing:
+                    summary['existing'] += 1
+                    continue
+                created = self.create_subscription(subscription_type, broadcaster_id)
+                summary['created' if created else 'existing'] += 1
+        return summary
+
+    def broadcaster_ids(self, user_logins: List[str]) -> Dict[str, str]:
+        """Map logins to user ids, 100 per Helix call"""
+        ids = {}
+        for i in range(0, len(user_logins), 100):
+            data = self._make_request('users', {'login': user_logins[i:i + 100]})
+            ids.update({user['login']: user['id'] for user in data.get('data', [])})
+        return ids
@@ -0,0 +1,194 @@
+import logging
+import math
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urljoin
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from . import deadline, metrics
+from .cache import KEY_PREFIX, hls_key
+from .errors import TwitchAPIError
+from .resilience import get_breaker
+from .streamlink import MASTER_PLAYLIST, QUALITY_ALIASES, StreamlinkService, qualities
+
+logger = logging.getLogger(__name__)
+
+URI_ATTRIBUTE = re.compile(r'URI="([^"]*)"')
+
+
+def _rewrite(body: str, url: str, rewrite_uri: Callable[[str], str]) -> str:
+    """Apply rewrite_uri to every URI line of a playlist; URI="..." tag attributes are made absolute"""
+    lines = []
+    for line in body.splitlines():
+        if line and not line.startswith('#'):
+            line = rewrite_uri(urljoin(url, line.strip()))
+        elif 'URI="' in line:
+            line = URI_ATTRIBUTE.sub(lambda match: f'URI="{urljoin(url, match.group(1))}"', line)
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def rewrite_master(body: str, url: str, variants: Dict[str, str], proxy_prefix: str) -> str:
+    """Point a master playlist's known variants at the proxy and everything else at the origin"""
+    names: Dict[str, str] = {}
+    for quality in sorted(qualities(variants), key=lambda name: name in QUALITY_ALIASES):
+        names.setdefault(variants[quality], quality)
+
+    def rewrite_uri(uri: str) -> str:
+        quality = names.get(uri)
+        return f"{proxy_prefix}/{quality}.m3u8" if quality else uri
+
+    return _rewrite(body, url, rewrite_uri)
+
+
+def rewrite_media(body: str, url: str) -> str:
+    """Make a media playlist's segment URIs absolute, so players fetch segments from the CDN"""
+    return _rewrite(body, url, lambda uri: uri)
+
+
+class PlaylistCache:
+    """Fetched playlists shared by every viewer: one origin fetch per playlist per TTL
+
+    Entries are kept in process memory and in the Django cache, so with a shared cache backend
+    workers share them too. Concurrent misses for one playlist wait for a single fetch.
+    """
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, str]] = {}
+        self._inflight: Dict[str, Future] = {}
+
+    def get(self, key: str, ttl: float, fetch: Callable[[], str]) -> str:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] < ttl:
+            metrics.increment('hls_proxy.hit')
+            return entry[1]
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            metrics.increment('hls_proxy.coalesced')
+            return future.result()
+
+        try:
+            cache_key = f"{KEY_PREFIX}:hls-playlist:{key}"
+            entry = cache.get(cache_key)
+            if entry is not None and time.time() - entry[0] < ttl:
+                metrics.increment('hls_proxy.shared_hit')
+            else:
+                entry = (time.time(), fetch())
+                cache.set(cache_key, entry, max(1, math.ceil(ttl)))
+            with self._lock:
+                if len(self._entries) >= self.MAX_ENTRIES:
+                    self._entries.clear()
+                self._entries[key] = entry
+            future.set_result(entry[1])
+            return entry[1]
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+class HLSManifestProxy:
+    """Serves live master and media playlists from the shared playlist cache
+
+    Master playlists list variants under this proxy (HLS_PROXY_URL); media playlists keep
+    absolute segment URIs, so segments still go straight to the CDN.
+    """
+
+    REQUEST_TIMEOUT = 5
+
+    def __init__(self, proxy_url: str, master_ttl: float, media_ttl: float):
+        self.proxy_url = proxy_url.rstrip('/')
+        self.master_ttl = master_ttl
+        self.media_ttl = media_ttl
+        self.streamlink_service = StreamlinkService()
+        self.playlists = PlaylistCache()
+
+    def get_playlist(self, user_login: str, variant: str) -> Tuple[str, float]:
+        """A channel's master playlist (variant MASTER_PLAYLIST) or media playlist, and its TTL"""
+        user_login = user_login.lower()
+        ttl = self.master_ttl if variant == MASTER_PLAYLIST else self.media_ttl
+        body = self.playlists.get(f"{user_login}:{variant}", ttl, lambda: self._build(user_login, variant))
+        return body, ttl
+
+    def _build(self, user_login: str, variant: str) -> str:
+        try:
+            variants = self.streamlink_service.get_stream_variants(user_login)
+        except TwitchAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Error resolving HLS playlists for {user_login}: {e}")
+            raise TwitchAPIError(f"Failed to resolve HLS playlists: {str(e)}", 502)
+        if not variants:
+            raise TwitchAPIError(f"No HLS streams available for {user_login}", 404)
+
+        url = variants.get(variant)
+        if url is None:
+            if variant == MASTER_PLAYLIST:
+                raise TwitchAPIError(f"No master playlist available for {user_login}", 404)
+            raise TwitchAPIError(f"Quality '{variant}' not available. Options: {qualities(variants)}", 404)
+
+        body = self._fetch(user_login, url)
+        if variant == MASTER_PLAYLIST:
+            return rewrite_master(body, url, variants, f"{self.proxy_url}/{user_login}")
+        return rewrite_media(body, url)
+
+    def _fetch(self, user_login: str, url: str) -> str:
+        breaker = get_breaker('hls:origin')
+        if not breaker.allow_request():
+            raise TwitchAPIError("HLS origin is temporarily unavailable", 503)
+
+        metrics.increment('hls_proxy.fetches')
+        try:
+            response = requests.get(url, timeout=deadline.timeout_for(self.REQUEST_TIMEOUT))
+        except requests.RequestException as e:
+            breaker.record_failure()
+            logger.warning(f"Fetching HLS playlist for {user_login} failed: {e}")
+            raise TwitchAPIError(f"Fetching HLS playlist failed: {str(e)}", 502)
+        if response.status_code >= 500:
+            breaker.record_failure()
+            raise TwitchAPIError(f"HLS origin returned {response.status_code}", 502)
+        breaker.record_success()
+
+        if response.status_code != 200:
+            # Playlist URLs carry an expiring token and disappear when the stream ends;
+            # drop the resolved variants so the next request resolves the channel again
+            cache.delete(hls_key(user_login))
+            metrics.increment('hls_proxy.expired')
+            raise TwitchAPIError(f"HLS playlist for {user_login} is no longer available", 404)
+        return response.text
+
+
+_proxy: Optional[HLSManifestProxy] = None
+_proxy_lock = threading.Lock()
+
+
+def get_hls_proxy() -> Optional[HLSManifestProxy]:
+    """The process-wide manifest proxy, or None when HLS_PROXY_URL is not set"""
+    global _proxy
+    proxy_url = getattr(settings, 'HLS_PROXY_URL', '')
+    if not proxy_url:
+        return None
+    if _proxy is None:
+        with _proxy_lock:
+            if _proxy is None:
+                _proxy = HLSManifestProxy(
+                    proxy_url,
+                    getattr(settings, 'HLS_PROXY_MASTER_TTL', 30.0),
+                    getattr(settings, 'HLS_PROXY_MEDIA_TTL', 1.0)
+                )
+    return _proxy
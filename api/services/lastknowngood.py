@@ -0,0 +1,147 @@
+import atexit
+import fcntl
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from django.conf import settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LastKnownGoodStore:
+    """Hot upstream results (stream lists, top categories, users, HLS variants) kept on disk
+
+    Entries are remembered in memory as they are fetched and merged into one gzipped JSON file
+    every save interval, so a restarted worker can answer from them while Twitch is unreachable.
+    Several workers share the file; a lock file serializes their merges and newer entries win.
+    """
+
+    def __init__(self, path: str, max_entries: int, max_age: float, save_interval: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._dirty = False
+        self._saver_pid: Optional[int] = None
+
+    def remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        self._ensure_saver()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.time() - entry[0] > self.max_age:
+            return None
+        return entry[1]
+
+    def load(self) -> int:
+        """Read the file into memory; returns the number of usable entries"""
+        entries = self._read_file()
+        now = time.time()
+        with self._lock:
+            for key, (saved_at, value) in sorted(entries.items(), key=lambda item: item[1][0]):
+                if now - saved_at <= self.max_age and key not in self._entries:
+                    self._entries[key] = (saved_at, value)
+            count = len(self._entries)
+        metrics.increment('lkg.loaded', count)
+        logger.info(f"Loaded {count} last-known-good entries from {self.path}")
+        return count
+
+    def save(self) -> None:
+        """Merge this process's entries into the file"""
+        with self._lock:
+            if not self._dirty:
+                return
+            ours = dict(self._entries)
+            self._dirty = False
+
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            merged = self._read_file()
+            for key, entry in ours.items():
+                if key not in merged or merged[key][0] < entry[0]:
+                    merged[key] = entry
+            cutoff = time.time() - self.max_age
+            newest = sorted((item for item in merged.items() if item[1][0] >= cutoff),
+                            key=lambda item: item[1][0])[-self.max_entries:]
+
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.lkg-')
+            try:
+                with gzip.open(os.fdopen(fd, 'wb'), 'wt', encoding='utf-8') as f:
+                    json.dump(dict(newest), f, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            except (OSError, TypeError, ValueError):
+                os.unlink(tmp_path)
+                raise
+        metrics.increment('lkg.saved')
+
+    def _read_file(self) -> Dict[str, Tuple[float, Any]]:
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                return {key: (entry[0], entry[1]) for key, entry in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError, IndexError) as e:
+            logger.warning(f"Ignoring unreadable last-known-good file {self.path}: {e}")
+            return {}
+
+    def _ensure_saver(self) -> None:
+        # Started lazily in each process: threads do not survive a fork of a preloaded master
+        if self._saver_pid == os.getpid():
+            return
+        with self._lock:
+            if self._saver_pid == os.getpid():
+                return
+            self._saver_pid = os.getpid()
+        threading.Thread(target=self._save_loop, name='lkg-saver', daemon=True).start()
+        atexit.register(self._save_quietly)
+
+    def _save_loop(self) -> None:
+        while True:
+            time.sleep(self.save_interval)
+            self._save_quietly()
+
+    def _save_quietly(self) -> None:
+        try:
+            self.save()
+        except Exception as e:
+            logger.warning(f"Could not save last-known-good entries to {self.path}: {e}")
+
+
+_store: Optional[LastKnownGoodStore] = None
+_store_lock = threading.Lock()
+
+
+def get_lkg_store() -> Optional[LastKnownGoodStore]:
+    """The process-wide store, or None when LKG_STORE_PATH is empty"""
+    global _store
+    path = getattr(settings, 'LKG_STORE_PATH', '')
+    if not path:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LastKnownGoodStore(
+                    path,
+                    getattr(settings, 'LKG_MAX_ENTRIES', 2000),
+                    getattr(settings, 'LKG_MAX_AGE', 3600.0),
+                    getattr(settings, 'LKG_SAVE_INTERVAL', 60.0)
+                )
+    return _store
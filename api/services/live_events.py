@@ -0,0 +1,257 @@
+import abc
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from django.conf import settings
+from . import metrics
+from .errors import TwitchAPIError
+
+logger = logging.getLogger(__name__)
+
+# (kind, value): ('channels', None) for channel sets, ('top', None) or ('game', game_id) for ranked lists
+TopicKey = Tuple[str, Optional[str]]
+
+
+class Subscriber(abc.ABC):
+    """One connected client; the poller thread hands it events through deliver()"""
+
+    MAX_PENDING = 100
+
+    def __init__(self, topic: TopicKey, logins: Optional[Set[str]] = None):
+        self.topic = topic
+        self.logins = logins or set()
+        self.primed = False
+        # Set once the client can no longer be reached; the poller drops it on its next pass
+        self.closed = False
+
+    @abc.abstractmethod
+    def deliver(self, event: str, data: Dict) -> None:
+        """Queue an event for the client without blocking the poller"""
+
+
+class SyncSubscriber(Subscriber):
+    """Subscriber read by a blocking generator (WSGI workers)"""
+
+    def __init__(self, topic: TopicKey, logins: Optional[Set[str]] = None):
+        super().__init__(topic, logins)
+        self.queue: queue.Queue = queue.Queue(self.MAX_PENDING)
+
+    def deliver(self, event: str, data: Dict) -> None:
+        try:
+            self.queue.put_nowait((event, data))
+        except queue.Full:
+            metrics.increment('live_events.dropped')
+
+    def get(self, timeout: float) -> Optional[Tuple[str, Dict]]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscriber(Subscriber):
+    """Subscriber read by an async generator on the event loop (ASGI), without holding a thread"""
+
+    def __init__(self, topic: TopicKey, logins: Optional[Set[str]] = None):
+        super().__init__(topic, logins)
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(self.MAX_PENDING)
+
+    def deliver(self, event: str, data: Dict) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._put, (event, data))
+        except RuntimeError:
+            # The event loop was closed (server shutdown or a dead worker) before the generator's
+            # finally could unsubscribe; one such client must not stop delivery to the others
+            self.closed = True
+            metrics.increment('live_events.closed_loops')
+
+    def _put(self, item: Tuple[str, Dict]) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            metrics.increment('live_events.dropped')
+
+    async def get(self, timeout: float) -> Optional[Tuple[str, Dict]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LiveEventHub:
+    """Single upstream poller per process that fans live-state changes out to every subscriber
+
+    All channel-set subscriptions are merged into one batched /streams lookup per interval and
+    each ranked list (top, per game) is fetched once, however many clients are listening.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscriber] = set()
+        self._channel_state: Dict[str, Dict] = {}
+        self._polled_logins: Set[str] = set()
+        self._list_state: Dict[TopicKey, Dict[str, Dict]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._sync_streams = 0
+
+    def subscribe(self, subscriber: Subscriber) -> Subscriber:
+        with self._lock:
+            self._subscribers.add(subscriber)
+            self._prime(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='live-event-poller', daemon=True)
+                self._thread.start()
+        metrics.increment('live_events.subscribed')
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def open_sync_stream(self, limit: int) -> bool:
+        """Reserve one of this process's blocking (WSGI) stream slots; False when all are taken"""
+        with self._lock:
+            if self._sync_streams >= limit:
+                return False
+            self._sync_streams += 1
+            return True
+
+    def close_sync_stream(self) -> None:
+        with self._lock:
+            self._sync_streams -= 1
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _snapshot_for(self, subscriber: Subscriber) -> Optional[List[Dict]]:
+        """Current state for a subscriber's scope, or None if it has not been polled yet"""
+        kind, _ = subscriber.topic
+        if kind == 'channels':
+            if not subscriber.logins <= self._polled_logins:
+                return None
+            return [self._channel_state[login] for login in sorted(subscriber.logins) if login in self._channel_state]
+        state = self._list_state.get(subscriber.topic)
+        return list(state.values()) if state is not None else None
+
+    def _prime(self, subscriber: Subscriber) -> None:
+        """Send the initial snapshot once the subscriber's scope is known; caller holds the lock"""
+        snapshot = self._snapshot_for(subscriber)
+        if snapshot is not None:
+            subscriber.primed = True
+            subscriber.deliver('snapshot', {'streams': snapshot})
+
+    def _run(self) -> None:
+        from .streams import TwitchStreamService
+
+        service = TwitchStreamService()
+        interval = getattr(settings, 'LIVE_EVENTS_POLL_INTERVAL', 5.0)
+        while True:
+            with self._lock:
+                self._subscribers = {subscriber for subscriber in self._subscribers if not subscriber.closed}
+                subscribers = list(self._subscribers)
+                if not subscribers:
+                    self._thread = None
+                    return
+            started = time.monotonic()
+            try:
+                self._poll(service, subscribers)
+            except Exception as e:
+                logger.error(f"Live event poll failed: {e}")
+                metrics.increment('live_events.poll_errors')
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def _poll(self, service, subscribers: List[Subscriber]) -> None:
+        logins = set()
+        list_topics = set()
+        for subscriber in subscribers:
+            if subscriber.topic[0] == 'channels':
+                logins |= subscriber.logins
+            else:
+                list_topics.add(subscriber.topic)
+
+        if logins:
+            try:
+                current = service.get_live_snapshot(user_logins=sorted(logins))
+            except TwitchAPIError as e:
+                logger.warning(f"Live event poll for {len(logins)} channels failed: {e}")
+            else:
+                events = self._diff(self._channel_state, current, logins, 'online', 'offline')
+                with self._lock:
+                    self._channel_state = current
+                    self._polled_logins = logins
+                    for subscriber in subscribers:
+                        if subscriber.topic[0] == 'channels':
+                            self._publish(subscriber, events, subscriber.logins)
+
+        top_size = getattr(settings, 'LIVE_EVENTS_TOP_SIZE', 20)
+        for topic in list_topics:
+            kind, game_id = topic
+            try:
+                current = service.get_live_snapshot(game_id=game_id, limit=top_size)
+            except TwitchAPIError as e:
+                logger.warning(f"Live event poll for {kind} list failed: {e}")
+                continue
+            previous = self._list_state.get(topic, {})
+            events = self._diff(previous, current, previous.keys() | current.keys(), 'added', 'removed')
+            with self._lock:
+                self._list_state[topic] = current
+                for subscriber in subscribers:
+                    if subscriber.topic == topic:
+                        self._publish(subscriber, events, None)
+
+        with self._lock:
+            # Forget lists nobody listens to any more
+            for topic in set(self._list_state) - list_topics:
+                del self._list_state[topic]
+        metrics.increment('live_events.polls')
+
+    @staticmethod
+    def _diff(previous: Dict[str, Dict], current: Dict[str, Dict], scope, appeared: str,
+              disappeared: str) -> List[Tuple[str, str, Dict]]:
+        """(login, event, data) for every change between two snapshots"""
+        events = []
+        for login in scope:
+            before, after = previous.get(login), current.get(login)
+            if after and not before:
+                events.append((login, appeared, after))
+            elif before and not after:
+                events.append((login, disappeared, {'user_login': login}))
+            elif before and after and before['viewer_count'] != after['viewer_count']:
+                events.append((login, 'viewers', {'user_login': login, 'viewer_count': after['viewer_count']}))
+        return events
+
+    def _publish(self, subscriber: Subscriber, events: List[Tuple[str, str, Dict]], logins: Optional[Set[str]]) -> None:
+        """Deliver one poll's changes to a subscriber; caller holds the lock so snapshots stay ordered"""
+        if not subscriber.primed:
+            self._prime(subscriber)
+            return
+
+        counts = {}
+        for login, event, data in events:
+            if logins is not None and login not in logins:
+                continue
+            if event == 'viewers':
+                counts[login] = data['viewer_count']
+            else:
+                subscriber.deliver(event, data)
+        if counts:
+            # Viewer count deltas are batched into one event per poll
+            subscriber.deliver('viewers', {'counts': counts})
+
+
+_hub: Optional[LiveEventHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_hub() -> LiveEventHub:
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = LiveEventHub()
+    return _hub
@@ -0,0 +1,18 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = defaultdict(int)
+
+
+def increment(name: str, value: int = 1) -> None:
+    """Increment a process-wide counter"""
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot() -> Dict[str, int]:
+    """Return a copy of all counters for reporting"""
+    with _lock:
+        return dict(sorted(_counters.items()))
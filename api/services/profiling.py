@@ -0,0 +1,241 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Optional, Set, Tuple
+from django.conf import settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Request header carrying a signed profiling request: "<expires>.<signature>" (see sign())
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+class RequestProfile:
+    """Stack samples and stage timings collected for one request
+
+    Samples are taken from every thread working on the request (the request thread and, for
+    batches, the sub-request threads) and written in the folded "frame;frame;frame count"
+    format that flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, path: str, view_name: str):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{view_name}-{uuid.uuid4().hex[:8]}"
+        self.path = path
+        self.view_name = view_name
+        self.started = time.perf_counter()
+        self.threads: Set[int] = {threading.get_ident()}
+        self.samples: Counter = Counter()
+        self.stages: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def join(self, thread_id: int) -> None:
+        with self._lock:
+            self.threads.add(thread_id)
+
+    def leave(self, thread_id: int) -> None:
+        with self._lock:
+            self.threads.discard(thread_id)
+
+    def sample(self, frames: Dict) -> None:
+        with self._lock:
+            for thread_id in self.threads:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    # co_qualname is new in Python 3.11
+                    name = getattr(code, 'co_qualname', code.co_name)
+                    stack.append(f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """Samples as folded stacks, one "frame;frame;frame count" line per distinct stack"""
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self, status_code: Optional[int]) -> Dict:
+        wall = time.perf_counter() - self.started
+        with self._lock:
+            stages = {
+                name: {'calls': calls, 'total_ms': round(seconds * 1000, 2), 'share': round(seconds / wall, 3)}
+                for name, (calls, seconds) in sorted(self.stages.items(), key=lambda item: -item[1][1])
+            }
+        return {
+            'id': self.id,
+            'path': self.path,
+            'view': self.view_name,
+            'status': status_code,
+            'wall_ms': round(wall * 1000, 2),
+            'samples': self.samples.total(),
+            'interval_ms': getattr(settings, 'PROFILE_INTERVAL', 0.005) * 1000,
+            # Stages nest (a Helix call inside a handler) and overlap across threads
+            'stages': stages
+        }
+
+
+class _Sampler:
+    """One thread per process sampling the stacks of every profiled request while any is running"""
+
+    def __init__(self):
+        self._profiles: Set[RequestProfile] = set()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.add(profile)
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(target=self._run, name='request-profiler', daemon=True).start()
+
+    def remove(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self) -> None:
+        interval = getattr(settings, 'PROFILE_INTERVAL', 0.005)
+        while True:
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._running = False
+                    return
+            frames = sys._current_frames()
+            for profile in profiles:
+                try:
+                    profile.sample(frames)
+                except Exception as e:
+                    # A failing sample must not end the thread while _running still claims it is alive
+                    logger.error(f"Profiler sample of request {profile.id} failed: {e}")
+            del frames
+            time.sleep(interval)
+
+
+_sampler = _Sampler()
+_active: ContextVar[Optional[RequestProfile]] = ContextVar('request_profile', default=None)
+
+
+class _Stage:
+    __slots__ = ('profile', 'name', 'started')
+
+    def __init__(self, profile: RequestProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.record_stage(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """Context manager timing a named stage of the current request if it is being profiled"""
+    profile = _active.get()
+    if profile is None:
+        return _NO_STAGE
+    return _Stage(profile, name)
+
+
+def sign(path: str, ttl: float = 300.0) -> str:
+    """X-Profile header value requesting a profile of `path`, valid for `ttl` seconds"""
+    expires = str(int(time.time() + ttl))
+    return f"{expires}.{_signature(expires, path)}"
+
+
+def _signature(expires: str, path: str) -> str:
+    return hmac.new(settings.PROFILE_SECRET.encode('utf-8'), f"{expires}:{path}".encode('utf-8'),
+                    hashlib.sha256).hexdigest()
+
+
+def _triggered(request) -> bool:
+    header = request.META.get(PROFILE_HEADER) if settings.PROFILE_SECRET else None
+    if header:
+        expires, _, signature = header.partition('.')
+        if expires.isdigit() and int(expires) >= time.time() and \
+                hmac.compare_digest(signature, _signature(expires, request.path)):
+            return True
+        logger.warning(f"Ignoring invalid or expired {PROFILE_HEADER} header for {request.path}")
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def start(request, view_name: str) -> Optional[Tuple[RequestProfile, object]]:
+    """Begin profiling the request if it asked for it or was sampled; None otherwise
+
+    A request already being profiled (a batch sub-request) adds its thread to that profile.
+    Pass the result to finish().
+    """
+    if not settings.PROFILE_SECRET and not settings.PROFILE_SAMPLE_RATE:
+        return None
+    current = _active.get()
+    if current is not None:
+        current.join(threading.get_ident())
+        return current, None
+    if not _triggered(request):
+        return None
+    profile = RequestProfile(request.path, view_name)
+    token = _active.set(profile)
+    _sampler.add(profile)
+    metrics.increment('profiling.requests')
+    return profile, token
+
+
+def finish(started: Tuple[RequestProfile, object], status_code: Optional[int]) -> Optional[str]:
+    """Stop profiling and write <id>.folded and <id>.json to PROFILE_DIR; returns the id
+
+    For a sub-request that joined another request's profile, only its thread leaves the profile.
+    """
+    profile, token = started
+    if token is None:
+        profile.leave(threading.get_ident())
+        return None
+    _sampler.remove(profile)
+    _active.reset(token)
+    summary = profile.summary(status_code)
+    directory = settings.PROFILE_DIR
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{profile.id}.folded"), 'w', encoding='utf-8') as f:
+            f.write(profile.folded())
+        with open(os.path.join(directory, f"{profile.id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Could not write profile {profile.id}: {e}")
+    logger.info(f"Profiled {profile.path} in {summary['wall_ms']}ms ({summary['samples']} samples): "
+                f"{directory}/{profile.id}.folded")
+    return profile.id
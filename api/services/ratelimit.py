@@ -0,0 +1,178 @@
+import hashlib
+import ipaddress
+import logging
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from . import metrics
+from .cache import KEY_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# "count/period" as in django-ratelimit: 600/m, 100/5s, 10000/d
+RATE_PATTERN = re.compile(r'(\d+)/(\d*)([smhd])?', re.IGNORECASE)
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class ClientRateLimiter:
+    """Weighted per-client request limits with counters in a shared cache
+
+    Each client (API key, or IP address for anonymous requests) has a budget of `limit`
+    weight units per `period` seconds, counted with a sliding window approximated from the
+    current and previous fixed windows. The current window costs one atomic incr per request;
+    previous windows are final, so their counts are read once and kept in-process, and clients
+    already over their limit are rejected without touching the store until they may retry.
+    """
+
+    def __init__(self, cache_alias: str, limit: int, period: int):
+        self.cache_alias = cache_alias
+        self.limit = limit
+        self.period = period
+        self._lock = threading.Lock()
+        self._previous: Dict[Tuple[str, int], int] = {}
+        self._blocked: Dict[str, float] = {}
+
+    def hit(self, client: str, weight: int, limit: Optional[int] = None) -> float:
+        """Charge `weight` to a client; 0 if allowed, else seconds until it may retry"""
+        limit = self.limit if limit is None else limit
+        now = time.time()
+        blocked_until = self._blocked.get(client)
+        if blocked_until is not None:
+            if now < blocked_until:
+                return blocked_until - now
+            self._blocked.pop(client, None)
+
+        window = int(now // self.period)
+        current = self._increment(client, window, weight)
+        previous = self._previous_count(client, window - 1)
+        position = now / self.period
+        if current + previous * (window + 1 - position) <= limit:
+            return 0.0
+
+        # When the sliding count falls back under the limit if the client stops now
+        if current > limit:
+            resume = window + 2 - limit / current
+        else:
+            resume = window + 1 - (limit - current) / previous
+        retry_after = max((resume - position) * self.period, 1.0)
+        with self._lock:
+            self._blocked[client] = now + retry_after
+        return retry_after
+
+    def _key(self, client: str, window: int) -> str:
+        return f"{KEY_PREFIX}:ratelimit:{self.period}:{client}:{window}"
+
+    def _increment(self, client: str, window: int, weight: int) -> int:
+        store = caches[self.cache_alias]
+        key = self._key(client, window)
+        try:
+            return store.incr(key, weight)
+        except ValueError:
+            # First request of the window; keep the counter through the next window as well
+            if store.add(key, weight, timeout=2 * self.period + 5):
+                return weight
+            return store.incr(key, weight)
+
+    def _previous_count(self, client: str, window: int) -> int:
+        entry = (client, window)
+        count = self._previous.get(entry)
+        if count is None:
+            count = caches[self.cache_alias].get(self._key(client, window), 0)
+            with self._lock:
+                if len(self._previous) > 10000:
+                    self._previous.clear()
+                    self._blocked = {k: v for k, v in self._blocked.items() if v > time.time()}
+                self._previous[entry] = count
+        return count
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """Split a rate into the weight allowed and the period in seconds"""
+    match = RATE_PATTERN.fullmatch(rate.strip())
+    if match is None:
+        raise ImproperlyConfigured(f"Invalid RATELIMIT_RATE {rate!r}, expected e.g. '600/m'")
+    count, multiplier, unit = match.groups()
+    return int(count), PERIODS[(unit or 's').lower()] * int(multiplier or 1)
+
+
+def client_ip(request) -> str:
+    """Client address: REMOTE_ADDR, or the RATELIMIT_IP_META_KEY header set by a reverse proxy
+
+    From a forwarded-for list the last entry is used, the one our proxy appended; anything before
+    it comes from the client. IPv6 clients are counted per RATELIMIT_IPV6_MASK prefix.
+    """
+    meta_key = getattr(settings, 'RATELIMIT_IP_META_KEY', None)
+    if meta_key and '.' in meta_key:
+        ip = import_string(meta_key)(request)
+    else:
+        # Requests reaching us without passing the proxy only have the peer address
+        ip = (meta_key and request.META.get(meta_key)) or request.META.get('REMOTE_ADDR', '')
+        ip = ip.split(',')[-1].strip()
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        # Unix socket peers and malformed headers share one bucket rather than escaping the limit
+        return ip or 'unknown'
+    if address.version == 6:
+        mask = getattr(settings, 'RATELIMIT_IPV6_MASK', 64)
+    else:
+        mask = getattr(settings, 'RATELIMIT_IPV4_MASK', 32)
+    return str(ipaddress.ip_network(f"{address}/{mask}", strict=False).network_address)
+
+
+def has_api_key(request) -> bool:
+    """True if the request carries one of the configured RATELIMIT_API_KEYS"""
+    api_key = request.META.get(settings.RATELIMIT_API_KEY_HEADER)
+    return bool(api_key) and api_key in settings.RATELIMIT_API_KEYS
+
+
+def client_identity(request) -> Tuple[str, Optional[int]]:
+    """Rate-limit identity of a request and its limit: a configured API key, else the client IP"""
+    api_key = request.META.get(settings.RATELIMIT_API_KEY_HEADER)
+    if api_key and api_key in settings.RATELIMIT_API_KEYS:
+        digest = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+        return f"key:{digest}", settings.RATELIMIT_API_KEYS[api_key]
+    # Unknown keys are ignored, so rotating made-up keys does not escape the IP limit
+    return f"ip:{client_ip(request)}", None
+
+
+_limiter: Optional[ClientRateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[ClientRateLimiter]:
+    """The process-wide limiter, or None when RATELIMIT_RATE is empty"""
+    global _limiter
+    rate = getattr(settings, 'RATELIMIT_RATE', '')
+    if not rate:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                limit, period = parse_rate(rate)
+                _limiter = ClientRateLimiter(getattr(settings, 'RATELIMIT_USE_CACHE', 'default'), limit, period)
+    return _limiter
+
+
+def check_request(request, weight: int) -> float:
+    """Charge a request to its client; 0 if allowed, else seconds until it may retry"""
+    limiter = get_rate_limiter()
+    if limiter is None or weight <= 0:
+        return 0.0
+    try:
+        client, limit = client_identity(request)
+        retry_after = limiter.hit(client, weight, limit)
+    except Exception as e:
+        # Fail open: an unreachable counter store must not take the API down with it
+        logger.warning(f"Rate limit check failed, allowing request: {e}")
+        metrics.increment('ratelimit.errors')
+        return 0.0
+    if retry_after:
+        metrics.increment('ratelimit.limited')
+        metrics.increment(f"ratelimit.limited.{client.split(':', 1)[0]}")
+    return retry_after
@@ -0,0 +1,206 @@
+import sys
+from typing import Dict, Optional, Set, Tuple
+
+# URL templates Twitch uses for almost every row; rows that match keep None instead of the string
+STREAM_THUMBNAIL = 'https://static-cdn.jtvnw.net/previews-ttv/live_user_{login}-{{width}}x{{height}}.jpg'
+BOX_ART = 'https://static-cdn.jtvnw.net/ttv-boxart/{id}-{{width}}x{{height}}.jpg'
+VOD_URL = 'https://www.twitch.tv/videos/{id}'
+# VOD thumbnails differ per VOD only in this path, so records keep just the path
+VOD_THUMBNAIL = 'https://static-cdn.jtvnw.net/cf_vods/{path}/thumb/thumb0-%{{width}}x%{{height}}.jpg'
+VOD_THUMBNAIL_PREFIX, VOD_THUMBNAIL_SUFFIX = VOD_THUMBNAIL.format(path='\n').split('\n')
+
+THUMBNAIL_SIZES = (('small', '320', '180'), ('medium', '640', '360'), ('large', '1920', '1080'))
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Share one copy of a low-cardinality string (game names, languages, tags) across all records"""
+    return sys.intern(value) if value else value
+
+
+def thumbnails(template: str, width: str = '{width}', height: str = '{height}') -> Dict[str, str]:
+    """small/medium/large URLs expanded from a thumbnail template"""
+    return {name: template.replace(width, w).replace(height, h) for name, w, h in THUMBNAIL_SIZES}
+
+
+class CompactRecord:
+    """Base for slotted records kept in caches in place of Helix dicts
+
+    Records pickle as a plain tuple of their slots and re-intern their shared strings on load,
+    so entries read back from a cache backend stay as small as the ones built in-process.
+    """
+
+    __slots__ = ()
+    # Slots holding low-cardinality strings
+    INTERNED: Tuple[str, ...] = ()
+
+    def __getstate__(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: Tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+        for name in self.INTERNED:
+            object.__setattr__(self, name, _intern(getattr(self, name)))
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.__getstate__() == other.__getstate__()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={getattr(self, 'id', None)!r})"
+
+
+class StreamRecord(CompactRecord):
+    """One live stream from Helix /streams"""
+
+    __slots__ = ('id', 'user_id', 'user_login', 'user_name', 'game_id', 'game_name', 'type', 'title',
+                 'viewer_count', 'started_at', 'language', '_thumbnail_url', 'tags', 'is_mature')
+    INTERNED = ('game_id', 'game_name', 'type', 'language')
+
+    @classmethod
+    def from_helix(cls, stream: Dict) -> 'StreamRecord':
+        """Build from a Helix stream object; KeyError if a required field is missing"""
+        record = cls.__new__(cls)
+        record.id = stream['id']
+        record.user_id = stream['user_id']
+        record.user_login = stream['user_login']
+        record.user_name = stream['user_name']
+        record.game_id = _intern(stream.get('game_id'))
+        record.game_name = _intern(stream.get('game_name', 'No Category'))
+        record.type = _intern(stream.get('type', 'live'))
+        record.title = stream['title']
+        record.viewer_count = stream['viewer_count']
+        record.started_at = stream['started_at']
+        record.language = _intern(stream['language'])
+        thumbnail_url = stream['thumbnail_url']
+        record._thumbnail_url = (
+            None if thumbnail_url == STREAM_THUMBNAIL.format(login=record.user_login) else thumbnail_url
+        )
+        record.tags = tuple(_intern(tag) for tag in stream.get('tags') or ())
+        record.is_mature = stream.get('is_mature', False)
+        return record
+
+    def __setstate__(self, state: Tuple) -> None:
+        super().__setstate__(state)
+        self.tags = tuple(_intern(tag) for tag in self.tags)
+
+    @property
+    def thumbnail_url(self) -> str:
+        return self._thumbnail_url or STREAM_THUMBNAIL.format(login=self.user_login)
+
+    def to_response(self, hls_url: Optional[str], fields: Optional[Set[str]] = None) -> Dict:
+        """The stream in API response shape; thumbnail sizes only if requested"""
+        thumbnail_url = self.thumbnail_url
+        data = {
+            'user_name': self.user_name,
+            'viewer_count': self.viewer_count,
+            'thumbnail_url': thumbnail_url,
+            'stream_url': f"https://twitch.tv/{self.user_login}",  # Keep for fallback
+            'hls_url': hls_url,  # Add direct HLS URL
+            'id': self.id,
+            'user_id': self.user_id,
+            'user_login': self.user_login,
+            'game_id': self.game_id,
+            'game_name': self.game_name,
+            'title': self.title,
+            'started_at': self.started_at,
+            'language': self.language,
+            'tags': list(self.tags),
+            'is_mature': self.is_mature,
+            'type': self.type,
+            'profile_image_url': None
+        }
+        if fields is None or 'thumbnail' in fields:
+            data['thumbnail'] = thumbnails(thumbnail_url)
+        return data
+
+
+class CategoryRecord(CompactRecord):
+    """One game/category from Helix /games/top or /search/categories"""
+
+    __slots__ = ('id', 'name', '_box_art_url', 'igdb_id')
+    INTERNED = ('name',)
+
+    @classmethod
+    def from_helix(cls, category: Dict) -> 'CategoryRecord':
+        record = cls.__new__(cls)
+        record.id = category['id']
+        record.name = _intern(category['name'])
+        box_art_url = category['box_art_url']
+        record._box_art_url = None if box_art_url == BOX_ART.format(id=record.id) else box_art_url
+        record.igdb_id = category.get('igdb_id', '')
+        return record
+
+    @property
+    def box_art_url(self) -> str:
+        return self._box_art_url or BOX_ART.format(id=self.id)
+
+    def to_response(self, fields: Optional[Set[str]] = None) -> Dict:
+        """The category in API response shape; thumbnail sizes only if requested"""
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'box_art_url': self.box_art_url,
+            'igdb_id': self.igdb_id
+        }
+        if fields is None or 'thumbnail' in fields:
+            data['thumbnail'] = thumbnails(self.box_art_url)
+        return data
+
+
+class VODRecord(CompactRecord):
+    """One archived broadcast from Helix /videos"""
+
+    __slots__ = ('id', 'user_id', 'user_login', 'user_name', 'title', 'created_at', 'duration',
+                 'view_count', '_url', '_thumbnail', 'type')
+    INTERNED = ('user_login', 'user_name', 'type')
+
+    @classmethod
+    def from_helix(cls, vod: Dict) -> 'VODRecord':
+        record = cls.__new__(cls)
+        record.id = vod['id']
+        record.user_id = vod['user_id']
+        # A channel's VODs are cached together, so these repeat row after row
+        record.user_login = _intern(vod['user_login'])
+        record.user_name = _intern(vod['user_name'])
+        record.title = vod['title']
+        record.created_at = vod['created_at']
+        record.duration = vod.get('duration', '')
+        record.view_count = vod.get('view_count', 0)
+        record._url = None if vod['url'] == VOD_URL.format(id=record.id) else vod['url']
+        thumbnail_url = vod.get('thumbnail_url', '')
+        path = thumbnail_url[len(VOD_THUMBNAIL_PREFIX):-len(VOD_THUMBNAIL_SUFFIX)]
+        templated = thumbnail_url.startswith(VOD_THUMBNAIL_PREFIX) and thumbnail_url.endswith(VOD_THUMBNAIL_SUFFIX)
+        record._thumbnail = path if templated and path and '://' not in path else thumbnail_url
+        record.type = _intern(vod.get('type', 'archive'))
+        return record
+
+    @property
+    def url(self) -> str:
+        return self._url or VOD_URL.format(id=self.id)
+
+    @property
+    def thumbnail_url(self) -> str:
+        # _thumbnail is the path within VOD_THUMBNAIL, or the whole URL if it follows another pattern
+        if not self._thumbnail or '://' in self._thumbnail:
+            return self._thumbnail
+        return VOD_THUMBNAIL.format(path=self._thumbnail)
+
+    def to_response(self, hls_url: Optional[str], fields: Optional[Set[str]] = None) -> Dict:
+        """The VOD in API response shape; thumbnail sizes only if requested"""
+        data = {
+            'id': self.id,
+            'user_id': self.user_id,
+            'user_login': self.user_login,
+            'user_name': self.user_name,
+            'title': self.title,
+            'created_at': self.created_at,
+            'duration': self.duration,
+            'view_count': self.view_count,
+            'url': self.url,  # Keep for fallback
+            'hls_url': hls_url,  # Add direct HLS URL
+            'thumbnail_url': self.thumbnail_url,
+            'type': self.type
+        }
+        if fields is None or 'thumbnail' in fields:
+            data['thumbnail'] = thumbnails(self.thumbnail_url, '%{width}', '%{height}')
+        return data
@@ -0,0 +1,235 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+from django.conf import settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class CircuitBreaker:
+    """Per-dependency circuit breaker (closed -> open -> half-open -> closed)"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go upstream; open circuits fail fast"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                # Let exactly one probe through to test recovery
+                self._probe_in_flight = True
+                return True
+            metrics.increment(f"circuit.{self.name}.rejected")
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self._state != self.OPEN:
+                    self._transition(self.OPEN)
+
+    def release(self) -> None:
+        """Forget an in-flight call without counting it either way"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def status(self) -> Dict:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'opened_seconds_ago': round(time.monotonic() - self._opened_at, 1) if self._state != self.CLOSED else None
+            }
+
+    def _maybe_half_open(self) -> None:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._transition(self.HALF_OPEN)
+
+    def _transition(self, new_state: str) -> None:
+        logger.warning(f"Circuit '{self.name}' changed state: {self._state} -> {new_state}")
+        metrics.increment(f"circuit.{self.name}.{new_state}")
+        self._state = new_state
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get (or lazily create) the process-wide breaker for a dependency"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=getattr(settings, 'TWITCH_CIRCUIT_FAILURE_THRESHOLD', 5),
+                    recovery_timeout=getattr(settings, 'TWITCH_CIRCUIT_RECOVERY_TIMEOUT', 30.0)
+                )
+                _breakers[name] = breaker
+    return breaker
+
+
+def breaker_states() -> Dict[str, Dict]:
+    """Snapshot of every known breaker, for the health endpoint"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.status() for breaker in sorted(breakers, key=lambda b: b.name)}
+
+
+class LatencyTracker:
+    """Rolling window of recent latencies used to derive the hedging delay"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(name: str) -> LatencyTracker:
+    tracker = _trackers.get(name)
+    if tracker is None:
+        with _trackers_lock:
+            tracker = _trackers.setdefault(name, LatencyTracker())
+    return tracker
+
+
+class RetryBudget:
+    """Token bucket that caps retries at a fraction of calls to avoid retry storms"""
+
+    def __init__(self, ratio: float = 0.1, reserve: float = 10.0):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._balance = reserve
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        """Every first attempt earns a fraction of a retry"""
+        with self._lock:
+            self._balance = min(self.reserve, self._balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget, if there is one left"""
+        with self._lock:
+            if self._balance >= 1:
+                self._balance -= 1
+                return True
+            return False
+
+    @property
+    def balance(self) -> float:
+        with self._lock:
+            return self._balance
+
+
+_retry_budget: Optional[RetryBudget] = None
+
+
+def get_retry_budget() -> RetryBudget:
+    """Process-wide retry budget shared by every upstream dependency"""
+    global _retry_budget
+    if _retry_budget is None:
+        with _breakers_lock:
+            if _retry_budget is None:
+                _retry_budget = RetryBudget(
+                    ratio=getattr(settings, 'TWITCH_RETRY_BUDGET_RATIO', 0.1),
+                    reserve=getattr(settings, 'TWITCH_RETRY_BUDGET_RESERVE', 10.0)
+                )
+    return _retry_budget
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='hedge')
+
+
+def hedged_call(name: str, func: Callable[[], T]) -> T:
+    """Run an idempotent call, firing a backup copy if the first one is slower than p95"""
+    tracker = get_latency_tracker(name)
+    delay = tracker.percentile(95, getattr(settings, 'TWITCH_HEDGE_MIN_SAMPLES', 20))
+
+    def timed() -> T:
+        started = time.monotonic()
+        result = func()
+        tracker.record(time.monotonic() - started)
+        return result
+
+    if not getattr(settings, 'TWITCH_HEDGED_REQUESTS', False) or delay is None:
+        return timed()
+
+    delay = max(delay, getattr(settings, 'TWITCH_HEDGE_MIN_DELAY', 0.05))
+    primary = _hedge_executor.submit(timed)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    metrics.increment(f"hedge.{name}.sent")
+    backup = _hedge_executor.submit(timed)
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is backup:
+                    metrics.increment(f"hedge.{name}.won")
+                return future.result()
+            error = future.exception()
+    raise error
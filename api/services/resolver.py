@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from . import metrics
+from .errors import TwitchAPIError
+
+logger = logging.getLogger(__name__)
+
+# Streamlink service kept warm in each pool process
+_worker_service = None
+
+
+def _init_worker() -> None:
+    """Pool process initializer: set up Django and load the Streamlink plugins once"""
+    global _worker_service
+    import django
+    django.setup()
+    from .streamlink import StreamlinkService
+
+    _worker_service = StreamlinkService()
+    _worker_service.session.resolve_url("https://twitch.tv/preload")
+
+
+def _resolve_in_worker(url: str, timeout: float) -> Dict:
+    try:
+        return {'variants': _worker_service._fetch_local(url, timeout)}
+    except TwitchAPIError as e:
+        return {'error': str(e), 'status': e.status_code}
+    except Exception as e:
+        return {'error': str(e), 'status': None}
+
+
+class ResolverDaemon:
+    """Streamlink resolution sidecar: a process pool behind a Unix socket
+
+    Web workers send newline-delimited JSON requests ({"url": ..., "timeout": ...}). Concurrent
+    requests for the same URL share one resolution, and results are kept for a few seconds so
+    every worker asking for a popular channel is answered by the same Streamlink call.
+    """
+
+    def __init__(self, socket_path: str, workers: int = 2, result_ttl: float = 5.0):
+        self.socket_path = socket_path
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.stats: Counter = Counter()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._results: Dict[str, Tuple[float, Dict]] = {}
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    def serve_forever(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        # Spawned rather than forked: the daemon runs an event loop and threads by now
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker
+        )
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"Streamlink resolver listening on {self.socket_path} with {self.workers} workers")
+        # Stop cleanly on SIGTERM/SIGINT so pool processes are not left behind
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stopping.set)
+        try:
+            async with server:
+                await stopping.wait()
+            logger.info("Streamlink resolver shutting down")
+            # Closing the client connections lets their handlers finish instead of being cancelled
+            for writer in list(self._connections):
+                writer.close()
+            if self._connections:
+                await asyncio.wait(list(self._connections.values()), timeout=1.0)
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                if request.get('op') == 'stats':
+                    response = {'stats': dict(self.stats), 'inflight': len(self._inflight)}
+                else:
+                    response = await self.resolve(request['url'], float(request.get('timeout', 10)))
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError, KeyError) as e:
+            logger.warning(f"Dropping resolver connection: {e}")
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def resolve(self, url: str, timeout: float) -> Dict:
+        self.stats['requests'] += 1
+        cached = self._results.get(url)
+        if cached and cached[0] > time.monotonic():
+            self.stats['cache_hits'] += 1
+            return cached[1]
+
+        future = self._inflight.get(url)
+        if future is not None:
+            self.stats['deduplicated'] += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, _resolve_in_worker, url, timeout)
+        self._inflight[url] = future
+        try:
+            result = await asyncio.shield(future)
+        except Exception as e:
+            # A crashed pool process; report it like any other resolution failure
+            result = {'error': f"Resolver worker failed: {e}", 'status': None}
+        finally:
+            self._inflight.pop(url, None)
+        self.stats['resolved'] += 1
+        self._results[url] = (time.monotonic() + self.result_ttl, result)
+        if len(self._results) > 10000:
+            now = time.monotonic()
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+        return result
+
+
+class ResolverClient:
+    """Blocking client for ResolverDaemon with one persistent connection per thread"""
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._local = threading.local()
+
+    def resolve(self, url: str, timeout: float) -> Dict[str, str]:
+        """Variants for url; TwitchAPIError for resolution errors, OSError if the daemon is unreachable"""
+        payload = json.dumps({'url': url, 'timeout': timeout}).encode('utf-8') + b'\n'
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                # Allow for the resolution itself plus queueing in the daemon
+                conn.settimeout(timeout + 1.0)
+                conn.sendall(payload)
+                line = self._local.file.readline()
+                if not line:
+                    raise ConnectionError("resolver closed the connection")
+                break
+            except socket.timeout:
+                self._close()
+                raise TwitchAPIError(f"Stream resolver timed out resolving {url}", None)
+            except OSError:
+                # Stale keep-alive connection (daemon restarted): reconnect once
+                self._close()
+                if attempt:
+                    raise
+
+        response = json.loads(line)
+        metrics.increment('resolver.requests')
+        if 'error' in response:
+            raise TwitchAPIError(response['error'], response.get('status'))
+        return response['variants']
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.socket_path)
+            except OSError:
+                conn.close()
+                raise
+            self._local.conn = conn
+            self._local.file = conn.makefile('rb')
+        return conn
+
+    def _close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                self._local.file.close()
+                conn.close()
+            except OSError:
+                pass
+        self._local.conn = None
+
+
+_clients: Dict[str, ResolverClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(socket_path: str) -> ResolverClient:
+    with _clients_lock:
+        client = _clients.get(socket_path)
+        if client is None:
+            client = ResolverClient(socket_path)
+            _clients[socket_path] = client
+        return client
@@ -0,0 +1,240 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from . import metrics
+from .cache import get_generation
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip and identity variants are stored
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> (file suffix, Content-Encoding) in order of preference
+ENCODINGS = {
+    'br': ('.br', 'br'),
+    'gzip': ('.gz', 'gzip'),
+    'identity': ('', None),
+}
+
+
+def accepted_encodings(header: str) -> List[str]:
+    """Encodings from an Accept-Encoding header that the client accepts (q > 0)"""
+    accepted = []
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.append(name.strip().lower())
+    return accepted
+
+
+class ResponseCache:
+    """Finished response bodies shared by every worker process through files on tmpfs
+
+    Each entry is an identity, gzip and (with the brotli package) brotli encoding of one rendered
+    response, plus a small metadata file with its ETag and expiry. Hits are answered with a
+    FileResponse of the negotiated variant, which gunicorn sends with sendfile(), so a hit costs a
+    metadata read and an open() instead of serialization and compression.
+    """
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key_for(self, request) -> str:
+        return self.key_for_path(request.path, request.META.get('QUERY_STRING', ''))
+
+    @staticmethod
+    def key_for_path(path: str, query_string: str) -> str:
+        """Entry key: path and query string plus the stream-list generation (bumped by EventSub)"""
+        raw = f"{get_generation('streams')}:{path}?{query_string}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def serve(self, request, key: str, stale: bool = False):
+        """Response for a cached entry (304 if the client has it), or None on a miss
+
+        With stale, an expired entry that has not been swept yet is served, marked stale.
+        """
+        found = self.negotiate(key, request.META.get('HTTP_IF_NONE_MATCH', ''),
+                               request.META.get('HTTP_ACCEPT_ENCODING', ''), stale)
+        if found is None:
+            return None
+        meta, variant = found
+        if variant is None:
+            response = HttpResponseNotModified()
+            response['ETag'] = meta['etag']
+            return response
+
+        try:
+            body = open(self.variant_path(key, meta, variant), 'rb')
+        except FileNotFoundError:
+            # Replaced by a newer render between reading the metadata and opening the file
+            metrics.increment('response_cache.miss')
+            return None
+        response = FileResponse(body, content_type=meta['content_type'])
+        # FileResponse derives an inline Content-Disposition from the file name; not wanted here
+        del response['Content-Disposition']
+        for name, value in self.entry_headers(meta, variant, stale):
+            response[name] = value
+        metrics.increment('response_cache.hit')
+        return response
+
+    def negotiate(self, key: str, if_none_match: str, accept_encoding: str,
+                  stale: bool = False) -> Optional[Tuple[Dict, Optional[str]]]:
+        """Metadata of a cached entry and the variant to send (None if the client has it), or None on a miss"""
+        meta = self._read_meta(key, allow_expired=stale)
+        if meta is None:
+            metrics.increment('response_cache.miss')
+            return None
+        if meta['etag'] in if_none_match:
+            metrics.increment('response_cache.not_modified')
+            return meta, None
+
+        accepted = accepted_encodings(accept_encoding)
+        for variant in meta['variants']:
+            if variant == 'identity' or variant in accepted:
+                return meta, variant
+        metrics.increment('response_cache.miss')
+        return None
+
+    def variant_path(self, key: str, meta: Dict, variant: str) -> str:
+        return self._path(key, meta['etag'], variant)
+
+    @staticmethod
+    def entry_headers(meta: Dict, variant: str, stale: bool = False) -> List[Tuple[str, str]]:
+        """Headers describing a variant of an entry, besides its Content-Type"""
+        headers = [('ETag', meta['etag']), ('Vary', 'Accept-Encoding')]
+        encoding = ENCODINGS[variant][1]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        if stale and meta['expires'] < time.time():
+            headers.append(('Warning', '110 - "Response is Stale"'))
+        return headers
+
+    def store(self, key: str, body: bytes, content_type: str) -> str:
+        """Write all variants of a rendered body; returns its ETag"""
+        etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=6)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(body, quality=5)
+
+        previous = self._read_meta(key, allow_expired=True)
+        for variant, data in variants.items():
+            self._write_atomic(self._path(key, etag, variant), data)
+        meta = {
+            'etag': etag,
+            'expires': time.time() + self.ttl,
+            'content_type': content_type,
+            # Preference order for negotiation, identity last
+            'variants': [name for name in ENCODINGS if name in variants]
+        }
+        self._write_atomic(self._meta_path(key), json.dumps(meta).encode('utf-8'))
+        if previous and previous['etag'] != etag:
+            self._remove_variants(key, previous)
+        metrics.increment('response_cache.stored')
+        self._maybe_sweep()
+        return etag
+
+    def _read_meta(self, key: str, allow_expired: bool = False) -> Optional[Dict]:
+        try:
+            with open(self._meta_path(key), 'rb') as f:
+                meta = json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        if not allow_expired and meta['expires'] < time.time():
+            return None
+        return meta
+
+    def _maybe_sweep(self) -> None:
+        """Delete expired entries, at most once a minute per process"""
+        now = time.time()
+        if now - self._last_sweep < 60 or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            for name in os.listdir(self.directory):
+                if not name.endswith('.meta'):
+                    continue
+                key = name[:-len('.meta')]
+                meta = self._read_meta(key, allow_expired=True)
+                # Keep a grace period so readers holding the metadata can still open the files
+                if meta is None or meta['expires'] + 60 < now:
+                    self._remove_variants(key, meta)
+                    self._unlink(self._meta_path(key))
+        finally:
+            self._sweep_lock.release()
+
+    def _remove_variants(self, key: str, meta: Optional[Dict]) -> None:
+        if meta is None:
+            return
+        for variant in meta['variants']:
+            self._unlink(self._path(key, meta['etag'], variant))
+
+    def _path(self, key: str, etag: str, variant: str) -> str:
+        digest = etag.strip('"')
+        return os.path.join(self.directory, f"{key}.{digest}.json{ENCODINGS[variant][0]}")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.meta")
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """The shared response cache, or None when RESPONSE_CACHE_TTL is 0"""
+    global _response_cache
+    if not getattr(settings, 'RESPONSE_CACHE_TTL', 0):
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(settings.RESPONSE_CACHE_DIR, settings.RESPONSE_CACHE_TTL)
+    return _response_cache
+
+
+def cacheable_body(response) -> Optional[Tuple[bytes, str]]:
+    """Rendered JSON body and content type of a successful, fresh DRF response, else None"""
+    if response.status_code != 200 or response.has_header('Warning'):
+        return None
+    renderer = getattr(response, 'accepted_renderer', None)
+    if renderer is None or renderer.format != 'json':
+        return None
+    response.render()
+    return response.content, response['Content-Type']
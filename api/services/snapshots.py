@@ -0,0 +1,162 @@
+import base64
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics
+from .cache import KEY_PREFIX
+
+logger = logging.getLogger(__name__)
+
+
+class StreamSnapshot:
+    """A ranked stream list frozen at one point in time, extended only by appending"""
+
+    def __init__(self, key: str, params: Dict, items: List[Dict], after: Optional[str],
+                 snapshot_id: Optional[str] = None, created: Optional[float] = None):
+        self.id = snapshot_id or uuid.uuid4().hex[:16]
+        self.key = key
+        self.params = params
+        self.items = items
+        # Helix cursor to continue the walk from, None once the list is exhausted
+        self.after = after
+        self.created = created if created is not None else time.time()
+        self.lock = threading.Lock()
+
+    def age(self) -> float:
+        return time.time() - self.created
+
+    def to_dict(self) -> Dict:
+        return {'id': self.id, 'key': self.key, 'params': self.params, 'items': self.items,
+                'after': self.after, 'created': self.created}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StreamSnapshot':
+        return cls(data['key'], data['params'], data['items'], data['after'], data['id'], data['created'])
+
+
+class SnapshotStore:
+    """LRU of stream snapshots, evicted by count and age
+
+    Snapshots are also written to the Django cache, so with a shared cache backend a cursor
+    issued by one worker can be served by another.
+    """
+
+    def __init__(self, max_entries: int, max_age: float):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshots: 'OrderedDict[str, StreamSnapshot]' = OrderedDict()
+        self._latest: Dict[str, str] = {}
+        # Striped so concurrent builds for one key serialize without a lock per key ever seen
+        self._build_locks = [threading.Lock() for _ in range(64)]
+
+    def get(self, snapshot_id: str) -> Optional[StreamSnapshot]:
+        with self._lock:
+            snapshot = self._snapshots.get(snapshot_id)
+            if snapshot is not None:
+                self._snapshots.move_to_end(snapshot_id)
+        if snapshot is None:
+            data = cache.get(self._cache_key(snapshot_id))
+            if data is not None:
+                snapshot = StreamSnapshot.from_dict(data)
+                self._remember(snapshot)
+        if snapshot is None or snapshot.age() > self.max_age:
+            return None
+        return snapshot
+
+    def latest(self, key: str, max_age: float, build: Callable[[], StreamSnapshot]) -> StreamSnapshot:
+        """Newest snapshot for key if younger than max_age, otherwise one freshly built
+
+        Concurrent callers for the same key wait for a single build.
+        """
+        snapshot = self._fresh_latest(key, max_age)
+        if snapshot is not None:
+            return snapshot
+        with self._build_locks[hash(key) % len(self._build_locks)]:
+            snapshot = self._fresh_latest(key, max_age)
+            if snapshot is None:
+                snapshot = build()
+                self.put(snapshot)
+            return snapshot
+
+    def put(self, snapshot: StreamSnapshot) -> None:
+        self._remember(snapshot)
+        with self._lock:
+            self._latest[snapshot.key] = snapshot.id
+        cache.set(self._cache_key(snapshot.id), snapshot.to_dict(), int(self.max_age))
+        cache.set(f"{KEY_PREFIX}:snapshot-latest:{snapshot.key}", snapshot.id, int(self.max_age))
+        metrics.increment('snapshots.built')
+
+    def save(self, snapshot: StreamSnapshot) -> None:
+        """Persist a snapshot that grew, keeping its original expiry"""
+        remaining = int(self.max_age - snapshot.age())
+        if remaining > 0:
+            cache.set(self._cache_key(snapshot.id), snapshot.to_dict(), remaining)
+
+    def _fresh_latest(self, key: str, max_age: float) -> Optional[StreamSnapshot]:
+        with self._lock:
+            snapshot_id = self._latest.get(key)
+        if snapshot_id is None:
+            snapshot_id = cache.get(f"{KEY_PREFIX}:snapshot-latest:{key}")
+        if snapshot_id is None:
+            return None
+        snapshot = self.get(snapshot_id)
+        if snapshot is None or snapshot.age() > max_age:
+            return None
+        return snapshot
+
+    def _remember(self, snapshot: StreamSnapshot) -> None:
+        with self._lock:
+            self._snapshots[snapshot.id] = snapshot
+            self._snapshots.move_to_end(snapshot.id)
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+                metrics.increment('snapshots.evicted')
+            # Drop expired snapshots from the cold end
+            while self._snapshots:
+                oldest = next(iter(self._snapshots.values()))
+                if oldest.age() <= self.max_age:
+                    break
+                self._snapshots.popitem(last=False)
+                metrics.increment('snapshots.expired')
+
+    @staticmethod
+    def _cache_key(snapshot_id: str) -> str:
+        return f"{KEY_PREFIX}:snapshot:{snapshot_id}"
+
+
+def encode_cursor(snapshot_id: str, offset: int) -> str:
+    """Opaque API cursor: a snapshot id plus an offset into that snapshot"""
+    raw = json.dumps({'s': snapshot_id, 'o': offset}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_cursor; raises ValueError for anything we did not issue"""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(decoded['s']), max(0, int(decoded['o']))
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+_store: Optional[SnapshotStore] = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> SnapshotStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SnapshotStore(
+                    getattr(settings, 'STREAM_SNAPSHOT_MAX_ENTRIES', 256),
+                    getattr(settings, 'STREAM_SNAPSHOT_MAX_AGE', 300.0)
+                )
+    return _store
@@ -1,69 +1,201 @@
 import logging
-from typing import Optional
-from streamlink import Streamlink
-from streamlink.stream import HLSStream
+import time
+from typing import Dict, List, Optional
+from django.conf import settings
+from . import deadline, metrics, profiling
+from .cache import get_or_compute, get_stale, hls_key, make_key, mark_stale_served, set_stale, vod_hls_key
+from .cassette import get_cassette, streamlink_key
 from .errors import TwitchAPIError
+from .resilience import get_breaker
+from .resolver import get_client
 
 logger = logging.getLogger(__name__)
 
+# Variant-map entry holding the master (multivariant) playlist URL, when Streamlink reports one
+MASTER_PLAYLIST = 'master'
+# Names Streamlink adds as aliases of real variants
+QUALITY_ALIASES = ('best', 'worst')
+
+
+def qualities(hls_streams: Dict[str, str]) -> List[str]:
+    """Stream qualities in a variant map, without the master playlist entry"""
+    return [name for name in hls_streams if name != MASTER_PLAYLIST]
+
+
 class StreamlinkService:
     """Service class for extracting direct HLS URLs using Streamlink for public APIs"""
-    
+
+    HTTP_TIMEOUT = 10
+
     def __init__(self):
-        self.session = Streamlink()
-        # Set timeout for reliability
-        self.session.set_option("http-timeout", 10)
-    
-    def get_stream_hls_url(self, user_login: str, quality: str = "best") -> Optional[str]:
-        """Extract direct HLS URL for a live stream"""
+        self._session = None
+
+    @property
+    def session(self):
+        """Streamlink session, created on first use so importing this module stays cheap"""
+        if self._session is None:
+            # Streamlink and its plugin machinery are heavy; only pay for them when resolving
+            from streamlink import Streamlink
+
+            session = Streamlink()
+            # Set timeout for reliability
+            session.set_option("http-timeout", self.HTTP_TIMEOUT)
+            for plugin_dir in getattr(settings, 'STREAMLINK_PLUGIN_DIRS', []):
+                session.plugins.load_path(plugin_dir)
+            self._session = session
+        return self._session
+
+    def get_stream_variants(self, user_login: str) -> Dict[str, str]:
+        """Playlist URLs of a live stream by quality (plus MASTER_PLAYLIST); empty when offline"""
         url = f"https://twitch.tv/{user_login}"
+        # Cached per login until it expires or an EventSub online/offline event drops it
+        return get_or_compute(
+            hls_key(user_login), getattr(settings, 'HLS_CACHE_TTL', 0), lambda: self._resolve(url, 'streamlink:live')
+        )
+
+    def get_stream_hls_url(self, user_login: str, quality: str = "best") -> Optional[str]:
+        """Extract direct HLS URL for a live stream, or its manifest proxy URL when HLS_PROXY_URL is set"""
         try:
-            streams = self.session.streams(url)
-            if not streams:
-                logger.warning(f"No streams available for {user_login}")
-                raise TwitchAPIError(f"No streams available for {user_login}", 404)
-            
-            hls_streams = {name: stream for name, stream in streams.items() if isinstance(stream, HLSStream)}
+            hls_streams = self.get_stream_variants(user_login)
             if not hls_streams:
                 logger.warning(f"No HLS streams available for {user_login}")
                 raise TwitchAPIError(f"No HLS streams available for {user_login}", 404)
-            
-            if quality not in hls_streams:
-                available = list(hls_streams.keys())
+
+            if quality == MASTER_PLAYLIST or quality not in hls_streams:
+                available = qualities(hls_streams)
                 logger.warning(f"Quality '{quality}' not available for {user_login}. Options: {available}")
                 raise TwitchAPIError(f"Quality '{quality}' not available. Options: {available}", 400)
-            
-            direct_m3u8_url = hls_streams[quality].url
+
+            proxy_url = getattr(settings, 'HLS_PROXY_URL', '')
+            if proxy_url:
+                # Players poll the playlist through the shared manifest proxy; segments stay on the CDN.
+                # Aliases use the real variant's name so both share one cached playlist.
+                name = next((name for name in qualities(hls_streams)
+                             if name not in QUALITY_ALIASES and hls_streams[name] == hls_streams[quality]), quality)
+                return f"{proxy_url.rstrip('/')}/{user_login.lower()}/{name}.m3u8"
+
+            direct_m3u8_url = hls_streams[quality]
             logger.info(f"Extracted HLS URL for {user_login}: {direct_m3u8_url}")
             return direct_m3u8_url
-        
+
         except Exception as e:
             logger.error(f"Error extracting HLS URL for {user_login}: {e}")
             raise TwitchAPIError(f"Failed to extract HLS URL: {str(e)}", None)
-    
+
     def get_vod_hls_url(self, vod_id: str, quality: str = "best") -> Optional[str]:
         """Extract direct HLS URL for a VOD"""
         url = f"https://www.twitch.tv/videos/{vod_id}"
         try:
-            streams = self.session.streams(url)
-            if not streams:
-                logger.warning(f"No VOD streams available for ID {vod_id}")
-                raise TwitchAPIError(f"No VOD streams available for ID {vod_id}", 404)
-            
-            hls_streams = {name: stream for name, stream in streams.items() if isinstance(stream, HLSStream)}
+            # Empty results (a VOD still processing, or gone) are not kept
+            hls_streams = get_or_compute(
+                vod_hls_key(vod_id), getattr(settings, 'VOD_HLS_CACHE_TTL', 0),
+                lambda: self._resolve(url, 'streamlink:vod') or None
+            )
             if not hls_streams:
                 logger.warning(f"No HLS streams available for VOD {vod_id}")
                 raise TwitchAPIError(f"No HLS streams available for VOD {vod_id}", 404)
-            
-            if quality not in hls_streams:
-                available = list(hls_streams.keys())
+
+            if quality == MASTER_PLAYLIST or quality not in hls_streams:
+                available = qualities(hls_streams)
                 logger.warning(f"Quality '{quality}' not available for VOD {vod_id}. Options: {available}")
                 raise TwitchAPIError(f"Quality '{quality}' not available. Options: {available}", 400)
-            
-            direct_m3u8_url = hls_streams[quality].url
+
+            direct_m3u8_url = hls_streams[quality]
             logger.info(f"Extracted HLS URL for VOD {vod_id}: {direct_m3u8_url}")
             return direct_m3u8_url
-        
+
         except Exception as e:
             logger.error(f"Error extracting HLS URL for VOD {vod_id}: {e}")
-            raise TwitchAPIError(f"Failed to extract VOD HLS URL: {str(e)}", None)
\ No newline at end of file
+            raise TwitchAPIError(f"Failed to extract VOD HLS URL: {str(e)}", None)
+
+    def _resolve(self, url: str, breaker_name: str) -> Dict[str, str]:
+        """Resolve a Twitch URL into a {quality: m3u8 url} map behind a circuit breaker"""
+        # Never let Streamlink outlive the request's remaining budget
+        timeout = deadline.timeout_for(self.HTTP_TIMEOUT)
+        breaker = get_breaker(breaker_name)
+        stale_key = make_key('streamlink', url)
+
+        if not breaker.allow_request():
+            stale = get_stale(stale_key)
+            if stale is None:
+                raise TwitchAPIError(f"Streamlink resolution is temporarily unavailable ({breaker_name})", 503)
+            logger.info(f"Serving stale HLS variants for {url}")
+            mark_stale_served()
+            return stale
+
+        try:
+            with profiling.stage(breaker_name.replace(':', '.')):
+                hls_streams = self._fetch_variants(url, timeout)
+        except Exception as e:
+            # A missing channel or VOD means Streamlink answered; only outages and timeouts count
+            # against the breaker and fall back to the last variants seen for the URL
+            client_error = isinstance(e, TwitchAPIError) and e.status_code is not None and e.status_code < 500
+            if client_error:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+                stale = get_stale(stale_key)
+                if stale is not None:
+                    logger.warning(f"Resolving {url} failed ({e}), serving stale HLS variants")
+                    metrics.increment('streamlink.stale_fallback')
+                    mark_stale_served()
+                    return stale
+            raise
+        breaker.record_success()
+
+        # An offline channel or missing VOD resolves to no streams; that is not an outage
+        if hls_streams:
+            set_stale(stale_key, hls_streams, durable=breaker_name == 'streamlink:live')
+        return hls_streams
+
+    def _fetch_variants(self, url: str, timeout: float) -> Dict[str, str]:
+        """Resolve url through the resolver daemon when one is configured, otherwise in-process"""
+        socket_path = getattr(settings, 'STREAMLINK_RESOLVER_SOCKET', '')
+        if not socket_path:
+            return self._fetch_local(url, timeout)
+        try:
+            return get_client(socket_path).resolve(url, timeout)
+        except OSError as e:
+            metrics.increment('resolver.unavailable')
+            if not getattr(settings, 'STREAMLINK_RESOLVER_FALLBACK', True):
+                raise TwitchAPIError(f"Stream resolver unavailable: {e}", 503)
+            logger.warning(f"Stream resolver at {socket_path} unavailable ({e}), resolving in-process")
+            return self._fetch_local(url, timeout)
+
+    def _fetch_local(self, url: str, timeout: float) -> Dict[str, str]:
+        """Run Streamlink for url, going through the upstream cassette when one is active"""
+        cassette = get_cassette()
+        key = streamlink_key(url)
+        if cassette and cassette.replaying:
+            entry = cassette.play(key)
+            if 'e' in entry:
+                raise TwitchAPIError(entry['e'], None)
+            return entry['v']
+
+        from streamlink.stream.hls import HLSStream
+
+        self.session.set_option("http-timeout", timeout)
+        started = time.monotonic()
+        try:
+            streams = self.session.streams(url)
+        except Exception as e:
+            if cassette and cassette.recording:
+                cassette.record(key, {'e': str(e), 't': round(time.monotonic() - started, 4)})
+            raise
+        variants = {name: stream.url for name, stream in streams.items() if isinstance(stream, HLSStream)}
+        master = next((stream.multivariant.uri for stream in streams.values()
+                       if isinstance(stream, HLSStream) and stream.multivariant is not None), None)
+        if master:
+            variants[MASTER_PLAYLIST] = master
+        if cassette and cassette.recording:
+            cassette.record(key, {'v': variants, 't': round(time.monotonic() - started, 4)})
+        return variants
+
+
+def preload() -> None:
+    """Import Streamlink and the Twitch plugin up front, e.g. in a gunicorn master before forking"""
+    try:
+        StreamlinkService().session.resolve_url("https://twitch.tv/preload")
+        logger.info("Preloaded Streamlink and its Twitch plugin")
+    except Exception as e:
+        logger.warning(f"Streamlink preload failed: {e}")
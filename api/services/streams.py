@@ -1,13 +1,25 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import logging
 
+from django.conf import settings
+
 from api.services.channels import TwitchChannelService
+from . import admission, deadline, metrics
 from .base import TwitchAPIBaseService
+from .cache import get_generation, get_or_compute, live_key, make_key
 from .errors import TwitchAPIError
+from .eventsub import stream_cache_ttl
+from .records import StreamRecord
+from .snapshots import StreamSnapshot, decode_cursor, encode_cursor, get_snapshot_store
 from .streamlink import StreamlinkService 
 
 logger = logging.getLogger(__name__)
 
+# Fields kept for the sidebar projection of a full stream
+SIDEBAR_FIELDS = ('user_name', 'viewer_count', 'thumbnail_url', 'stream_url', 'hls_url', 'thumbnail')
+
+
+
 class TwitchStreamService(TwitchAPIBaseService):
     """Service class for Twitch stream-related operations"""
     
@@ -21,41 +33,16 @@ class TwitchStreamService(TwitchAPIBaseService):
                             language: Optional[str] = None,
                             game_id: Optional[str] = None,
                             cursor: Optional[str] = None,
-                            sidebar: bool = False) -> Tuple[List[Dict], Optional[str]]:
+                            sidebar: bool = False,
+                            fields: Optional[Set[str]] = None) -> Tuple[List[Dict], Optional[str]]:
         """Get top live streams with cursor support"""
         limit = min(max(1, limit), 100)
         
-        params = {
-            'first': limit,
-            'type': 'live'
-        }
-        if not sidebar and cursor:
-            params['after'] = cursor
-        if language:
-            params['language'] = language
-        if game_id:
-            params['game_id'] = game_id
-        
-        try:
-            data = self._make_request('streams', params)
-            streams = data.get('data', [])
-            cursor = data.get('pagination', {}).get('cursor')
-            
-            formatted_streams = []
-            for stream in streams:
-                stream['_sidebar_only'] = sidebar
-                formatted_stream = self._format_stream_data(stream)
-                formatted_streams.append(formatted_stream)
-            
-            return formatted_streams, cursor
-            
-        except TwitchAPIError:
-            raise
-        except Exception as e:
-            logger.error(f"Error processing streams data: {e}")
-            raise TwitchAPIError(f"Error processing streams: {str(e)}", None)
+        # No pagination for the sidebar
+        return self._stream_window(language, game_id, None if sidebar else cursor, limit, sidebar, fields)
     
-    def get_channel_live_stream(self, user_login: str, limit: int = 1) -> Tuple[List[Dict], Optional[str]]:
+    def get_channel_live_stream(self, user_login: str, limit: int = 1,
+                                fields: Optional[Set[str]] = None) -> Tuple[List[Dict], Optional[str]]:
         """Check if a channel is live and get stream details"""
         limit = min(max(1, limit), 100)
         
@@ -65,14 +52,16 @@ class TwitchStreamService(TwitchAPIBaseService):
             'first': limit
         }
         
+        # A login has at most one live stream, so the entry is shared by every limit. It holds the
+        # stream record; formatting per request lets each one skip enrichment it did not ask for.
+        streams, cursor = get_or_compute(
+            live_key(user_login), stream_cache_ttl(user_login), lambda: self._fetch_channel_live_stream(params)
+        )
+        
         try:
-            data = self._make_request('streams', params)
-            streams = data.get('data', [])
-            cursor = data.get('pagination', {}).get('cursor')
-            
             formatted_streams = []
             for stream in streams:
-                formatted_stream = self._format_stream_data(stream)
+                formatted_stream = self._format_stream_data(stream, fields)
                 formatted_stream['is_live'] = True
                 formatted_streams.append(formatted_stream)
             
@@ -84,75 +73,173 @@ class TwitchStreamService(TwitchAPIBaseService):
             logger.error(f"Error processing channel live stream: {e}")
             raise TwitchAPIError(f"Error processing channel live stream: {str(e)}", None)
     
-    def get_game_streams(self, game_id: str, limit: int = 5, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    def _fetch_channel_live_stream(self, params: Dict) -> Tuple[List[StreamRecord], Optional[str]]:
+        try:
+            data = self._make_request('streams', params)
+            streams = [StreamRecord.from_helix(stream) for stream in data.get('data', [])]
+            return streams, data.get('pagination', {}).get('cursor')
+            
+        except TwitchAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing channel live stream: {e}")
+            raise TwitchAPIError(f"Error processing channel live stream: {str(e)}", None)
+    
+    def get_game_streams(self, game_id: str, limit: int = 5, cursor: Optional[str] = None,
+                         fields: Optional[Set[str]] = None) -> Tuple[List[Dict], Optional[str]]:
         """Fetch live streams for a game"""
         limit = min(max(1, limit), 100)
         
-        params = {
-            'game_id': game_id,
-            'first': limit,
-            'type': 'live'
-        }
+        return self._stream_window(None, game_id, cursor, limit, fields=fields)
+    
+    def _stream_window(self,
+                       language: Optional[str],
+                       game_id: Optional[str],
+                       cursor: Optional[str],
+                       limit: int,
+                       sidebar: bool = False,
+                       fields: Optional[Set[str]] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Serve `limit` streams at cursor from a server-held snapshot of the ranked list
+
+        First pages share the newest snapshot per (language, game_id) while it is younger than
+        STREAM_LIST_CACHE_TTL. Cursors pin the snapshot they were issued from, so later pages
+        keep its ordering instead of drifting with live viewer counts.
+        """
+        params = {'language': language, 'game_id': game_id}
+        store = get_snapshot_store()
         if cursor:
-            params['after'] = cursor
+            snapshot_id, offset = decode_cursor(cursor)
+            snapshot = store.get(snapshot_id)
+            if snapshot is not None and snapshot.params != params:
+                raise ValueError('Cursor belongs to a different stream list')
+            if snapshot is None:
+                # Evicted or expired: continue at the same position in a current snapshot
+                logger.info(f"Stream snapshot {snapshot_id} expired, continuing from a fresh one")
+                metrics.increment('snapshots.cursor_expired')
+                snapshot = self._latest_snapshot(store, params)
+        else:
+            offset = 0
+            snapshot = self._latest_snapshot(store, params)
+        
+        self._extend_snapshot(store, snapshot, offset + limit)
+        page = snapshot.items[offset:offset + limit]
+        end = offset + len(page)
+        has_more = end < len(snapshot.items) or snapshot.after is not None
+        next_cursor = encode_cursor(snapshot.id, end) if page and has_more else None
+        
+        window = [self._format_stream_data(stream, fields) for stream in page]
+        if sidebar:
+            window = [{field: stream[field] for field in SIDEBAR_FIELDS if field in stream} for stream in window]
+        return window, next_cursor
+    
+    def _latest_snapshot(self, store, params: Dict) -> StreamSnapshot:
+        # The streams generation (bumped by EventSub) retires first-page snapshots early
+        key = make_key('snapshot', get_generation('streams'), params)
+        return store.latest(key, settings.STREAM_LIST_CACHE_TTL, lambda: self._build_snapshot(key, params))
+    
+    def _build_snapshot(self, key: str, params: Dict) -> StreamSnapshot:
+        items, after = self._walk_streams(params, None, settings.STREAM_SNAPSHOT_SIZE)
+        return StreamSnapshot(key, params, items, after)
+    
+    def _extend_snapshot(self, store, snapshot: StreamSnapshot, needed: int) -> None:
+        """Append further Helix pages when a cursor reaches the end of what was walked so far"""
+        if len(snapshot.items) >= needed or snapshot.after is None:
+            return
+        with snapshot.lock:
+            if len(snapshot.items) >= needed or snapshot.after is None:
+                return
+            items, after = self._walk_streams(snapshot.params, snapshot.after, settings.STREAM_SNAPSHOT_SIZE)
+            # Streams that moved down the ranking since the walk started would repeat
+            seen = {stream.id for stream in snapshot.items}
+            snapshot.items = snapshot.items + [stream for stream in items if stream.id not in seen]
+            snapshot.after = after
+            store.save(snapshot)
+    
+    def _walk_streams(self, params: Dict, after: Optional[str], count: int) -> Tuple[List[StreamRecord], Optional[str]]:
+        """Helix streams from after, 100 per call, until count are collected or the list ends"""
+        query = {'first': 100, 'type': 'live'}
+        if params.get('language'):
+            query['language'] = params['language']
+        if params.get('game_id'):
+            query['game_id'] = params['game_id']
         
         try:
-            data = self._make_request('streams', params)
-            streams = data.get('data', [])
-            cursor = data.get('pagination', {}).get('cursor')
-            
-            formatted_streams = []
-            for stream in streams:
-                formatted_stream = self._format_stream_data(stream)
-                formatted_streams.append(formatted_stream)
-            
-            return formatted_streams, cursor
+            items = []
+            while len(items) < count:
+                if after:
+                    query['after'] = after
+                data = self._make_request('streams', dict(query))
+                items.extend(StreamRecord.from_helix(stream) for stream in data.get('data', []))
+                after = data.get('pagination', {}).get('cursor')
+                if not after or not data.get('data'):
+                    return items, None
+            return items, after
             
         except TwitchAPIError:
             raise
         except Exception as e:
-            logger.error(f"Error processing game streams: {e}")
-            raise TwitchAPIError(f"Error processing game streams: {str(e)}", None)
-    
-    def _format_stream_data(self, stream: Dict) -> Dict:
-        """Format raw stream data from Twitch API for consistent output"""
+            logger.error(f"Error processing streams data: {e}")
+            raise TwitchAPIError(f"Error processing streams: {str(e)}", None)
+
+    def get_live_snapshot(self,
+                          user_logins: Optional[List[str]] = None,
+                          game_id: Optional[str] = None,
+                          limit: int = 20) -> Dict[str, Dict]:
+        """Live state keyed by login, without HLS enrichment (polled by the live event hub)
+
+        With user_logins the channels are looked up 100 at a time; otherwise the top `limit`
+        streams, optionally for one game, are returned.
+        """
+        if user_logins:
+            batches = [user_logins[i:i + 100] for i in range(0, len(user_logins), 100)]
+            requests_params = [{'user_login': batch, 'type': 'live', 'first': 100} for batch in batches]
+        else:
+            params = {'type': 'live', 'first': min(max(1, limit), 100)}
+            if game_id:
+                params['game_id'] = game_id
+            requests_params = [params]
+
         try:
-            # Fetch HLS URL using Streamlink
-            hls_url = None
+            snapshot = {}
+            for params in requests_params:
+                data = self._make_request('streams', params)
+                for stream in data.get('data', []):
+                    snapshot[stream['user_login']] = {
+                        'user_login': stream['user_login'],
+                        'user_name': stream['user_name'],
+                        'viewer_count': stream['viewer_count'],
+                        'game_id': stream.get('game_id'),
+                        'game_name': stream.get('game_name', 'No Category'),
+                        'title': stream.get('title'),
+                        'started_at': stream.get('started_at')
+                    }
+            return snapshot
+
+        except TwitchAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing live snapshot: {e}")
+            raise TwitchAPIError(f"Error processing live snapshot: {str(e)}", None)
+
+    def _format_stream_data(self, stream: StreamRecord, fields: Optional[Set[str]] = None) -> Dict:
+        """Format a stream record for consistent output
+
+        Enrichment (Streamlink HLS lookup, thumbnail sizes) only runs for requested fields.
+        """
+        # Fetch HLS URL using Streamlink, unless the client did not ask for it
+        hls_url = None
+        if not self._wants(fields, 'hls_url'):
+            metrics.increment('enrichment.hls_skipped')
+        elif admission.degraded():
+            metrics.increment('admission.hls_dropped')
+        elif deadline.budget_low():
+            logger.info(f"Skipping HLS lookup for {stream.user_login}: request budget nearly spent")
+            deadline.skip_enrichment()
+        else:
             try:
-                hls_url = self.streamlink_service.get_stream_hls_url(stream['user_login'])
+                hls_url = self.streamlink_service.get_stream_hls_url(stream.user_login)
             except TwitchAPIError as e:
-                logger.warning(f"Failed to get HLS URL for {stream['user_login']}: {e}")
+                logger.warning(f"Failed to get HLS URL for {stream.user_login}: {e}")
                 # Continue without HLS URL to avoid breaking the response
-            
-            formatted_stream = {
-                'user_name': stream['user_name'],
-                'viewer_count': stream['viewer_count'],
-                'thumbnail_url': stream['thumbnail_url'],
-                'stream_url': f"https://twitch.tv/{stream['user_login']}",  # Keep for fallback
-                'hls_url': hls_url,  # Add direct HLS URL
-                'thumbnail': {
-                    'small': stream['thumbnail_url'].replace('{width}', '320').replace('{height}', '180'),
-                    'medium': stream['thumbnail_url'].replace('{width}', '640').replace('{height}', '360'),
-                    'large': stream['thumbnail_url'].replace('{width}', '1920').replace('{height}', '1080')
-                }
-            }
-            if not stream.get('_sidebar_only', False):
-                formatted_stream.update({
-                    'id': stream['id'],
-                    'user_id': stream['user_id'],
-                    'user_login': stream['user_login'],
-                    'game_id': stream.get('game_id'),
-                    'game_name': stream.get('game_name', 'No Category'),
-                    'title': stream['title'],
-                    'started_at': stream['started_at'],
-                    'language': stream['language'],
-                    'tags': stream.get('tags', []),
-                    'is_mature': stream.get('is_mature', False),
-                    'type': stream.get('type', 'live'),
-                    'profile_image_url': None
-                })
-            return formatted_stream
-        except KeyError as e:
-            logger.error(f"Missing required field in stream data: {e}")
-            raise TwitchAPIError(f"Invalid stream data format: missing {e}", None)
\ No newline at end of file
+        
+        return stream.to_response(hls_url, fields)
@@ -1,9 +1,15 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import logging
+import time
+from django.conf import settings
+from . import admission, deadline, metrics
 from .base import TwitchAPIBaseService
+from .cache import get_or_compute, stale_served
 from .errors import TwitchAPIError
+from .records import VODRecord
 from .channels import TwitchChannelService
 from .streamlink import StreamlinkService  
+from .vod_store import ChannelVODs, VODStore, decode_cursor, encode_cursor, get_vod_store
 
 logger = logging.getLogger(__name__)
 
@@ -15,61 +21,128 @@ class TwitchVideoService(TwitchAPIBaseService):
         self.channel_service = TwitchChannelService()
         # Initialize StreamlinkService without OAuth
         self.streamlink_service = StreamlinkService()
-    def get_channel_vods(self, user_login: str, limit: int = 5, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
-        """Fetch VODs for a channel"""
+    def get_channel_vods(self, user_login: str, limit: int = 5, cursor: Optional[str] = None,
+                         fields: Optional[Set[str]] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Fetch VODs for a channel from its VOD store; HLS lookups and thumbnail sizes only run for requested fields"""
         limit = min(max(1, limit), 100)
+        position = decode_cursor(cursor) if cursor else None
         
         try:
-            user_data = self.channel_service.get_user_by_login(user_login)
-            user_id = user_data['id']
-            
-            params = {
-                'user_id': user_id,
-                'first': limit,
-                'type': 'archive'
-            }
-            if cursor:
-                params['after'] = cursor
-            
-            data = self._make_request('videos', params)
-            vods = data.get('data', [])
-            cursor = data.get('pagination', {}).get('cursor')
+            store = get_vod_store()
+            user_id = get_or_compute(store.user_key(user_login), store.ttl,
+                                     lambda: self.channel_service.get_user_by_login(user_login)['id'])
+            vods, more = self._stored_vods(store, user_id, position, limit)
             
             formatted_vods = []
             for vod in vods:
-                # Fetch HLS URL using Streamlink
+                # Fetch HLS URL using Streamlink, unless the client did not ask for it
                 hls_url = None
-                try:
-                    hls_url = self.streamlink_service.get_vod_hls_url(vod['id'])
-                except TwitchAPIError as e:
-                    logger.warning(f"Failed to get HLS URL for VOD {vod['id']}: {e}")
-                    # Continue without HLS URL
+                if not self._wants(fields, 'hls_url'):
+                    metrics.increment('enrichment.hls_skipped')
+                elif admission.degraded():
+                    metrics.increment('admission.hls_dropped')
+                elif deadline.budget_low():
+                    logger.info(f"Skipping HLS lookup for VOD {vod.id}: request budget nearly spent")
+                    deadline.skip_enrichment()
+                else:
+                    try:
+                        hls_url = self.streamlink_service.get_vod_hls_url(vod.id)
+                    except TwitchAPIError as e:
+                        logger.warning(f"Failed to get HLS URL for VOD {vod.id}: {e}")
+                        # Continue without HLS URL
                 
-                formatted_vod = {
-                    'id': vod['id'],
-                    'user_id': vod['user_id'],
-                    'user_login': vod['user_login'],
-                    'user_name': vod['user_name'],
-                    'title': vod['title'],
-                    'created_at': vod['created_at'],
-                    'duration': vod.get('duration', ''),
-                    'view_count': vod.get('view_count', 0),
-                    'url': vod['url'],  # Keep for fallback
-                    'hls_url': hls_url,  # Add direct HLS URL
-                    'thumbnail_url': vod.get('thumbnail_url', ''),
-                    'type': vod.get('type', 'archive'),
-                    'thumbnail': {
-                        'small': vod.get('thumbnail_url', '').replace('%{width}', '320').replace('%{height}', '180'),
-                        'medium': vod.get('thumbnail_url', '').replace('%{width}', '640').replace('%{height}', '360'),
-                        'large': vod.get('thumbnail_url', '').replace('%{width}', '1920').replace('%{height}', '1080')
-                    }
-                }
-                formatted_vods.append(formatted_vod)
+                formatted_vods.append(vod.to_response(hls_url, fields))
             
+            cursor = encode_cursor(vods[-1]) if more and vods else None
             return formatted_vods, cursor
             
         except TwitchAPIError:
             raise
         except Exception as e:
             logger.error(f"Error processing channel VODs: {e}")
-            raise TwitchAPIError(f"Error processing channel VODs: {str(e)}", None)
\ No newline at end of file
+            raise TwitchAPIError(f"Error processing channel VODs: {str(e)}", None)
+    
+    def _stored_vods(self, store: VODStore, user_id: str, position: Optional[Tuple[str, str]],
+                     limit: int) -> Tuple[List[VODRecord], bool]:
+        """A page of the channel's VODs after position, and whether older ones follow
+        
+        The first view walks the newest 100 VODs. Later views make at most one small call: new
+        VODs every VOD_SYNC_INTERVAL, or else a bulk view-count refresh every VOD_VIEW_COUNT_TTL.
+        """
+        with store.lock(user_id):
+            now = time.time()
+            channel = store.load(user_id)
+            changed = True
+            if channel is None:
+                items, after = self._fetch_vods(user_id, 100, None)
+                channel = ChannelVODs(user_id, items, after, now)
+            elif now - channel.synced >= settings.VOD_SYNC_INTERVAL:
+                self._sync_newest(channel, now)
+            else:
+                changed = False
+            
+            start = channel.position_after(position)
+            while start + limit > len(channel.items) and channel.after:
+                # Paging past what was walked so far: the older VODs join the store for good
+                page, after = self._fetch_vods(user_id, 100, channel.after)
+                channel.append_older(page, after)
+                changed = True
+            
+            window = start // ChannelVODs.VIEW_WINDOW
+            if not changed and now - channel.views_refreshed.get(window, 0.0) >= settings.VOD_VIEW_COUNT_TTL:
+                self._refresh_view_counts(channel, window)
+                channel.views_refreshed[window] = now
+                start = channel.position_after(position)
+                changed = True
+            
+            # Stale fallbacks from an outage are served but not kept
+            if changed and not stale_served():
+                store.save(channel)
+            vods = channel.items[start:start + limit]
+            more = start + limit < len(channel.items) or channel.after is not None
+        return vods, more
+    
+    def _fetch_vods(self, user_id: str, first: int, after: Optional[str]) -> Tuple[List[VODRecord], Optional[str]]:
+        """One Helix page of a channel's archived VODs, newest first"""
+        params = {
+            'user_id': user_id,
+            'first': first,
+            'type': 'archive'
+        }
+        if after:
+            params['after'] = after
+        data = self._make_request('videos', params)
+        return [VODRecord.from_helix(vod) for vod in data.get('data', [])], data.get('pagination', {}).get('cursor')
+    
+    def _sync_newest(self, channel: ChannelVODs, now: float) -> None:
+        """Add VODs published since the last sync with one small call"""
+        page, after = self._fetch_vods(channel.user_id, settings.VOD_SYNC_BATCH, None)
+        if not channel.items:
+            # Nothing stored yet: the page is the newest VODs and its cursor continues the walk
+            channel.items, channel.after, channel.views_refreshed = page, after, {0: now}
+        elif not channel.merge_newest(page):
+            # More new VODs than one small page holds, or every stored one is gone: walk again
+            metrics.increment('vod_store.resync')
+            items, after = self._fetch_vods(channel.user_id, 100, None)
+            channel.items, channel.after, channel.views_refreshed = items, after, {0: now}
+        channel.synced = now
+        metrics.increment('vod_store.synced')
+
+    def _refresh_view_counts(self, channel: ChannelVODs, window: int) -> None:
+        """Update view counts of one window of stored VODs with a single lookup by id"""
+        vods = channel.items[window * ChannelVODs.VIEW_WINDOW:(window + 1) * ChannelVODs.VIEW_WINDOW]
+        if not vods:
+            return
+        try:
+            data = self._make_request('videos', {'id': [vod.id for vod in vods]})
+        except TwitchAPIError as e:
+            # Counts only go stale; the page is still served from the store
+            logger.warning(f"Refreshing VOD view counts for {channel.user_id} failed: {e}")
+            return
+        counts = {vod['id']: vod.get('view_count', 0) for vod in data.get('data', [])}
+        for vod in vods:
+            if vod.id in counts:
+                vod.view_count = counts[vod.id]
+        # VODs missing from the answer have expired or been deleted
+        channel.remove([vod.id for vod in vods if vod.id not in counts])
+        metrics.increment('vod_store.views_refreshed')
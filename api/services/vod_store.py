@@ -0,0 +1,117 @@
+import base64
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics
+from .cache import KEY_PREFIX
+from .records import VODRecord
+
+
+class ChannelVODs:
+    """A channel's archived VODs, newest first, as far back as they have been walked
+
+    Archived VOD metadata does not change once the broadcast has ended, so records are kept
+    for long and only new VODs are fetched. View counts are refreshed per window of 100 VODs,
+    the most one Helix lookup by id can return.
+    """
+
+    VIEW_WINDOW = 100
+
+    def __init__(self, user_id: str, items: List[VODRecord], after: Optional[str], synced: float):
+        self.user_id = user_id
+        self.items = items
+        # Helix cursor to continue the walk into older VODs, None once the archive is exhausted
+        self.after = after
+        self.synced = synced
+        # Window index -> when its view counts were last refreshed
+        self.views_refreshed: Dict[int, float] = {0: synced}
+
+    def position_after(self, cursor: Optional[Tuple[str, str]]) -> int:
+        """Index of the first VOD after a cursor's VOD; 0 without a cursor"""
+        if cursor is None:
+            return 0
+        vod_id, created_at = cursor
+        for index, vod in enumerate(self.items):
+            if vod.id == vod_id:
+                return index + 1
+        # The VOD was deleted since: continue with the next older one
+        return next((index for index, vod in enumerate(self.items) if vod.created_at < created_at), len(self.items))
+
+    def merge_newest(self, page: List[VODRecord]) -> bool:
+        """Merge a page of the newest VODs; False if it does not reach any VOD already stored"""
+        stored = {vod.id for vod in self.items}
+        if page and self.items and not any(vod.id in stored for vod in page):
+            return False
+        # Stored VODs in the page are replaced, which keeps an archive still being recorded current
+        fresh = {vod.id: vod for vod in page}
+        self.items = [vod for vod in page if vod.id not in stored] + [fresh.get(vod.id, vod) for vod in self.items]
+        return True
+
+    def remove(self, vod_ids: List[str]) -> None:
+        """Drop VODs that no longer exist upstream (expired or deleted)"""
+        gone = set(vod_ids)
+        self.items = [vod for vod in self.items if vod.id not in gone]
+
+    def append_older(self, page: List[VODRecord], after: Optional[str]) -> None:
+        seen = {vod.id for vod in self.items}
+        self.items.extend(vod for vod in page if vod.id not in seen)
+        self.after = after
+
+
+class VODStore:
+    """ChannelVODs per channel in the Django cache, with a lock per channel for syncing"""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        # Striped so concurrent syncs of one channel serialize without a lock per channel ever seen
+        self._locks = [threading.Lock() for _ in range(64)]
+
+    def lock(self, user_id: str) -> threading.Lock:
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    def load(self, user_id: str) -> Optional[ChannelVODs]:
+        channel = cache.get(self._key(user_id))
+        metrics.increment('vod_store.hit' if channel is not None else 'vod_store.miss')
+        return channel
+
+    def save(self, channel: ChannelVODs) -> None:
+        cache.set(self._key(channel.user_id), channel, self.ttl)
+
+    @staticmethod
+    def user_key(user_login: str) -> str:
+        """Cached user id of a login, so repeat views skip the /users lookup"""
+        return f"{KEY_PREFIX}:vodusers:{user_login.lower()}"
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"{KEY_PREFIX}:vods:{user_id}"
+
+
+def encode_cursor(vod: VODRecord) -> str:
+    """Opaque API cursor continuing after a VOD; stays valid as newer VODs are added"""
+    raw = json.dumps({'v': vod.id, 't': vod.created_at}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor; raises ValueError for anything we did not issue"""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(decoded['v']), str(decoded['t'])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+_store: Optional[VODStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vod_store() -> VODStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = VODStore(getattr(settings, 'VOD_STORE_TTL', 86400))
+    return _store
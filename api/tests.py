@@ -0,0 +1,262 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from unittest import mock
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.services import metrics, resilience
+from api.services.auth import AppTokenManager
+from api.services.base import TwitchAPIBaseService
+from api.services.cache import get_generation, live_key
+from api.services.credentials import Credential, CredentialPool
+from api.services.errors import TwitchAPIError
+from api.services.eventsub import mark_subscribed, stream_cache_ttl
+from api.services.hls_proxy import HLSManifestProxy
+from api.services.streams import TwitchStreamService
+from benchmarks import eventsub_sender
+from benchmarks.stub_helix import StubConfig, start_stub_server
+
+
+@override_settings(LKG_STORE_PATH='', TWITCH_RETRY_MAX_WAIT=0.5, TWITCH_RETRY_BASE_DELAY=0.01)
+class StubHelixTestCase(TestCase):
+    """Runs against a fresh stub Helix server (benchmarks.stub_helix) per test class"""
+
+    stub_config = StubConfig(latency_ms=0, jitter_ms=0, streamlink_latency_ms=0, live_streams=20)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server, cls.stub = start_stub_server(cls.stub_config)
+        cls.stub_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        cache.clear()
+        # Breakers are process-wide; failures provoked by one test must not fail the next fast
+        resilience._breakers.clear()
+        self.stub.calls.clear()
+        self.stub.client_calls.clear()
+        self.stub.windows.clear()
+
+    def counter(self, name: str) -> int:
+        return metrics.snapshot().get(name, 0)
+
+
+class CredentialPoolTests(StubHelixTestCase):
+    """Helix calls spread over several Twitch apps, moving off rate-limited or rejected ones"""
+
+    stub_config = StubConfig(latency_ms=0, jitter_ms=0, streamlink_latency_ms=0, live_streams=20,
+                             ratelimit_limit=3, enforce_ratelimit=True, require_auth=True)
+
+    def make_service(self, *client_ids: str) -> TwitchAPIBaseService:
+        service = TwitchAPIBaseService()
+        service.base_url = self.stub_url
+        service.credentials = CredentialPool([Credential(client_id, AppTokenManager(client_id, 'secret'))
+                                              for client_id in client_ids])
+        return service
+
+    def test_rate_limited_credential_fails_over_to_another(self):
+        with override_settings(TWITCH_OAUTH_URL=f'{self.stub_url}/oauth2'):
+            service = self.make_service('app-a', 'app-b')
+            for query in range(5):
+                service._make_request('search/channels', {'query': f'stub_channel_{query}'})
+
+        # Neither app went past the stub's limit of 3 calls: the pool moved on before Twitch said 429
+        self.assertEqual(set(self.stub.client_calls), {'app-a', 'app-b'})
+        self.assertTrue(all(calls <= 3 for calls in self.stub.client_calls.values()))
+
+    def test_single_exhausted_credential_reports_429(self):
+        with override_settings(TWITCH_OAUTH_URL=f'{self.stub_url}/oauth2'):
+            service = self.make_service('app-solo')
+            for query in range(3):
+                service._make_request('search/channels', {'query': f'stub_channel_{query}'})
+            with self.assertRaises(TwitchAPIError) as raised:
+                service._make_request('search/channels', {'query': 'stub_channel_9'})
+
+        self.assertEqual(raised.exception.status_code, 429)
+        # The pool knows the budget is spent, so the failed call did not keep hammering Twitch
+        self.assertLessEqual(self.stub.client_calls['app-solo'], 4)
+
+    def test_revoked_token_is_replaced_and_call_replayed(self):
+        with override_settings(TWITCH_OAUTH_URL=f'{self.stub_url}/oauth2'):
+            service = self.make_service('app-a')
+            service._make_request('search/channels', {'query': 'stub_channel_1'})
+            requests.post(f'{self.stub_url}/__revoke')
+            rejected = self.counter('auth.token_rejected')
+
+            data = service._make_request('search/channels', {'query': 'stub_channel_2'})
+
+        self.assertTrue(data['data'])
+        self.assertEqual(self.stub.calls['/oauth2/token'], 2)
+        self.assertEqual(self.counter('auth.token_rejected'), rejected + 1)
+
+    def test_invalidate_waits_for_a_token_other_than_the_rejected_one(self):
+        manager = AppTokenManager('app-wait', 'secret')
+        now = time.time()
+        cache.set(manager.cache_key, {'access_token': 'rejected', 'expires_at': now + 3000, 'refresh_at': now + 2000})
+        # Another worker holds the refresh lock and stores its new token shortly
+        cache.add(manager.lock_key, 1, 30)
+
+        def refreshed_elsewhere(seconds):
+            cache.set(manager.cache_key, {'access_token': 'fresh', 'expires_at': now + 3000, 'refresh_at': now + 2000})
+
+        with mock.patch('api.services.auth.time.sleep', side_effect=refreshed_elsewhere):
+            token = manager.invalidate('rejected')
+
+        self.assertEqual(token, 'fresh')
+
+
+@override_settings(EVENTSUB_SECRET='s3cret')
+class EventSubWebhookTests(StubHelixTestCase):
+    """Signed EventSub deliveries from the local sender stand-in, and the cache entries they touch"""
+
+    callback = '/api/v1/eventsub/callback/'
+
+    def deliver(self, message_type: str, payload, message_id: str = None, timestamp: str = None,
+                secret: str = 's3cret'):
+        message_id = message_id or str(uuid.uuid4())
+        timestamp = timestamp or datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        body = json.dumps(payload).encode()
+        return self.client.post(self.callback, body, content_type='application/json', headers={
+            'Twitch-Eventsub-Message-Id': message_id,
+            'Twitch-Eventsub-Message-Timestamp': timestamp,
+            'Twitch-Eventsub-Message-Signature': eventsub_sender.sign(secret, message_id, timestamp, body),
+            'Twitch-Eventsub-Message-Type': message_type,
+        })
+
+    def notification(self, kind: str, login: str, **fields):
+        subscription_type, version = eventsub_sender.EVENT_TYPES[kind]
+        return {
+            'subscription': eventsub_sender.subscription(subscription_type, version, '100000', self.callback),
+            'event': eventsub_sender.event_payload(kind, login, '100000', **fields)
+        }
+
+    def live_streams(self, login: str):
+        with self.settings(TWITCH_API_BASE_URL=self.stub_url, TWITCH_OAUTH_URL=f'{self.stub_url}/oauth2'):
+            streams, _ = TwitchStreamService().get_channel_live_stream(login, fields={'id', 'user_login'})
+        return streams
+
+    def test_bad_signature_and_old_messages_are_rejected(self):
+        payload = self.notification('offline', 'stub_channel_0')
+        self.assertEqual(self.deliver('notification', payload, secret='wrong').status_code, 403)
+        self.assertEqual(self.deliver('notification', payload, timestamp='2020-01-01T00:00:00Z').status_code, 403)
+        self.assertIsNone(cache.get(live_key('stub_channel_0')))
+
+    def test_verification_challenge_is_answered_on_every_delivery(self):
+        payload = {'challenge': 'c0ffee', 'subscription': self.notification('online', 'x')['subscription']}
+        for _ in range(2):
+            response = self.deliver('webhook_callback_verification', payload, message_id='verify-1')
+            self.assertEqual(response.content, b'c0ffee')
+
+    def test_redelivered_message_is_applied_once(self):
+        payload = self.notification('offline', 'stub_channel_0')
+        applied = self.counter('eventsub.stream.offline')
+        for _ in range(2):
+            self.assertEqual(self.deliver('notification', payload, message_id='dup-1').status_code, 204)
+        self.assertEqual(self.counter('eventsub.stream.offline'), applied + 1)
+
+    def test_failed_delivery_is_applied_when_retried(self):
+        payload = self.notification('offline', 'stub_channel_0')
+        with mock.patch('api.views.eventsub.apply_notification', side_effect=RuntimeError('boom')):
+            self.assertEqual(self.deliver('notification', payload, message_id='retry-1').status_code, 500)
+        self.assertEqual(self.deliver('notification', payload, message_id='retry-1').status_code, 204)
+        self.assertEqual(cache.get(live_key('stub_channel_0')), ([], None))
+
+    def test_offline_and_online_events_invalidate_live_status(self):
+        self.assertTrue(self.live_streams('stub_channel_0'))
+        self.assertEqual(self.stub.calls['/streams'], 1)
+
+        self.deliver('notification', self.notification('offline', 'stub_channel_0'))
+        self.assertEqual(self.live_streams('stub_channel_0'), [])
+        self.assertEqual(self.stub.calls['/streams'], 1)
+
+        self.deliver('notification', self.notification('online', 'stub_channel_0'))
+        self.assertTrue(self.live_streams('stub_channel_0'))
+        self.assertEqual(self.stub.calls['/streams'], 2)
+
+    def test_only_category_changes_retire_cached_lists(self):
+        self.live_streams('stub_channel_0')
+        generation = get_generation('streams')
+
+        self.deliver('notification', self.notification('update', 'stub_channel_0', title='New title'))
+        self.assertEqual(get_generation('streams'), generation)
+        self.assertEqual(cache.get(live_key('stub_channel_0'))[0][0].title, 'New title')
+
+        self.deliver('notification', self.notification('update', 'stub_channel_0', title='New title',
+                                                        category_id='9', category_name='Chess'))
+        self.assertNotEqual(get_generation('streams'), generation)
+
+    def test_long_live_status_ttl_only_for_subscribed_channels(self):
+        self.assertEqual(stream_cache_ttl('stub_channel_1'), 15)
+        mark_subscribed({'stub_channel_1': '100001'})
+        self.assertEqual(stream_cache_ttl('stub_channel_1'), 300)
+
+        revocation = {'subscription': {**self.notification('offline', 'x')['subscription'],
+                                       'condition': {'broadcaster_user_id': '100001'}, 'status': 'user_removed'}}
+        self.assertEqual(self.deliver('revocation', revocation).status_code, 204)
+        self.assertEqual(stream_cache_ttl('stub_channel_1'), 15)
+
+
+class HLSManifestProxyTests(StubHelixTestCase):
+    """Live playlists resolved through the stub Streamlink plugin and served by the manifest proxy"""
+
+    proxy_url = 'https://api.example.com/api/v1/hls'
+
+    def setUp(self):
+        super().setUp()
+        plugins = override_settings(STREAMLINK_PLUGIN_DIRS=[str(settings.BASE_DIR / 'benchmarks' / 'streamlink_plugins')])
+        plugins.enable()
+        self.addCleanup(plugins.disable)
+        environ = mock.patch.dict(os.environ, {'STUB_HELIX_URL': self.stub_url})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.proxy = HLSManifestProxy(self.proxy_url, master_ttl=30.0, media_ttl=1.0)
+        view_proxy = mock.patch('api.views.hls.get_hls_proxy', return_value=self.proxy)
+        view_proxy.start()
+        self.addCleanup(view_proxy.stop)
+
+    def playlist(self, login: str, variant: str):
+        return self.client.get(f'/api/v1/hls/{login}/{variant}.m3u8')
+
+    def test_master_playlist_lists_variants_under_the_proxy(self):
+        response = self.playlist('stub_channel_0', 'master')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        uris = [line for line in response.content.decode().splitlines() if line and not line.startswith('#')]
+        self.assertIn(f'{self.proxy_url}/stub_channel_0/720p60.m3u8', uris)
+        self.assertTrue(all(uri.startswith(f'{self.proxy_url}/stub_channel_0/') for uri in uris))
+
+    def test_media_playlist_has_absolute_segment_uris_and_is_shared(self):
+        for _ in range(2):
+            response = self.playlist('stub_channel_0', '480p')
+            self.assertEqual(response.status_code, 200)
+
+        segments = [line for line in response.content.decode().splitlines() if line.endswith('.ts')]
+        self.assertTrue(segments)
+        self.assertTrue(all(uri.startswith(f'{self.stub_url}/hls/live/stub_channel_0/') for uri in segments))
+        self.assertEqual(self.stub.calls['hls'], 1)
+
+    def test_offline_channel_and_unknown_quality_are_404(self):
+        self.assertEqual(self.playlist('nobody_here', 'master').status_code, 404)
+        self.assertEqual(self.playlist('stub_channel_0', '4k').status_code, 404)
+
+    def test_malformed_login_is_rejected_before_resolution(self):
+        self.assertEqual(self.playlist('bad.login', 'master').status_code, 400)
+        self.assertEqual(self.stub.calls['streamlink:live'], 0)
+
+    def test_origin_failure_is_502(self):
+        self.playlist('stub_channel_0', 'master')
+        with mock.patch('api.services.hls_proxy.requests.get', side_effect=requests.ConnectionError('down')):
+            self.assertEqual(self.playlist('stub_channel_0', '360p').status_code, 502)
+
+    def test_resolution_failure_is_502(self):
+        with mock.patch.object(self.proxy.streamlink_service, 'get_stream_variants',
+                               side_effect=RuntimeError('plugin crashed')):
+            self.assertEqual(self.playlist('stub_channel_0', 'master').status_code, 502)
@@ -2,27 +2,42 @@ from django.urls import path
 from .views import (
     HomeView,
     health_check,
+    circuit_status,
+    metrics_view,
     TopLiveStreamsView,
     TopCategoriesView,
     SidebarStreamsView,
+    LiveEventsView,
     SearchChannelsView,
     CheckChannelLiveView,
     GetChannelVODsView,
     SearchGamesView,
-    GetGameStreamsView
+    GetGameStreamsView,
+    EventSubWebhookView,
+    BatchView,
+    HLSPlaylistView
 )
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
     path('health/', health_check, name='health-check'),
+    path('health/circuits/', circuit_status, name='circuit-status'),
+    path('health/metrics/', metrics_view, name='metrics'),
     path('streams/top/', TopLiveStreamsView.as_view(), name='top-live-streams'),
     path('categories/top/', TopCategoriesView.as_view(), name='top-categories'),
     path('streams/sidebar/', SidebarStreamsView.as_view(), name='sidebar-streams'),
+    path('streams/events/', LiveEventsView.as_view(), name='live-events'),
     # Channel Search Endpoints
     path('search/channels/', SearchChannelsView.as_view(), name='search-channels'),
     path('channels/<str:user_login>/live/', CheckChannelLiveView.as_view(), name='check-channel-live'),
     path('channels/<str:user_login>/vods/', GetChannelVODsView.as_view(), name='get-channel-vods'),
     # Game Search Endpoints
     path('search/games/', SearchGamesView.as_view(), name='search-games'),
-    path('games/<str:game_id>/streams/', GetGameStreamsView.as_view(), name='get-game-streams')
+    path('games/<str:game_id>/streams/', GetGameStreamsView.as_view(), name='get-game-streams'),
+    # Twitch EventSub webhook deliveries
+    path('eventsub/callback/', EventSubWebhookView.as_view(), name='eventsub-callback'),
+    # Several GET requests in one round trip
+    path('batch/', BatchView.as_view(), name='batch'),
+    # Live HLS playlists through the shared manifest proxy
+    path('hls/<str:user_login>/<str:variant>.m3u8', HLSPlaylistView.as_view(), name='hls-playlist')
 ]
\ No newline at end of file
@@ -1,21 +1,30 @@
 from .base import BaseView
-from .home import HomeView, health_check
-from .streams import TopLiveStreamsView, SidebarStreamsView
+from .home import HomeView, health_check, circuit_status, metrics_view
+from .streams import TopLiveStreamsView, SidebarStreamsView, LiveEventsView
 from .categories import TopCategoriesView
 from .channels import SearchChannelsView, CheckChannelLiveView
 from .videos import GetChannelVODsView
 from .games import SearchGamesView, GetGameStreamsView
+from .eventsub import EventSubWebhookView
+from .batch import BatchView
+from .hls import HLSPlaylistView
 
 __all__ = [
     'BaseView',
     'HomeView', 
     'health_check',
+    'circuit_status',
+    'metrics_view',
     'TopLiveStreamsView',
     'SidebarStreamsView',
+    'LiveEventsView',
     'TopCategoriesView',
     'SearchChannelsView',
     'CheckChannelLiveView',
     'GetChannelVODsView',
     'SearchGamesView',
-    'GetGameStreamsView'
+    'GetGameStreamsView',
+    'EventSubWebhookView',
+    'BatchView',
+    'HLSPlaylistView'
 ]
\ No newline at end of file
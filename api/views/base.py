@@ -1,8 +1,15 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.http import JsonResponse
+from django.template.response import SimpleTemplateResponse
 import logging
+import math
 
+from api.services import admission, deadline, metrics, profiling, ratelimit
+from api.services.response_cache import cacheable_body, get_response_cache
+from api.services.cache import reset_stale_flag, stale_served
 from api.services.errors import TwitchAPIError
 
 
@@ -11,6 +18,160 @@ logger = logging.getLogger(__name__)
 class BaseView(APIView):
     """Base view with common error handling and validation for Twitch API views"""
     
+    # Overall time budget in seconds for one request; None uses API_DEFAULT_DEADLINE
+    deadline_seconds = None
+    # Serve repeated GETs from the shared pre-rendered response cache (RESPONSE_CACHE_TTL)
+    cache_responses = False
+    # Limit concurrent requests to this endpoint (ADMISSION_* settings) and shed the excess
+    admission_control = True
+    # Units charged against the client's rate limit (RATELIMIT_RATE) per request, by upstream cost
+    rate_limit_weight = 1
+    
+    def get_deadline_seconds(self):
+        """Resolve the request budget: per-endpoint setting, then view default, then global default"""
+        overrides = getattr(settings, 'API_ENDPOINT_DEADLINES', {})
+        if self.__class__.__name__ in overrides:
+            return overrides[self.__class__.__name__]
+        if self.deadline_seconds is not None:
+            return self.deadline_seconds
+        return getattr(settings, 'API_DEFAULT_DEADLINE', None)
+    
+    @classmethod
+    def get_rate_limit_weight(cls):
+        """Rate limit cost of one request: per-endpoint setting, then view default"""
+        return getattr(settings, 'RATELIMIT_WEIGHTS', {}).get(cls.__name__, cls.rate_limit_weight)
+    
+    def dispatch(self, request, *args, **kwargs):
+        """Handle the request, profiling it when asked to by a signed header or sampling"""
+        started = profiling.start(request, self.__class__.__name__)
+        if started is None:
+            return self.dispatch_request(request, *args, **kwargs)
+        
+        response = None
+        try:
+            response = self.dispatch_request(request, *args, **kwargs)
+            # Rendering normally happens after dispatch returns; do it here so it is measured
+            if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+                with profiling.stage('render'):
+                    response.render()
+            return response
+        finally:
+            profile_id = profiling.finish(started, response.status_code if response is not None else None)
+            if profile_id and response is not None:
+                response['X-Profile-Id'] = profile_id
+    
+    def dispatch_request(self, request, *args, **kwargs):
+        """Run the request under a request-scoped deadline shared by all upstream calls
+
+        Requests are charged to their client's rate limit first. Cached responses are served
+        next; everything else goes through admission control, which may run the request
+        degraded (no HLS enrichment) or shed it.
+        """
+        retry_after = ratelimit.check_request(request, self.get_rate_limit_weight())
+        if retry_after:
+            return self.rate_limited(retry_after)
+        
+        token = deadline.start(self.get_deadline_seconds())
+        try:
+            response_cache = self.get_response_cache(request)
+            key = response_cache.key_for(request) if response_cache is not None else None
+            if response_cache is not None:
+                cached = response_cache.serve(request, key)
+                if cached is not None:
+                    return cached
+            
+            controller = self.get_admission_controller()
+            level = admission.NORMAL
+            if controller is not None:
+                current = deadline.current()
+                level = controller.acquire(current.remaining() if current is not None else None)
+                if level is None:
+                    return self.shed(request, response_cache, key, *args, **kwargs)
+            
+            level_token = admission.start(level)
+            try:
+                with profiling.stage('handler'):
+                    response = super().dispatch(request, *args, **kwargs)
+            finally:
+                admission.reset(level_token)
+                if controller is not None:
+                    controller.release()
+            # Degraded responses lack enrichment and must not be served to later requests,
+            # whether admission control or a nearly spent deadline dropped it
+            if response_cache is not None and level == admission.NORMAL and not deadline.enrichment_skipped():
+                self.store_response(response_cache, key, response)
+            return response
+        finally:
+            deadline.reset(token)
+    
+    def rate_limited(self, retry_after: float):
+        """429 for a client over its rate limit"""
+        response = JsonResponse(
+            {'error': 'Rate limit exceeded, slow down', 'status_code': 429},
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response['Retry-After'] = str(math.ceil(retry_after))
+        return response
+    
+    def get_admission_controller(self):
+        """This endpoint's admission controller, or None if it is not admission controlled"""
+        if not self.admission_control or not getattr(settings, 'ADMISSION_ENABLED', True):
+            return None
+        return admission.get_controller(self.__class__.__name__)
+    
+    def shed(self, request, response_cache, key, *args, **kwargs):
+        """Answer a request refused by admission control from stale data, or with 503"""
+        if response_cache is not None:
+            cached = response_cache.serve(request, key, stale=True)
+            if cached is not None:
+                metrics.increment('admission.served_stale')
+                return cached
+        
+        # Run the handler without upstream calls: stale copies of its Helix lookups or 503
+        level_token = admission.start(admission.STALE_ONLY)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            admission.reset(level_token)
+        if response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            response['Retry-After'] = str(getattr(settings, 'ADMISSION_RETRY_AFTER', 2))
+            metrics.increment('admission.rejected')
+        else:
+            metrics.increment('admission.served_stale')
+        return response
+    
+    def get_response_cache(self, request):
+        """The shared response cache if this request may use it, else None"""
+        if not self.cache_responses or request.method != 'GET':
+            return None
+        # The browsable API renders HTML; only JSON is cached
+        if 'text/html' in request.META.get('HTTP_ACCEPT', ''):
+            return None
+        return get_response_cache()
+    
+    def store_response(self, response_cache, key: str, response):
+        """Keep the rendered body of a fresh 200 response for the following requests"""
+        try:
+            body = cacheable_body(response)
+            if body is not None:
+                response['ETag'] = response_cache.store(key, *body)
+                response['Vary'] = 'Accept-Encoding'
+        except OSError as e:
+            logger.warning(f"Could not store response in the response cache: {e}")
+    
+    def initial(self, request, *args, **kwargs):
+        """Reset per-request state before the handler runs"""
+        reset_stale_flag()
+        deadline.reset_enrichment_flag()
+        super().initial(request, *args, **kwargs)
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Mark responses that were served from stale upstream data"""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if stale_served():
+            response['Warning'] = '110 - "Response is Stale"'
+        return response
+    
     def handle_twitch_api_error(self, e: TwitchAPIError, view_name: str):
         """Centralized error handling for TwitchAPIError"""
         logger.error(f"Twitch API error in {view_name}: {e}")
@@ -24,6 +185,12 @@ class BaseView(APIView):
             error_status = status.HTTP_429_TOO_MANY_REQUESTS
         elif e.status_code == 500:
             error_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+        elif e.status_code == 502:
+            error_status = status.HTTP_502_BAD_GATEWAY
+        elif e.status_code == 503:
+            error_status = status.HTTP_503_SERVICE_UNAVAILABLE
+        elif e.status_code == 504:
+            error_status = status.HTTP_504_GATEWAY_TIMEOUT
             
         return Response(
             {'error': str(e), 'status_code': e.status_code},
@@ -62,3 +229,16 @@ class BaseView(APIView):
         if not query or not query.strip():
             raise ValueError('Query parameter is required')
         return True
+    
+    def get_fields(self, request, serializer_class):
+        """Item fields selected with ?fields=a,b for a list response; None selects all"""
+        raw = request.query_params.get('fields')
+        if raw is None:
+            return None
+        fields = {name.strip() for name in raw.split(',') if name.strip()}
+        if not fields:
+            raise ValueError('fields must name at least one field')
+        unknown = fields - set(serializer_class().fields['data'].child.fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return fields
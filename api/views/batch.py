@@ -0,0 +1,173 @@
+import contextvars
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+from rest_framework import status
+
+from api.services import batching
+from api.services.cache import mark_stale_served
+from api.services.errors import TwitchAPIError
+from api.services.streams import TwitchStreamService
+from .base import BaseView
+
+logger = logging.getLogger(__name__)
+
+# Routes that cannot run as a sub-request: the batch itself, streams, webhooks and
+# non-JSON responses (HLS playlists)
+EXCLUDED_ROUTES = {'batch', 'live-events', 'eventsub-callback', 'hls-playlist'}
+
+# Request headers that describe the batch body or its encoding rather than the sub-request
+_BODY_HEADERS = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_CONTENT_LENGTH', 'HTTP_CONTENT_TYPE',
+                 'HTTP_ACCEPT_ENCODING', 'HTTP_IF_NONE_MATCH')
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'API_BATCH_WORKERS', 16), thread_name_prefix='batch'
+                )
+    return _executor
+
+
+class BatchView(BaseView):
+    """API view running several GET requests against this API concurrently in one round trip
+
+    Body: {"requests": [{"id": "live", "path": "/api/v1/channels/foo/live/", "params": {...}}, ...]}.
+    Helix lookups are shared between the sub-requests, and live checks and user lookups of
+    several channels are combined into one Helix call each.
+    """
+
+    # Sub-requests share this budget, so allow for the slowest route (channel VODs)
+    deadline_seconds = 20.0
+    # Each sub-request is admitted by its own endpoint's controller
+    admission_control = False
+    # Sub-requests are charged at their own endpoints' weights
+    rate_limit_weight = 1
+
+    def post(self, request):
+        """Execute the sub-requests and return their responses in request order"""
+        try:
+            sub_requests = self.parse_sub_requests(request.data)
+
+            token = batching.start()
+            try:
+                self.prefetch(sub_requests)
+                # Each sub-request runs in a copy of this context: same deadline and Helix memo
+                executor = _get_executor()
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self.run_sub_request, request, sub)
+                    for sub in sub_requests
+                ]
+                results = [future.result() for future in futures]
+            finally:
+                batching.reset(token)
+
+            if any(result['stale'] for result in results):
+                mark_stale_served()
+            return Response({'responses': results}, status=status.HTTP_200_OK)
+
+        except TwitchAPIError as e:
+            return self.handle_twitch_api_error(e, 'BatchView')
+        except ValueError as e:
+            return self.handle_validation_error(str(e))
+        except Exception as e:
+            return self.handle_unexpected_error(e, 'BatchView')
+
+    def parse_sub_requests(self, data) -> List[Dict]:
+        """Validate the body and resolve every sub-request to a view; ValueError on bad input"""
+        entries = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(entries, list) or not entries:
+            raise ValueError('Body must contain a non-empty "requests" list')
+        max_requests = getattr(settings, 'API_BATCH_MAX_REQUESTS', 20)
+        if len(entries) > max_requests:
+            raise ValueError(f'At most {max_requests} sub-requests are allowed')
+
+        sub_requests = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not isinstance(entry.get('path'), str):
+                raise ValueError(f'Sub-request {index} needs a "path"')
+            if entry.get('method', 'GET').upper() != 'GET':
+                raise ValueError(f'Sub-request {index}: only GET is supported')
+
+            url = urlsplit(entry['path'])
+            query = QueryDict(url.query, mutable=True)
+            params = entry.get('params') or {}
+            if not isinstance(params, dict):
+                raise ValueError(f'Sub-request {index}: "params" must be an object')
+            for name, value in params.items():
+                query.setlist(name, [str(v) for v in value] if isinstance(value, list) else [str(value)])
+
+            try:
+                match = resolve(url.path)
+            except Resolver404:
+                raise ValueError(f'Sub-request {index}: unknown path {url.path}')
+            if match.url_name in EXCLUDED_ROUTES or match.url_name is None:
+                raise ValueError(f'Sub-request {index}: {url.path} cannot be batched')
+
+            sub_requests.append({
+                'id': entry.get('id', index),
+                'path': url.path,
+                'query': query.urlencode(),
+                'match': match
+            })
+        return sub_requests
+
+    def prefetch(self, sub_requests: List[Dict]) -> None:
+        """Combine the per-channel Helix lookups of several sub-requests into bulk calls"""
+        live_logins = [sub['match'].kwargs['user_login'].strip() for sub in sub_requests
+                       if sub['match'].url_name == 'check-channel-live']
+        user_logins = [sub['match'].kwargs['user_login'].strip() for sub in sub_requests
+                       if sub['match'].url_name == 'get-channel-vods']
+        if len(live_logins) < 2 and len(user_logins) < 2:
+            return
+        try:
+            batching.prefetch_channels(TwitchStreamService(), live_logins, user_logins)
+        except TwitchAPIError as e:
+            # The sub-requests will look the channels up individually and report their own errors
+            logger.warning(f"Batch prefetch failed, falling back to per-channel lookups: {e}")
+
+    def run_sub_request(self, request, sub: Dict) -> Dict:
+        """Dispatch one sub-request to its view and capture the response"""
+        sub_request = HttpRequest()
+        sub_request.method = 'GET'
+        sub_request.path = sub_request.path_info = sub['path']
+        sub_request.META = {k: v for k, v in request._request.META.items() if k not in _BODY_HEADERS}
+        sub_request.META.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': sub['path'], 'QUERY_STRING': sub['query']})
+        sub_request.GET = QueryDict(sub['query'])
+        sub_request.resolver_match = sub['match']
+
+        try:
+            response = sub['match'].func(sub_request, *sub['match'].args, **sub['match'].kwargs)
+            if hasattr(response, 'data'):
+                body = response.data
+            elif response.streaming:
+                # Served from the response cache
+                body = json.loads(b''.join(response.streaming_content) or b'null')
+                response.close()
+            else:
+                body = json.loads(response.content or b'null')
+        except Exception as e:
+            logger.error(f"Unexpected error in batch sub-request {sub['path']}: {e}")
+            return {'id': sub['id'], 'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    'body': {'error': 'Internal server error'}, 'stale': False}
+
+        return {
+            'id': sub['id'],
+            'status': response.status_code,
+            'body': body,
+            'stale': response.has_header('Warning')
+        }
@@ -8,6 +8,8 @@ from ..serializers import CategoryResponseSerializer
 class TopCategoriesView(BaseView):
     """API view for getting top categories"""
     
+    cache_responses = True
+    
     def get(self, request):
         """Get top game categories"""
         try:
@@ -17,12 +19,14 @@ class TopCategoriesView(BaseView):
             
             # Validate parameters
             self.validate_limit(limit)
+            fields = self.get_fields(request, CategoryResponseSerializer)
             
             # Initialize service and fetch data
             twitch_service = TwitchCategoryService()  # Use TwitchCategoryService
             categories, next_cursor = twitch_service.get_top_categories(
                 limit=limit,
-                cursor=cursor
+                cursor=cursor,
+                fields=fields
             )
             
             # Prepare and serialize response
@@ -31,7 +35,7 @@ class TopCategoriesView(BaseView):
                 'pagination': {'cursor': next_cursor}
             }
             
-            serializer = CategoryResponseSerializer(response_data)
+            serializer = CategoryResponseSerializer(response_data, fields=fields)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except TwitchAPIError as e:
@@ -20,6 +20,7 @@ class SearchChannelsView(BaseView):
             # Validate required parameters
             self.validate_query(query)
             self.validate_limit(limit)
+            fields = self.get_fields(request, SearchChannelResponseSerializer)
             
             # Initialize service and fetch data
             twitch_service = TwitchChannelService()  # Use TwitchChannelService
@@ -35,7 +36,7 @@ class SearchChannelsView(BaseView):
                 'pagination': {'cursor': next_cursor}
             }
             
-            serializer = SearchChannelResponseSerializer(response_data)
+            serializer = SearchChannelResponseSerializer(response_data, fields=fields)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except TwitchAPIError as e:
@@ -48,17 +49,23 @@ class SearchChannelsView(BaseView):
 class CheckChannelLiveView(BaseView):
     """API view for checking if a channel is live"""
     
+    cache_responses = True
+    # One Streamlink HLS lookup when the channel is live
+    rate_limit_weight = 2
+    
     def get(self, request, user_login):
         """Check if a specific channel is live"""
         try:
             # Validate user_login parameter
             self.validate_username(user_login)
+            fields = self.get_fields(request, ChannelLiveResponseSerializer)
             
             # Initialize service and fetch data
             twitch_service = TwitchStreamService()  # Use TwitchStreamService
             streams, next_cursor = twitch_service.get_channel_live_stream(
                 user_login=user_login.strip(),
-                limit=1
+                limit=1,
+                fields=fields
             )
             
             # Prepare and serialize response
@@ -67,7 +74,7 @@ class CheckChannelLiveView(BaseView):
                 'pagination': {'cursor': next_cursor}
             }
             
-            serializer = ChannelLiveResponseSerializer(response_data)
+            serializer = ChannelLiveResponseSerializer(response_data, fields=fields)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except TwitchAPIError as e:
@@ -0,0 +1,74 @@
+import json
+import logging
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.response import Response
+from rest_framework import status
+
+from api.services.eventsub import (
+    already_delivered, apply_notification, mark_delivered, mark_revoked, message_too_old, verify_signature
+)
+from .base import BaseView
+
+logger = logging.getLogger(__name__)
+
+class EventSubWebhookView(BaseView):
+    """Receiver for Twitch EventSub webhook deliveries"""
+    
+    # Requests are authenticated by their HMAC signature, not by session or CSRF
+    authentication_classes = []
+    permission_classes = []
+    # Twitch retries and eventually revokes subscriptions whose deliveries fail
+    admission_control = False
+    rate_limit_weight = 0
+    
+    def post(self, request):
+        """Verify, deduplicate and apply one EventSub message"""
+        try:
+            if not settings.EVENTSUB_SECRET:
+                return Response({'error': 'EventSub is not configured'}, status=status.HTTP_404_NOT_FOUND)
+            
+            body = request.body
+            message_id = request.headers.get('Twitch-Eventsub-Message-Id', '')
+            timestamp = request.headers.get('Twitch-Eventsub-Message-Timestamp', '')
+            signature = request.headers.get('Twitch-Eventsub-Message-Signature', '')
+            message_type = request.headers.get('Twitch-Eventsub-Message-Type', '')
+            
+            if not verify_signature(settings.EVENTSUB_SECRET, message_id, timestamp, body, signature):
+                logger.warning(f"Rejected EventSub message {message_id}: bad signature")
+                return Response({'error': 'Invalid signature'}, status=status.HTTP_403_FORBIDDEN)
+            if message_too_old(timestamp):
+                logger.warning(f"Rejected EventSub message {message_id}: timestamp {timestamp} out of range")
+                return Response({'error': 'Message too old'}, status=status.HTTP_403_FORBIDDEN)
+            
+            payload = json.loads(body)
+            subscription = payload.get('subscription', {})
+            
+            if message_type == 'webhook_callback_verification':
+                # Answered every time: Twitch only enables the subscription once it gets the challenge back
+                logger.info(f"Verified EventSub subscription {subscription.get('type')} ({subscription.get('id')})")
+                return HttpResponse(payload['challenge'], content_type='text/plain')
+            if already_delivered(message_id):
+                # Redelivery of a message we already handled; acknowledge so Twitch stops retrying
+                return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+            if message_type == 'revocation':
+                logger.warning(f"EventSub subscription {subscription.get('type')} ({subscription.get('id')}) "
+                               f"revoked: {subscription.get('status')}")
+                broadcaster_id = subscription.get('condition', {}).get('broadcaster_user_id')
+                if broadcaster_id:
+                    mark_revoked(broadcaster_id)
+                mark_delivered(message_id)
+                return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+            if message_type == 'notification':
+                apply_notification(subscription.get('type', ''), payload.get('event', {}))
+                # Only now: a delivery that failed above is applied when Twitch retries it
+                mark_delivered(message_id)
+                return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+            
+            return self.handle_validation_error(f'Unknown message type: {message_type}')
+            
+        except (ValueError, KeyError):
+            return self.handle_validation_error('Malformed EventSub payload')
+        except Exception as e:
+            return self.handle_unexpected_error(e, 'EventSubWebhookView')
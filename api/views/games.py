@@ -20,13 +20,15 @@ class SearchGamesView(BaseView):
             # Validate required parameters
             self.validate_query(query)
             self.validate_limit(limit)
+            fields = self.get_fields(request, SearchGameResponseSerializer)
             
             # Initialize service and fetch data
             twitch_service = TwitchCategoryService()  # Use TwitchCategoryService
             games, next_cursor = twitch_service.get_search_games(
                 query=query,
                 limit=limit,
-                cursor=cursor
+                cursor=cursor,
+                fields=fields
             )
             
             # Prepare and serialize response
@@ -35,7 +37,7 @@ class SearchGamesView(BaseView):
                 'pagination': {'cursor': next_cursor}
             }
             
-            serializer = SearchGameResponseSerializer(response_data)
+            serializer = SearchGameResponseSerializer(response_data, fields=fields)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except TwitchAPIError as e:
@@ -48,6 +50,10 @@ class SearchGamesView(BaseView):
 class GetGameStreamsView(BaseView):
     """API view for getting streams for a specific game"""
     
+    cache_responses = True
+    # Streamlink HLS lookups per stream on a response-cache miss
+    rate_limit_weight = 5
+    
     def get(self, request, game_id):
         """Get live streams for a specific game"""
         try:
@@ -59,13 +65,15 @@ class GetGameStreamsView(BaseView):
             if not game_id or not game_id.strip():
                 raise ValueError('Invalid game ID')
             self.validate_limit(limit)
+            fields = self.get_fields(request, StreamResponseSerializer)
             
             # Initialize service and fetch data
             twitch_service = TwitchStreamService()  # Use TwitchStreamService
             streams, next_cursor = twitch_service.get_game_streams(
                 game_id=game_id.strip(),
                 limit=limit,
-                cursor=cursor
+                cursor=cursor,
+                fields=fields
             )
             
             # Prepare and serialize response
@@ -74,7 +82,7 @@ class GetGameStreamsView(BaseView):
                 'pagination': {'cursor': next_cursor}
             }
             
-            serializer = StreamResponseSerializer(response_data)
+            serializer = StreamResponseSerializer(response_data, fields=fields)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except TwitchAPIError as e:
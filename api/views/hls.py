@@ -0,0 +1,47 @@
+from django.http import HttpResponse
+from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from rest_framework import status
+
+from api.services.errors import TwitchAPIError
+from api.services.hls_proxy import get_hls_proxy
+from .base import BaseView
+from .streams import LOGIN_PATTERN
+from ..renderers import PlaylistRenderer
+
+
+class HLSPlaylistView(BaseView):
+    """Live master/media playlists through the shared manifest proxy (HLS_PROXY_URL)
+
+    master.m3u8 lists the channel's variants under this endpoint; <quality>.m3u8 is that
+    variant's media playlist with segment URIs pointing at the CDN.
+    """
+    
+    renderer_classes = [JSONRenderer, PlaylistRenderer]
+    # Answered from the playlist cache with one coalesced origin fetch per refresh, not queued
+    admission_control = False
+    
+    def get(self, request, user_login, variant):
+        """Serve one playlist of a live channel"""
+        try:
+            # Anything else would cost a full Streamlink resolution just to learn it does not exist
+            if not LOGIN_PATTERN.match(user_login):
+                return self.handle_validation_error('Invalid channel login')
+            proxy = get_hls_proxy()
+            if proxy is None:
+                return Response({'error': 'HLS proxy is not enabled'}, status=status.HTTP_404_NOT_FOUND)
+            
+            body, ttl = proxy.get_playlist(user_login, variant)
+            response = HttpResponse(body, content_type='application/vnd.apple.mpegurl')
+            response['Cache-Control'] = f"public, max-age={max(1, int(ttl))}"
+            return response
+            
+        except TwitchAPIError as e:
+            if e.status_code == 404:
+                # Offline channel, unknown quality or expired playlist: players should stop, not retry
+                return Response({'error': str(e), 'status_code': 404}, status=status.HTTP_404_NOT_FOUND)
+            return self.handle_twitch_api_error(e, 'HLSPlaylistView')
+        except ValueError as e:
+            return self.handle_validation_error(str(e))
+        except Exception as e:
+            return self.handle_unexpected_error(e, 'HLSPlaylistView')
@@ -1,8 +1,14 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import JsonResponse
 from django.views import View
+from api.services import metrics
+from api.services.admission import controller_states
+from api.services.category_stats import get_category_stats
+from api.services.credentials import get_credential_pool
+from api.services.resilience import breaker_states, get_retry_budget
+from ..permissions import IsOperator
 
 class HomeView(View):
     """Home view for the API"""
@@ -17,9 +23,13 @@ class HomeView(View):
                 'streams': '/api/v1/streams/top/',
                 'categories': '/api/v1/categories/top/',
                 'sidebar': '/api/v1/streams/sidebar/',
+                'live_events': '/api/v1/streams/events/',
                 'search_channels': '/api/v1/search/channels/',
                 'search_games': '/api/v1/search/games/',
-                'health': '/api/v1/health/'
+                'batch': '/api/v1/batch/',
+                'health': '/api/v1/health/',
+                'circuits': '/api/v1/health/circuits/',
+                'metrics': '/api/v1/health/metrics/'
             }
         })
 
@@ -32,3 +42,24 @@ def health_check(request):
         'status': 'healthy',
         'message': 'Twitch API service is running'
     }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsOperator])
+def circuit_status(request):
+    """Current state of every upstream circuit breaker"""
+    return Response({
+        'circuits': breaker_states()
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsOperator])
+def metrics_view(request):
+    """Process-local counters (upstream calls, retries, circuit transitions) and admission/credential state"""
+    category_stats = get_category_stats()
+    return Response({
+        'counters': metrics.snapshot(),
+        'retry_budget': round(get_retry_budget().balance, 2),
+        'admission': controller_states(),
+        'credentials': get_credential_pool().status(),
+        'category_stats': category_stats.status() if category_stats is not None else None
+    }, status=status.HTTP_200_OK)
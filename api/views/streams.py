@@ -1,13 +1,31 @@
+import json
+import math
+import re
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
 
+from api.services import metrics
 from api.services.streams import TwitchStreamService  
 from api.services.errors import TwitchAPIError
+from api.services.live_events import AsyncSubscriber, SyncSubscriber, get_hub
 from .base import BaseView
+from ..renderers import EventStreamRenderer
 from ..serializers import StreamResponseSerializer, SidebarResponseSerializer
 
+LOGIN_PATTERN = re.compile(r'^[a-zA-Z0-9_]{1,25}$')
+
 class TopLiveStreamsView(BaseView):
     """API view for getting top live streams"""
+    
+    cache_responses = True
+    # Streamlink HLS lookups per stream on a response-cache miss
+    rate_limit_weight = 5
    
     def get(self, request):
         """Get top live streams"""
@@ -20,6 +38,7 @@ class TopLiveStreamsView(BaseView):
             
             # Validate parameters
             self.validate_limit(limit)
+            fields = self.get_fields(request, StreamResponseSerializer)
             
             # Initialize service and fetch data
             twitch_service = TwitchStreamService()  # Use TwitchStreamService
@@ -28,7 +47,8 @@ class TopLiveStreamsView(BaseView):
                 language=language,
                 game_id=game_id,
                 cursor=cursor,
-                sidebar=False
+                sidebar=False,
+                fields=fields
             )
             
             # Prepare and serialize response
@@ -37,7 +57,7 @@ class TopLiveStreamsView(BaseView):
                 'pagination': {'cursor': next_cursor}
             }
             
-            serializer = StreamResponseSerializer(response_data)
+            serializer = StreamResponseSerializer(response_data, fields=fields)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except TwitchAPIError as e:
@@ -50,6 +70,10 @@ class TopLiveStreamsView(BaseView):
 class SidebarStreamsView(BaseView):
     """API view for getting minimal stream data for sidebar"""
     
+    cache_responses = True
+    # Streamlink HLS lookups per stream on a response-cache miss
+    rate_limit_weight = 5
+    
     def get(self, request):
         """Get sidebar streams with minimal data"""
         try:
@@ -60,6 +84,7 @@ class SidebarStreamsView(BaseView):
             
             # Validate parameters (smaller limit for sidebar)
             self.validate_limit(limit, max_limit=20)
+            fields = self.get_fields(request, SidebarResponseSerializer)
             
             # Initialize service and fetch data
             twitch_service = TwitchStreamService()  # Use TwitchStreamService
@@ -68,7 +93,8 @@ class SidebarStreamsView(BaseView):
                 language=language,
                 game_id=game_id,
                 cursor=None,  # No pagination for sidebar
-                sidebar=True
+                sidebar=True,
+                fields=fields
             )
             
             # Prepare and serialize response
@@ -77,7 +103,7 @@ class SidebarStreamsView(BaseView):
                 'pagination': {'cursor': next_cursor}
             }
             
-            serializer = SidebarResponseSerializer(response_data)
+            serializer = SidebarResponseSerializer(response_data, fields=fields)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except TwitchAPIError as e:
@@ -85,4 +111,97 @@ class SidebarStreamsView(BaseView):
         except ValueError as e:
             return self.handle_validation_error('Invalid parameter values')
         except Exception as e:
-            return self.handle_unexpected_error(e, 'SidebarStreamsView')
\ No newline at end of file
+            return self.handle_unexpected_error(e, 'SidebarStreamsView')
+
+
+class LiveEventsView(BaseView):
+    """Server-Sent Events stream of live state changes from the shared upstream poller
+
+    ?channels=a,b,c follows a channel set (snapshot, online, offline, viewers events),
+    ?game_id=... follows that game's top streams and no parameters follow the overall top
+    list (snapshot, added, removed, viewers events).
+    """
+    
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    # Streams are long-lived and served from the shared poller, not limited per request
+    admission_control = False
+    
+    def get(self, request):
+        """Open an event stream for a channel set, a game or the top list"""
+        try:
+            channels = request.query_params.get('channels')
+            game_id = request.query_params.get('game_id')
+            
+            logins = None
+            if channels:
+                logins = {login.strip().lower() for login in channels.split(',') if login.strip()}
+                max_channels = getattr(settings, 'LIVE_EVENTS_MAX_CHANNELS', 100)
+                if not logins or len(logins) > max_channels:
+                    return self.handle_validation_error(f'channels must list between 1 and {max_channels} logins')
+                if not all(LOGIN_PATTERN.match(login) for login in logins):
+                    return self.handle_validation_error('Invalid channel login')
+                topic = ('channels', None)
+            elif game_id:
+                topic = ('game', game_id)
+            else:
+                topic = ('top', None)
+            
+            if isinstance(request._request, ASGIRequest):
+                stream = self._async_events(topic, logins)
+            elif get_hub().open_sync_stream(getattr(settings, 'LIVE_EVENTS_SYNC_MAX_STREAMS', 2)):
+                stream = self._sync_events(topic, logins)
+            else:
+                metrics.increment('live_events.sync_refused')
+                response = Response(
+                    {'error': 'Live event streams are limited on this server, try again later', 'status_code': 503},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+                response['Retry-After'] = str(math.ceil(getattr(settings, 'LIVE_EVENTS_HEARTBEAT', 15.0)))
+                return response
+            
+            response = StreamingHttpResponse(stream, content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            # Stop nginx from buffering the stream
+            response['X-Accel-Buffering'] = 'no'
+            return response
+            
+        except Exception as e:
+            return self.handle_unexpected_error(e, 'LiveEventsView')
+    
+    @staticmethod
+    def _format_event(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+    
+    def _sync_events(self, topic, logins):
+        """Blocking generator for WSGI workers
+
+        Each client holds a worker thread for up to LIVE_EVENTS_MAX_DURATION, so only
+        LIVE_EVENTS_SYNC_MAX_STREAMS clients per process are admitted (the slot is reserved by
+        get() and released here). Serve many clients through ASGI instead.
+        """
+        hub = get_hub()
+        subscriber = hub.subscribe(SyncSubscriber(topic, logins))
+        heartbeat = getattr(settings, 'LIVE_EVENTS_HEARTBEAT', 15.0)
+        ends = time.monotonic() + getattr(settings, 'LIVE_EVENTS_MAX_DURATION', 600.0)
+        try:
+            yield 'retry: 5000\n\n'
+            while time.monotonic() < ends:
+                item = subscriber.get(heartbeat)
+                yield self._format_event(*item) if item else ': keepalive\n\n'
+        finally:
+            hub.unsubscribe(subscriber)
+            hub.close_sync_stream()
+    
+    async def _async_events(self, topic, logins):
+        """Async generator for ASGI servers; waiting clients cost no thread"""
+        hub = get_hub()
+        subscriber = hub.subscribe(AsyncSubscriber(topic, logins))
+        heartbeat = getattr(settings, 'LIVE_EVENTS_HEARTBEAT', 15.0)
+        ends = time.monotonic() + getattr(settings, 'LIVE_EVENTS_MAX_DURATION', 600.0)
+        try:
+            yield 'retry: 5000\n\n'
+            while time.monotonic() < ends:
+                item = await subscriber.get(heartbeat)
+                yield self._format_event(*item) if item else ': keepalive\n\n'
+        finally:
+            hub.unsubscribe(subscriber)
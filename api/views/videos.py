@@ -9,6 +9,11 @@ from ..serializers import ChannelVODResponseSerializer
 class GetChannelVODsView(BaseView):
     """API view for getting channel VODs"""
     
+    # A channel's first view walks /videos and resolves every VOD through Streamlink
+    deadline_seconds = 20.0
+    # First views make this the most expensive page upstream; repeats come from the VOD store
+    rate_limit_weight = 10
+    
     def get(self, request, user_login):
         """Get VODs for a specific channel"""
         try:
@@ -19,13 +24,15 @@ class GetChannelVODsView(BaseView):
             # Validate parameters
             self.validate_username(user_login)
             self.validate_limit(limit)
+            fields = self.get_fields(request, ChannelVODResponseSerializer)
             
             # Initialize service and fetch data
             twitch_service = TwitchVideoService()  # Use TwitchVideoService
             vods, next_cursor = twitch_service.get_channel_vods(
                 user_login=user_login.strip(),
                 limit=limit,
-                cursor=cursor
+                cursor=cursor,
+                fields=fields
             )
             
             # Prepare and serialize response
@@ -34,7 +41,7 @@ class GetChannelVODsView(BaseView):
                 'pagination': {'cursor': next_cursor}
             }
             
-            serializer = ChannelVODResponseSerializer(response_data)
+            serializer = ChannelVODResponseSerializer(response_data, fields=fields)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except TwitchAPIError as e:
@@ -0,0 +1,122 @@
+"""
+Local stand-in for Twitch's EventSub webhook sender.
+
+Builds and signs deliveries exactly like Twitch does (HMAC-SHA256 over
+message id + timestamp + body) and posts them to the receiver, so cache
+invalidation can be exercised without a public callback URL:
+
+    python -m benchmarks.eventsub_sender --callback http://127.0.0.1:8000/api/v1/eventsub/callback/ \\
+        --secret s3cret offline stub_channel_0
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import requests
+
+EVENT_TYPES = {
+    'online': ('stream.online', '1'),
+    'offline': ('stream.offline', '1'),
+    'update': ('channel.update', '2'),
+}
+
+
+def sign(secret: str, message_id: str, timestamp: str, body: bytes) -> str:
+    digest = hmac.new(secret.encode(), message_id.encode() + timestamp.encode() + body, hashlib.sha256).hexdigest()
+    return f'sha256={digest}'
+
+
+def deliver(callback: str, secret: str, message_type: str, payload: Dict, message_id: Optional[str] = None,
+            timestamp: Optional[str] = None) -> requests.Response:
+    """POST one signed delivery; pass message_id/timestamp to replay or backdate a message"""
+    message_id = message_id or str(uuid.uuid4())
+    timestamp = timestamp or datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    body = json.dumps(payload).encode()
+    headers = {
+        'Content-Type': 'application/json',
+        'Twitch-Eventsub-Message-Id': message_id,
+        'Twitch-Eventsub-Message-Timestamp': timestamp,
+        'Twitch-Eventsub-Message-Signature': sign(secret, message_id, timestamp, body),
+        'Twitch-Eventsub-Message-Type': message_type,
+        'Twitch-Eventsub-Subscription-Type': payload['subscription']['type'],
+    }
+    return requests.post(callback, data=body, headers=headers, timeout=10)
+
+
+def subscription(subscription_type: str, version: str, broadcaster_id: str, callback: str) -> Dict:
+    return {
+        'id': str(uuid.uuid4()),
+        'status': 'enabled',
+        'type': subscription_type,
+        'version': version,
+        'cost': 0,
+        'condition': {'broadcaster_user_id': broadcaster_id},
+        'transport': {'method': 'webhook', 'callback': callback},
+        'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+    }
+
+
+def event_payload(kind: str, login: str, broadcaster_id: str = '0', **fields) -> Dict:
+    """Event body for online/offline/update with the fields Twitch sends"""
+    event = {
+        'broadcaster_user_id': broadcaster_id,
+        'broadcaster_user_login': login,
+        'broadcaster_user_name': login,
+    }
+    if kind == 'online':
+        event.update({'id': str(uuid.uuid4()), 'type': 'live',
+                      'started_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')})
+    elif kind == 'update':
+        event.update({'title': fields.get('title', ''), 'language': fields.get('language', 'en'),
+                      'category_id': fields.get('category_id', ''), 'category_name': fields.get('category_name', ''),
+                      'content_classification_labels': []})
+    return event
+
+
+def send_notification(callback: str, secret: str, kind: str, login: str, broadcaster_id: str = '0',
+                      **fields) -> requests.Response:
+    subscription_type, version = EVENT_TYPES[kind]
+    payload = {
+        'subscription': subscription(subscription_type, version, broadcaster_id, callback),
+        'event': event_payload(kind, login, broadcaster_id, **fields),
+    }
+    return deliver(callback, secret, 'notification', payload)
+
+
+def send_verification(callback: str, secret: str, kind: str = 'online', broadcaster_id: str = '0') -> requests.Response:
+    subscription_type, version = EVENT_TYPES[kind]
+    payload = {
+        'challenge': uuid.uuid4().hex,
+        'subscription': {**subscription(subscription_type, version, broadcaster_id, callback),
+                         'status': 'webhook_callback_verification_pending'},
+    }
+    return deliver(callback, secret, 'webhook_callback_verification', payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send a signed EventSub delivery to a local receiver')
+    parser.add_argument('--callback', required=True)
+    parser.add_argument('--secret', required=True)
+    parser.add_argument('kind', choices=[*EVENT_TYPES, 'verify'])
+    parser.add_argument('login', nargs='?', default='')
+    parser.add_argument('--broadcaster-id', default='0')
+    parser.add_argument('--title', default='')
+    parser.add_argument('--category-id', default='')
+    parser.add_argument('--category-name', default='')
+    args = parser.parse_args()
+
+    if args.kind == 'verify':
+        response = send_verification(args.callback, args.secret, broadcaster_id=args.broadcaster_id)
+    else:
+        response = send_notification(args.callback, args.secret, args.kind, args.login, args.broadcaster_id,
+                                     title=args.title, category_id=args.category_id,
+                                     category_name=args.category_name)
+    print(response.status_code, response.text)
+
+
+if __name__ == '__main__':
+    main()
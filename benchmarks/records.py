@@ -0,0 +1,107 @@
+"""
+Memory benchmark for cached stream rows: Helix dicts versus compact records.
+
+Builds N live streams with the stub's dataset, decoded from JSON page by
+page exactly as the service receives them from Helix, and measures with
+tracemalloc what holding them costs as
+
+* ``formatted``: the response-shaped dicts (~20 keys, three expanded
+  thumbnail URLs) that ``_format_stream_data`` produces,
+* ``helix``: the raw Helix dicts,
+* ``records``: ``StreamRecord`` objects as the snapshot and live caches
+  now hold them.
+
+It also reports the pickled size (what a shared cache backend stores) and
+the cost of turning every row back into the response shape.
+
+    python -m benchmarks.records --streams 100000
+"""
+import argparse
+import gc
+import json
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from .stub_helix import StubConfig, StubState
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def helix_pages(count: int, title_bytes: int) -> List[bytes]:
+    """Helix /streams response bodies, 100 streams per page"""
+    state = StubState(StubConfig(live_streams=count, games=500, pad_bytes=title_bytes))
+    return [
+        json.dumps({'data': state.streams[i:i + 100]}).encode('utf-8')
+        for i in range(0, count, 100)
+    ]
+
+
+def measure(build: Callable[[], List]) -> Dict:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = build()
+    elapsed = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pickled = len(pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+    return {'rows': rows, 'bytes': size, 'build_seconds': elapsed, 'pickled_bytes': pickled}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory per cached stream row by representation')
+    parser.add_argument('--streams', type=int, default=100000)
+    parser.add_argument('--title-bytes', type=int, default=40, help='padding added to every stream title')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'twitchbackend.settings')
+    os.environ.setdefault('TWITCH_CLIENT_ID', 'bench-client')
+    os.environ.setdefault('TWITCH_ACCESS_TOKEN', 'bench-token')
+    sys.path.insert(0, str(ROOT))
+    import django
+    django.setup()
+    from api.services.records import StreamRecord
+
+    pages = helix_pages(args.streams, args.title_bytes)
+    fake_hls = 'https://video-weaver.example.hls.ttvnw.net/v1/playlist/{}.m3u8'
+
+    def helix() -> List[Dict]:
+        return [stream for page in pages for stream in json.loads(page)['data']]
+
+    def records() -> List[StreamRecord]:
+        return [StreamRecord.from_helix(stream) for page in pages for stream in json.loads(page)['data']]
+
+    def formatted() -> List[Dict]:
+        return [
+            StreamRecord.from_helix(stream).to_response(fake_hls.format(stream['id']))
+            for page in pages for stream in json.loads(page)['data']
+        ]
+
+    results = {name: measure(build) for name, build in
+               (('formatted', formatted), ('helix', helix), ('records', records))}
+
+    # Output cost: records back to the response shape (without the HLS lookup)
+    started = time.perf_counter()
+    for record in results['records']['rows']:
+        record.to_response(None)
+    to_response_seconds = time.perf_counter() - started
+
+    print(f"{args.streams} cached streams")
+    print(f"{'representation':<16}{'memory MiB':>12}{'bytes/row':>12}{'pickled MiB':>13}{'build s':>10}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['bytes'] / 2**20:>12.1f}{result['bytes'] / args.streams:>12.0f}"
+              f"{result['pickled_bytes'] / 2**20:>13.1f}{result['build_seconds']:>10.2f}")
+    saving = 1 - results['records']['bytes'] / results['helix']['bytes']
+    print(f"records use {saving:.0%} less memory than Helix dicts and "
+          f"{1 - results['records']['bytes'] / results['formatted']['bytes']:.0%} less than formatted dicts")
+    print(f"to_response for all records: {to_response_seconds:.2f}s "
+          f"({to_response_seconds / args.streams * 1e6:.1f} us/row)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+"""
+Reproducible load benchmark for the API against a stub Helix server.
+
+Starts ``benchmarks.stub_helix`` in-process, boots the Django app under
+gunicorn (WSGI) and/or uvicorn (ASGI) pointed at the stub, then drives
+every route in ``api/urls.py`` at increasing concurrency. For each
+(server, endpoint, concurrency) it reports throughput, p50/p95/p99
+latency, error count, upstream calls per request and RSS per worker.
+
+With ``--record cassette.jsonl.gz`` the app records upstream traffic while
+it runs; ``--replay cassette.jsonl.gz`` serves that traffic back instead of
+the stub, so changes can be compared against identical upstream behaviour.
+``--resolver`` runs HLS resolution in the Streamlink resolver daemon, so
+its effect on upstream Streamlink calls per request can be compared.
+
+Results are written to ``benchmarks/results/<commit>-<timestamp>.json``
+and compared against the previous run (or ``--baseline``) so regressions
+show up between commits.
+
+Usage (from the repository root)::
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --servers wsgi,asgi --concurrency 1,8,32
+"""
+import argparse
+import glob
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+from .stub_helix import StubConfig, start_stub_server
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+PLUGIN_DIR = Path(__file__).resolve().parent / 'streamlink_plugins'
+# Sent with every request so the operator-only routes (circuits, metrics) answer too
+API_KEY = 'bench-key'
+
+# One representative request per named route in api/urls.py
+ENDPOINTS = {
+    'home': '/api/v1/',
+    'health-check': '/api/v1/health/',
+    'circuit-status': '/api/v1/health/circuits/',
+    'metrics': '/api/v1/health/metrics/',
+    'top-live-streams': '/api/v1/streams/top/?limit=10',
+    'top-categories': '/api/v1/categories/top/?limit=10',
+    'sidebar-streams': '/api/v1/streams/sidebar/?limit=5',
+    'search-channels': '/api/v1/search/channels/?query=stub_channel_1',
+    'check-channel-live': '/api/v1/channels/stub_channel_1/live/',
+    'get-channel-vods': '/api/v1/channels/stub_channel_1/vods/?limit=5',
+    'search-games': '/api/v1/search/games/?query=game',
+    'get-game-streams': '/api/v1/games/1001/streams/?limit=5',
+    'hls-playlist': '/api/v1/hls/stub_channel_1/master.m3u8',
+}
+
+# Routes that cannot be driven as plain GET request/response pairs
+EXCLUDED = {
+    'live-events': 'long-lived event stream, not a request/response endpoint',
+    'eventsub-callback': 'signed webhook receiver, exercised with benchmarks.eventsub_sender',
+    'batch': 'POST multiplexer over the routes above',
+}
+
+SERVER_COMMANDS = {
+    'wsgi': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', 'twitchbackend.wsgi:application',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+        '--worker-class', 'gthread', '--threads', '8', '--log-level', 'warning'
+    ],
+    'asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'twitchbackend.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers), '--log-level', 'warning'
+    ],
+}
+
+
+def app_environment(stub_url: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        'DJANGO_SETTINGS_MODULE': 'twitchbackend.settings',
+        'TWITCH_CLIENT_ID': 'bench-client',
+        'TWITCH_CLIENT_SECRET': 'bench-secret',
+        'TWITCH_ACCESS_TOKEN': 'bench-token',
+        'TWITCH_API_BASE_URL': stub_url,
+        'TWITCH_OAUTH_URL': f'{stub_url}/oauth2',
+        'STREAMLINK_PLUGIN_DIRS': str(PLUGIN_DIR),
+        'STUB_HELIX_URL': stub_url,
+        # Only rewrites variant URIs in master playlists; the benchmark fetches the master only
+        'HLS_PROXY_URL': 'http://127.0.0.1/api/v1/hls',
+        'DEBUG': 'False',
+        'ALLOWED_HOSTS': '127.0.0.1,localhost',
+        # The load generator is a single client; per-client limits would cap the measurement
+        'RATELIMIT_RATE': '',
+        'RATELIMIT_API_KEYS': f'{API_KEY}=1000000',
+    })
+    return env
+
+
+def start_resolver(env: Dict[str, str]) -> subprocess.Popen:
+    """Start the Streamlink resolver daemon and point the app at its socket"""
+    socket_path = f'/tmp/twitchback-bench-resolver-{os.getpid()}.sock'
+    env['STREAMLINK_RESOLVER_SOCKET'] = socket_path
+    process = subprocess.Popen([sys.executable, 'manage.py', 'streamlink_resolver'], cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError('Streamlink resolver daemon did not start')
+        time.sleep(0.1)
+    return process
+
+
+def check_route_coverage(env: Dict[str, str]) -> None:
+    """Warn about routes in api/urls.py that the benchmark does not drive"""
+    os.environ.update({k: v for k, v in env.items() if k not in os.environ})
+    sys.path.insert(0, str(ROOT))
+    import django
+    django.setup()
+    from api.urls import urlpatterns
+
+    names = {pattern.name for pattern in urlpatterns if pattern.name}
+    missing = names - ENDPOINTS.keys() - EXCLUDED.keys()
+    for name in sorted(missing):
+        print(f'WARNING: route {name!r} is not covered by the benchmark')
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def rss_per_worker(pid: int) -> List[int]:
+    """RSS in KiB of the server's worker processes (or the server itself if it has none)"""
+    def children(parent: int) -> List[int]:
+        found = []
+        for stat_path in glob.glob('/proc/[0-9]*/stat'):
+            try:
+                with open(stat_path) as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                if int(fields[1]) == parent:
+                    found.append(int(stat_path.split('/')[2]))
+            except (OSError, IndexError, ValueError):
+                continue
+        return found
+
+    def rss(target: int) -> int:
+        try:
+            with open(f'/proc/{target}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    workers = children(pid)
+    return [rss(worker) for worker in workers] or [rss(pid)]
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited early with code {process.returncode}')
+        try:
+            if requests.get(f'{base_url}/api/v1/health/', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('Server did not become ready in time')
+
+
+def drive(url: str, concurrency: int, duration: float) -> Dict:
+    """Hammer one URL from `concurrency` threads for `duration` seconds"""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker():
+        nonlocal errors
+        session = requests.Session()
+        session.headers['X-API-Key'] = API_KEY
+        local_latencies = []
+        local_errors = 0
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=60).status_code < 500
+            except requests.RequestException:
+                ok = False
+            local_latencies.append(time.perf_counter() - started)
+            local_errors += 0 if ok else 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+def run_server(kind: str, args, env: Dict[str, str], stub_state, endpoints: Dict[str, str]) -> List[Dict]:
+    port = args.port
+    process = subprocess.Popen(SERVER_COMMANDS[kind](port, args.workers), cwd=ROOT, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    rows = []
+    try:
+        wait_until_ready(base_url, process)
+        for concurrency in args.concurrency:
+            for name, path in endpoints.items():
+                for _ in range(args.warmup):
+                    requests.get(base_url + path, headers={'X-API-Key': API_KEY}, timeout=60)
+                before = sum(stub_state.calls.values())
+                result = drive(base_url + path, concurrency, args.duration)
+                upstream = sum(stub_state.calls.values()) - before
+                rss = rss_per_worker(process.pid)
+                result.update({
+                    'server': kind,
+                    'endpoint': name,
+                    'concurrency': concurrency,
+                    'upstream_calls_per_request': round(upstream / result['requests'], 3) if result['requests'] else None,
+                    'rss_kib_per_worker': round(sum(rss) / len(rss)),
+                })
+                rows.append(result)
+                print(
+                    f"{kind:5} {name:22} c={concurrency:<4} {result['throughput_rps']:>9} rps  "
+                    f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms  "
+                    f"upstream/req={result['upstream_calls_per_request']}  rss={result['rss_kib_per_worker']}KiB  "
+                    f"errors={result['errors']}"
+                )
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return rows
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print per-row deltas against a baseline; return True if any row regressed"""
+    previous = {(r['server'], r['endpoint'], r['concurrency']): r for r in baseline['rows']}
+    regressed = False
+    print(f"\nComparison against {baseline['commit']} ({baseline['timestamp']}):")
+    for row in current['rows']:
+        old = previous.get((row['server'], row['endpoint'], row['concurrency']))
+        if not old or not old['throughput_rps'] or not old['p95_ms'] or row['p95_ms'] is None:
+            continue
+        rps_delta = (row['throughput_rps'] - old['throughput_rps']) / old['throughput_rps']
+        p95_delta = (row['p95_ms'] - old['p95_ms']) / old['p95_ms']
+        flag = ''
+        if rps_delta < -threshold or p95_delta > threshold:
+            flag = '  <-- REGRESSION'
+            regressed = True
+        print(
+            f"{row['server']:5} {row['endpoint']:22} c={row['concurrency']:<4} "
+            f"rps {rps_delta:+.1%}  p95 {p95_delta:+.1%}{flag}"
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the API against a stub Helix server')
+    parser.add_argument('--servers', default='wsgi,asgi', help='comma separated: wsgi, asgi')
+    parser.add_argument('--concurrency', default='1,4,16,64',
+                        type=lambda v: [int(c) for c in v.split(',')])
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per endpoint and concurrency level')
+    parser.add_argument('--warmup', type=int, default=3, help='unmeasured requests before each measurement')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--endpoints', default='', help='comma separated route names (default: all)')
+    parser.add_argument('--latency-ms', type=float, default=StubConfig.latency_ms)
+    parser.add_argument('--streamlink-latency-ms', type=float, default=StubConfig.streamlink_latency_ms)
+    parser.add_argument('--pad-bytes', type=int, default=StubConfig.pad_bytes)
+    parser.add_argument('--ratelimit-limit', type=int, default=StubConfig.ratelimit_limit)
+    parser.add_argument('--record', help='record upstream traffic from the stub into this cassette')
+    parser.add_argument('--replay', help='serve upstream traffic from this cassette instead of the stub')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='scale recorded latencies during --replay')
+    parser.add_argument('--resolver', action='store_true',
+                        help='resolve HLS URLs through the Streamlink resolver daemon instead of in-process')
+    parser.add_argument('--baseline', help='results file to compare against (default: previous run)')
+    parser.add_argument('--regression-threshold', type=float, default=0.10)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    stub_config = StubConfig(
+        latency_ms=args.latency_ms,
+        streamlink_latency_ms=args.streamlink_latency_ms,
+        pad_bytes=args.pad_bytes,
+        ratelimit_limit=args.ratelimit_limit
+    )
+    stub_server, stub_state = start_stub_server(stub_config)
+    stub_url = f'http://127.0.0.1:{stub_server.server_port}'
+    env = app_environment(stub_url)
+    if args.record or args.replay:
+        env.update({
+            'UPSTREAM_CASSETTE_MODE': 'record' if args.record else 'replay',
+            'UPSTREAM_CASSETTE_PATH': str(Path(args.record or args.replay).resolve()),
+            'UPSTREAM_CASSETTE_LATENCY_SCALE': str(args.latency_scale),
+        })
+    resolver = start_resolver(env) if args.resolver else None
+    check_route_coverage(env)
+
+    selected = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    endpoints = {name: path for name, path in ENDPOINTS.items() if not selected or name in selected}
+
+    rows = []
+    for kind in [s.strip() for s in args.servers.split(',') if s.strip()]:
+        rows += run_server(kind, args, env, stub_state, endpoints)
+    stub_server.shutdown()
+    if resolver is not None:
+        resolver.terminate()
+        resolver.wait(timeout=10)
+
+    result = {
+        'commit': current_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'config': {key: value for key, value in vars(args).items() if key not in ('baseline', 'fail_on_regression')},
+        'rows': rows,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    previous_runs = sorted(RESULTS_DIR.glob('*.json'), key=lambda p: p.stat().st_mtime)
+    out_path = RESULTS_DIR / f"{result['commit']}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    out_path.write_text(json.dumps(result, indent=2))
+    print(f'\nResults written to {out_path}')
+
+    baseline_path = Path(args.baseline) if args.baseline else (previous_runs[-1] if previous_runs else None)
+    if baseline_path and baseline_path.exists():
+        regressed = compare(result, json.loads(baseline_path.read_text()), args.regression_threshold)
+        if regressed and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Startup benchmark: cold import time and memory per process or worker.
+
+Each mode boots the WSGI application and resolves the URLconf in a fresh
+interpreter, several times. It reports median wall time, RSS and whether
+Streamlink was imported. ``--importtime`` prints the slowest modules from
+``python -X importtime``. ``--gunicorn`` starts real gunicorn workers with
+and without ``preload_app`` and reports per-worker RSS and private (unshared)
+memory from /proc/<pid>/smaps_rollup, to show how much copy-on-write sharing
+the preload buys.
+
+    python -m benchmarks.startup --runs 5 --importtime --gunicorn
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import requests
+
+from .run import rss_per_worker, wait_until_ready
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODES = {
+    'default': {},
+    'lean': {'API_LEAN_STARTUP': 'True'},
+    'lean+preload': {'API_LEAN_STARTUP': 'True', 'STREAMLINK_PRELOAD': 'True'},
+}
+
+PROBE = """
+import json, os, sys, time
+started = time.perf_counter()
+from twitchbackend.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - started
+with open('/proc/self/status') as f:
+    rss = int(f.read().split('VmRSS:')[1].split()[0])
+print(json.dumps({'seconds': elapsed, 'rss_kib': rss, 'streamlink': 'streamlink' in sys.modules,
+                  'modules': len(sys.modules)}))
+"""
+
+
+def base_environment() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'twitchbackend.settings')
+    env.setdefault('TWITCH_CLIENT_ID', 'bench-client')
+    env.setdefault('TWITCH_CLIENT_SECRET', 'bench-secret')
+    env.setdefault('TWITCH_ACCESS_TOKEN', 'bench-token')
+    env.setdefault('ALLOWED_HOSTS', '127.0.0.1,localhost')
+    env['PYTHONWARNINGS'] = 'ignore'
+    return env
+
+
+def measure_imports(runs: int) -> List[Dict]:
+    rows = []
+    for mode, overrides in MODES.items():
+        env = {**base_environment(), **overrides}
+        samples = []
+        for _ in range(runs):
+            output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=ROOT, env=env, text=True,
+                                             stderr=subprocess.DEVNULL)
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        row = {
+            'mode': mode,
+            'import_ms_median': round(statistics.median(s['seconds'] for s in samples) * 1000, 1),
+            'rss_kib_median': int(statistics.median(s['rss_kib'] for s in samples)),
+            'modules': samples[-1]['modules'],
+            'streamlink_loaded': samples[-1]['streamlink'],
+        }
+        rows.append(row)
+        print(f"{mode:14} import={row['import_ms_median']}ms rss={row['rss_kib_median']}KiB "
+              f"modules={row['modules']} streamlink={row['streamlink_loaded']}")
+    return rows
+
+
+def slowest_imports(limit: int) -> None:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], cwd=ROOT, env=base_environment(),
+                            capture_output=True, text=True)
+    timings = []
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            try:
+                timings.append((int(cumulative), name.strip()))
+            except ValueError:
+                continue
+    print('\nSlowest imports (cumulative, default mode):')
+    for cumulative, name in sorted(timings, reverse=True)[:limit]:
+        print(f'{cumulative / 1000:9.1f}ms  {name}')
+
+
+def private_kib(pid: int) -> int:
+    """Private (unshared) memory of a process from smaps_rollup"""
+    total = 0
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                    total += int(line.split()[1])
+    except OSError:
+        return 0
+    return total
+
+
+def measure_gunicorn(workers: int, port: int) -> List[Dict]:
+    rows = []
+    for preload in (False, True):
+        env = {**base_environment(), 'API_LEAN_STARTUP': 'True', 'STREAMLINK_PRELOAD': str(preload)}
+        command = [sys.executable, '-m', 'gunicorn', 'twitchbackend.wsgi:application', '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(workers), '--worker-class', 'gthread', '--log-level', 'warning']
+        if preload:
+            command.append('--preload')
+        started = time.monotonic()
+        process = subprocess.Popen(command, cwd=ROOT, env=env)
+        try:
+            wait_until_ready(f'http://127.0.0.1:{port}', process)
+            ready = time.monotonic() - started
+            # Touch every worker so lazily imported modules are loaded where they will be used
+            for _ in range(workers * 4):
+                requests.get(f'http://127.0.0.1:{port}/api/v1/health/', timeout=5)
+            rss = rss_per_worker(process.pid)
+            private = [private_kib(pid) for pid in worker_pids(process.pid)] or [0]
+            row = {
+                'preload': preload,
+                'ready_seconds': round(ready, 2),
+                'rss_kib_per_worker': round(sum(rss) / len(rss)),
+                'private_kib_per_worker': round(sum(private) / len(private)),
+            }
+            rows.append(row)
+            print(f"gunicorn preload={str(preload):5} ready={row['ready_seconds']}s "
+                  f"rss/worker={row['rss_kib_per_worker']}KiB private/worker={row['private_kib_per_worker']}KiB")
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    return rows
+
+
+def worker_pids(parent: int) -> List[int]:
+    pids = []
+    for stat_path in glob.glob('/proc/[0-9]*/stat'):
+        try:
+            with open(stat_path) as f:
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == parent:
+                    pids.append(int(stat_path.split('/')[2]))
+        except (OSError, IndexError, ValueError):
+            continue
+    return pids
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold start import time and memory')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true', help='show the slowest imports')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--gunicorn', action='store_true', help='also measure real gunicorn workers')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    measure_imports(args.runs)
+    if args.importtime:
+        slowest_imports(args.top)
+    if args.gunicorn:
+        print()
+        measure_gunicorn(args.workers, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Fake Streamlink plugin that shadows the built-in ``twitch`` plugin.
+
+Loaded through ``STREAMLINK_PLUGIN_DIRS`` during benchmarks. Instead of
+talking to Twitch's GQL and usher endpoints it asks the stub Helix server
+(``STUB_HELIX_URL``) for a variant map, so resolution latency and call
+counts are controlled by the stub.
+"""
+import os
+import re
+
+from streamlink.plugin import Plugin, pluginmatcher
+from streamlink.stream.hls import HLSStream
+from streamlink.stream.hls.m3u8 import M3U8
+
+
+@pluginmatcher(
+    name='vod',
+    pattern=re.compile(r'https?://(?:[\w-]+\.)?twitch\.tv/videos/(?P<video_id>\d+)'),
+)
+@pluginmatcher(
+    name='live',
+    pattern=re.compile(r'https?://(?:[\w-]+\.)?twitch\.tv/(?P<channel>[^/?]+)/?$'),
+)
+class StubTwitch(Plugin):
+    def _get_streams(self):
+        origin = os.environ.get('STUB_HELIX_URL', 'http://127.0.0.1:8787').rstrip('/')
+        if self.matches['vod']:
+            kind, target = 'vod', self.match['video_id']
+        else:
+            kind, target = 'live', self.match['channel']
+
+        response = self.session.http.get(f'{origin}/__streamlink/{kind}/{target}', raise_for_status=False)
+        if response.status_code != 200:
+            return None
+        # Report the stub's master playlist like the real plugin does, without fetching it here
+        multivariant = M3U8(f'{origin}/hls/{kind}/{target}/master.m3u8')
+        multivariant.is_master = True
+        return {quality: HLSStream(self.session, url, multivariant=multivariant)
+                for quality, url in response.json().items()}
+
+
+__plugin__ = StubTwitch
@@ -0,0 +1,468 @@
+"""
+Local stand-in for the Twitch Helix API used by the benchmark suite.
+
+Serves deterministic synthetic data for every Helix endpoint the services
+call, with configurable latency, page sizes, payload padding and
+Ratelimit-* headers, with one rate-limit bucket per Client-ID as on Twitch. It also answers the fake Streamlink plugin in
+``benchmarks/streamlink_plugins`` and counts every upstream call so the
+runner can report upstream calls per request.
+
+``POST /oauth2/token`` stands in for Twitch's OAuth client-credentials
+endpoint. With ``--require-auth`` Helix calls need a token it issued, and
+``POST /__revoke`` invalidates all issued tokens.
+
+``/eventsub/subscriptions`` keeps EventSub subscriptions in memory (GET,
+POST, DELETE) so the ``eventsub`` management command can run against it;
+deliveries are sent with ``benchmarks.eventsub_sender``.
+
+``/hls/<live|vod>/<target>/master.m3u8`` and ``.../<quality>.m3u8`` act as
+the HLS origin: a master playlist with relative variant URIs and media
+playlists that slide forward every two seconds, for the manifest proxy.
+
+Run standalone with ``python -m benchmarks.stub_helix --port 8787``.
+"""
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    streamlink_latency_ms: float = 300.0
+    live_streams: int = 500
+    games: int = 50
+    vods_per_channel: int = 30
+    max_page_size: int = 100
+    pad_bytes: int = 0
+    ratelimit_limit: int = 800
+    enforce_ratelimit: bool = False
+    token_ttl: int = 3600
+    require_auth: bool = False
+
+
+class StubState:
+    """Synthetic dataset plus call counters shared by all handler threads"""
+
+    LANGUAGES = ['en', 'es', 'de', 'fr', 'pt', 'ja', 'ko', 'ru']
+    QUALITIES = ['1080p60', '720p60', '480p', '360p', '160p']
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.calls: Counter = Counter()
+        self.lock = threading.Lock()
+        # Rate-limit window per Client-ID: [started, used]
+        self.windows: Dict[str, List] = {}
+        self.client_calls: Counter = Counter()
+        self.tokens: Dict[str, float] = {}
+        self.tokens_issued = 0
+        self.subscriptions: Dict[str, Dict] = {}
+        padding = 'x' * config.pad_bytes
+        self.games = [
+            {
+                'id': str(1000 + i),
+                'name': f'Stub Game {i}',
+                'box_art_url': f'https://static-cdn.jtvnw.net/ttv-boxart/{1000 + i}-{{width}}x{{height}}.jpg',
+                'igdb_id': str(5000 + i)
+            }
+            for i in range(config.games)
+        ]
+        self.streams = []
+        for i in range(config.live_streams):
+            game = self.games[i % config.games]
+            login = f'stub_channel_{i}'
+            self.streams.append({
+                'id': str(40000000 + i),
+                'user_id': str(100000 + i),
+                'user_login': login,
+                'user_name': f'Stub_Channel_{i}',
+                'game_id': game['id'],
+                'game_name': game['name'],
+                'type': 'live',
+                'title': f'Stub stream {i} {padding}',
+                'viewer_count': max(1, 100000 - i * 150),
+                'started_at': '2026-01-01T00:00:00Z',
+                'language': self.LANGUAGES[i % len(self.LANGUAGES)],
+                'thumbnail_url': f'https://static-cdn.jtvnw.net/previews-ttv/live_user_{login}-{{width}}x{{height}}.jpg',
+                'tag_ids': [],
+                'tags': ['English', 'Stub'],
+                'is_mature': False
+            })
+        self.users = {
+            stream['user_login']: {
+                'id': stream['user_id'],
+                'login': stream['user_login'],
+                'display_name': stream['user_name'],
+                'type': '',
+                'broadcaster_type': 'partner',
+                'description': f'Stub channel {padding}',
+                'profile_image_url': 'https://static-cdn.jtvnw.net/jtv_user_pictures/stub-profile_image-300x300.png',
+                'offline_image_url': '',
+                'view_count': 0,
+                'created_at': '2020-01-01T00:00:00Z'
+            }
+            for stream in self.streams
+        }
+        self.users_by_id = {user['id']: user for user in self.users.values()}
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.calls[name] += 1
+
+    def issue_token(self) -> Dict:
+        with self.lock:
+            self.tokens_issued += 1
+            token = f'stub-token-{self.tokens_issued}'
+            self.tokens[token] = time.time() + self.config.token_ttl
+        return {'access_token': token, 'expires_in': self.config.token_ttl, 'token_type': 'bearer'}
+
+    def token_valid(self, authorization: Optional[str]) -> bool:
+        if not self.config.require_auth:
+            return True
+        token = (authorization or '').replace('Bearer ', '', 1)
+        with self.lock:
+            return self.tokens.get(token, 0) > time.time()
+
+    def create_subscription(self, body: Dict) -> Tuple[int, Dict]:
+        """Stand-in for EventSub subscription creation; subscriptions are enabled immediately"""
+        with self.lock:
+            for existing in self.subscriptions.values():
+                if existing['type'] == body.get('type') and existing['condition'] == body.get('condition'):
+                    return 409, {'error': 'Conflict', 'status': 409, 'message': 'subscription already exists'}
+            subscription_id = f'stub-sub-{len(self.subscriptions) + 1}'
+            subscription = {
+                'id': subscription_id,
+                'status': 'enabled',
+                'type': body.get('type'),
+                'version': body.get('version'),
+                'condition': body.get('condition', {}),
+                'transport': {'method': 'webhook', 'callback': body.get('transport', {}).get('callback')},
+                'created_at': '2026-01-01T00:00:00Z',
+                'cost': 0
+            }
+            self.subscriptions[subscription_id] = subscription
+        return 202, {'data': [subscription], 'total': len(self.subscriptions), 'total_cost': 0, 'max_total_cost': 10000}
+
+    def ratelimit_headers(self, client_id: str) -> Tuple[Dict[str, str], bool]:
+        """Ratelimit-* headers for the client's one-minute window; second value is True if exhausted"""
+        with self.lock:
+            now = time.time()
+            window = self.windows.get(client_id)
+            if window is None or now - window[0] >= 60:
+                window = self.windows[client_id] = [now, 0]
+            window[1] += 1
+            self.client_calls[client_id] += 1
+            remaining = max(0, self.config.ratelimit_limit - window[1])
+            exhausted = window[1] > self.config.ratelimit_limit
+            headers = {
+                'Ratelimit-Limit': str(self.config.ratelimit_limit),
+                'Ratelimit-Remaining': str(remaining),
+                'Ratelimit-Reset': str(int(window[0] + 60))
+            }
+        return headers, exhausted
+
+    def vods_for(self, user_id: str) -> List[Dict]:
+        user = self.users_by_id.get(user_id)
+        if user is None:
+            return []
+        return [
+            {
+                'id': str(int(user_id) * 1000 + n),
+                'stream_id': None,
+                'user_id': user_id,
+                'user_login': user['login'],
+                'user_name': user['display_name'],
+                'title': f"Past broadcast {n} {'x' * self.config.pad_bytes}",
+                'description': '',
+                'created_at': '2026-01-01T00:00:00Z',
+                'published_at': '2026-01-01T00:00:00Z',
+                'url': f"https://www.twitch.tv/videos/{int(user_id) * 1000 + n}",
+                'thumbnail_url': 'https://static-cdn.jtvnw.net/cf_vods/stub/thumb/thumb0-%{width}x%{height}.jpg',
+                'viewable': 'public',
+                'view_count': 1000 - n,
+                'language': 'en',
+                'type': 'archive',
+                'duration': '3h2m1s',
+                'muted_segments': None
+            }
+            for n in range(self.config.vods_per_channel, 0, -1)
+        ]
+
+
+def _encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({'o': offset}).encode()).decode()
+
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))['o'])
+    except (ValueError, KeyError):
+        return 0
+
+
+def make_handler(state: StubState):
+    config = state.config
+
+    class StubHelixHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            query = parse_qs(parsed.query)
+            path = parsed.path.rstrip('/')
+
+            if path == '/__stats':
+                with state.lock:
+                    calls = dict(state.calls)
+                    by_client = dict(state.client_calls)
+                return self._json(200, {'total': sum(calls.values()), 'by_endpoint': calls, 'by_client': by_client})
+
+            self._sleep(config.latency_ms)
+            route = HELIX_ROUTES.get(path)
+            if route is not None:
+                state.count(path)
+                if not state.token_valid(self.headers.get('Authorization')):
+                    return self._json(401, {'error': 'Unauthorized', 'status': 401, 'message': 'Invalid OAuth token'})
+                headers, exhausted = state.ratelimit_headers(self.headers.get('Client-ID', ''))
+                if exhausted and config.enforce_ratelimit:
+                    return self._json(429, {'error': 'Too Many Requests', 'status': 429,
+                                            'message': 'Stub rate limit exceeded'}, headers)
+                return self._json(200, route(state, query), headers)
+
+            match = re.fullmatch(r'/__streamlink/(live|vod)/([\w-]+)', path)
+            if match:
+                kind, target = match.groups()
+                state.count(f'streamlink:{kind}')
+                self._sleep(config.streamlink_latency_ms - config.latency_ms)
+                if kind == 'live' and target not in state.users:
+                    return self._json(404, {})
+                base = f"http://{self.headers.get('Host')}/hls/{kind}/{target}"
+                return self._json(200, {quality: f'{base}/{quality}.m3u8' for quality in StubState.QUALITIES})
+
+            if re.fullmatch(r'/hls/(live|vod)/[\w-]+/master\.m3u8', path):
+                state.count('hls:master')
+                body = '#EXTM3U\n'
+                for quality in StubState.QUALITIES:
+                    height, fps = re.fullmatch(r'(\d+)p(\d*)', quality).groups()
+                    body += (f'#EXT-X-STREAM-INF:BANDWIDTH={int(height) * 8000},'
+                             f'RESOLUTION={int(height) * 16 // 9}x{height},FRAME-RATE={fps or 30}\n{quality}.m3u8\n')
+                return self._send(200, body.encode(), 'application/vnd.apple.mpegurl')
+
+            match = re.fullmatch(r'/hls/(live|vod)/[\w-]+/(\w+)\.m3u8', path)
+            if match:
+                state.count('hls')
+                if match.group(2) not in StubState.QUALITIES:
+                    return self._json(404, {})
+                # Live playlists slide forward one 2s segment at a time, with segment URIs relative
+                # to the playlist like Twitch's CDN
+                sequence = int(time.time() // 2) if match.group(1) == 'live' else 0
+                body = f'#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:{sequence}\n'
+                body += ''.join(f'#EXTINF:2.000,\nseg{n}.ts\n' for n in range(sequence, sequence + 3))
+                return self._send(200, body.encode(), 'application/vnd.apple.mpegurl')
+
+            return self._json(404, {'error': 'Not Found', 'status': 404, 'message': f'No stub for {path}'})
+
+        def do_POST(self):
+            path = urlparse(self.path).path.rstrip('/')
+            # Drain the body so keep-alive connections stay in sync
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if path == '/eventsub/subscriptions':
+                state.count(path)
+                return self._json(*state.create_subscription(json.loads(body or b'{}')))
+            if path == '/__reset':
+                with state.lock:
+                    state.calls.clear()
+                return self._json(200, {'reset': True})
+            if path == '/__revoke':
+                with state.lock:
+                    state.tokens.clear()
+                return self._json(200, {'revoked': True})
+            if path == '/oauth2/token':
+                # Stand-in for id.twitch.tv client-credentials grants
+                state.count(path)
+                return self._json(200, state.issue_token())
+            return self._json(404, {'error': 'Not Found', 'status': 404})
+
+        def do_DELETE(self):
+            parsed = urlparse(self.path)
+            if parsed.path.rstrip('/') == '/eventsub/subscriptions':
+                state.count('/eventsub/subscriptions')
+                with state.lock:
+                    removed = state.subscriptions.pop(parse_qs(parsed.query).get('id', [''])[0], None)
+                if removed is None:
+                    return self._json(404, {'error': 'Not Found', 'status': 404, 'message': 'subscription not found'})
+                return self._send(204, b'', 'application/json')
+            return self._json(404, {'error': 'Not Found', 'status': 404})
+
+        def _sleep(self, milliseconds: float) -> None:
+            if milliseconds > 0:
+                time.sleep(max(0.0, milliseconds + random.uniform(-config.jitter_ms, config.jitter_ms)) / 1000)
+
+        def _json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+            self._send(status, json.dumps(payload).encode(), 'application/json', headers)
+
+        def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return StubHelixHandler
+
+
+def _page(items: List[Dict], query: Dict, config: StubConfig) -> Dict:
+    first = min(int(query.get('first', ['20'])[0]), config.max_page_size)
+    offset = _decode_cursor(query.get('after', [None])[0])
+    page = items[offset:offset + first]
+    pagination = {'cursor': _encode_cursor(offset + first)} if offset + first < len(items) else {}
+    return {'data': page, 'pagination': pagination}
+
+
+def _streams(state: StubState, query: Dict) -> Dict:
+    streams = state.streams
+    if 'user_login' in query:
+        logins = set(query['user_login'])
+        streams = [s for s in streams if s['user_login'] in logins]
+    if 'user_id' in query:
+        ids = set(query['user_id'])
+        streams = [s for s in streams if s['user_id'] in ids]
+    if 'game_id' in query:
+        games = set(query['game_id'])
+        streams = [s for s in streams if s['game_id'] in games]
+    if 'language' in query:
+        languages = set(query['language'])
+        streams = [s for s in streams if s['language'] in languages]
+    return _page(streams, query, state.config)
+
+
+def _games_top(state: StubState, query: Dict) -> Dict:
+    return _page(state.games, query, state.config)
+
+
+def _search_categories(state: StubState, query: Dict) -> Dict:
+    needle = query.get('query', [''])[0].lower()
+    return _page([g for g in state.games if needle in g['name'].lower()], query, state.config)
+
+
+def _search_channels(state: StubState, query: Dict) -> Dict:
+    needle = query.get('query', [''])[0].lower()
+    channels = [
+        {
+            'id': s['user_id'],
+            'broadcaster_login': s['user_login'],
+            'display_name': s['user_name'],
+            'broadcaster_language': s['language'],
+            'game_id': s['game_id'],
+            'game_name': s['game_name'],
+            'is_live': True,
+            'tags': s['tags'],
+            'thumbnail_url': 'https://static-cdn.jtvnw.net/jtv_user_pictures/stub-profile_image-300x300.png',
+            'title': s['title'],
+            'started_at': s['started_at']
+        }
+        for s in state.streams if needle in s['user_login']
+    ]
+    return _page(channels, query, state.config)
+
+
+def _users(state: StubState, query: Dict) -> Dict:
+    users = [state.users[login] for login in query.get('login', []) if login in state.users]
+    users += [state.users_by_id[i] for i in query.get('id', []) if i in state.users_by_id]
+    return {'data': users}
+
+
+def _videos(state: StubState, query: Dict) -> Dict:
+    if 'id' in query:
+        vods = []
+        for vod_id in query['id']:
+            user_id = str(int(vod_id) // 1000)
+            vods += [v for v in state.vods_for(user_id) if v['id'] == vod_id]
+        return {'data': vods, 'pagination': {}}
+    return _page(state.vods_for(query.get('user_id', [''])[0]), query, state.config)
+
+
+def _eventsub_subscriptions(state: StubState, query: Dict) -> Dict:
+    with state.lock:
+        subscriptions = list(state.subscriptions.values())
+    if 'status' in query:
+        subscriptions = [s for s in subscriptions if s['status'] == query['status'][0]]
+    page = _page(subscriptions, query, state.config)
+    return {**page, 'total': len(subscriptions), 'total_cost': 0, 'max_total_cost': 10000}
+
+
+HELIX_ROUTES = {
+    '/streams': _streams,
+    '/games/top': _games_top,
+    '/search/categories': _search_categories,
+    '/search/channels': _search_channels,
+    '/users': _users,
+    '/videos': _videos,
+    '/eventsub/subscriptions': _eventsub_subscriptions,
+}
+
+
+def start_stub_server(config: StubConfig, host: str = '127.0.0.1', port: int = 0) -> Tuple[ThreadingHTTPServer, StubState]:
+    """Start the stub in a background thread and return the server and its state"""
+    state = StubState(config)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-helix', daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the stub Helix server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency-ms', type=float, default=StubConfig.latency_ms)
+    parser.add_argument('--jitter-ms', type=float, default=StubConfig.jitter_ms)
+    parser.add_argument('--streamlink-latency-ms', type=float, default=StubConfig.streamlink_latency_ms)
+    parser.add_argument('--live-streams', type=int, default=StubConfig.live_streams)
+    parser.add_argument('--max-page-size', type=int, default=StubConfig.max_page_size)
+    parser.add_argument('--pad-bytes', type=int, default=StubConfig.pad_bytes)
+    parser.add_argument('--ratelimit-limit', type=int, default=StubConfig.ratelimit_limit)
+    parser.add_argument('--enforce-ratelimit', action='store_true')
+    parser.add_argument('--token-ttl', type=int, default=StubConfig.token_ttl)
+    parser.add_argument('--require-auth', action='store_true', help='reject Helix calls without a stub-issued token')
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        streamlink_latency_ms=args.streamlink_latency_ms,
+        live_streams=args.live_streams,
+        max_page_size=args.max_page_size,
+        pad_bytes=args.pad_bytes,
+        ratelimit_limit=args.ratelimit_limit,
+        enforce_ratelimit=args.enforce_ratelimit,
+        token_ttl=args.token_ttl,
+        require_auth=args.require_auth
+    )
+    server, _ = start_stub_server(config, args.host, args.port)
+    print(f'Stub Helix listening on http://{args.host}:{server.server_port}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+"""
+Gunicorn settings for production.
+
+The app is loaded once in the master before workers fork. With
+STREAMLINK_PRELOAD on, Streamlink and its Twitch plugin are imported
+there too, so every worker shares those pages copy-on-write instead of
+importing them on its first request.
+
+    gunicorn -c gunicorn.conf.py twitchbackend.wsgi:application
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault('STREAMLINK_PRELOAD', 'True')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = True
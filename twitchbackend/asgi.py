@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'twitchbackend.settings')
 
 application = get_asgi_application()
+
+# Answer response-cache hits on hot GET endpoints without going through Django
+if settings.API_ASGI_FAST_PATH:
+    from .fastpath import FastPathRouter
+    application = FastPathRouter(application)
@@ -0,0 +1,210 @@
+"""
+ASGI fast path for hot cached GET endpoints.
+
+Views with ``cache_responses`` keep their rendered responses in the shared
+response cache. A hit needs none of Django's request handling, middleware,
+or DRF's negotiation, authentication and rendering, so this router answers
+those hits straight from the cache files and hands everything else, misses
+included, to the Django application. Rate limits, ALLOWED_HOSTS and the
+headers the security, clickjacking and CORS middleware would add are
+applied here too; requests it cannot answer identically fall through.
+
+The stream-list generation and rate-limit counters live in Django caches.
+With local-memory caches they are read inline; other backends do network
+I/O, so those lookups run in a worker thread instead of on the event loop.
+"""
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http.request import split_domain_port, validate_host
+from django.urls import Resolver404, resolve
+
+from api.services import metrics, ratelimit
+from api.services.response_cache import get_response_cache
+
+# Remembered path -> view resolutions; cleared when full (paths include channel logins)
+MAX_ROUTES = 10000
+
+
+class ScopeRequest:
+    """The parts of a Django request that rate limiting reads, built from an ASGI scope"""
+
+    def __init__(self, scope: Dict, headers: Dict[str, str]):
+        client = scope.get('client')
+        self.method = scope['method']
+        self.path = scope['path']
+        self.META = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in headers.items()}
+        self.META['REMOTE_ADDR'] = client[0] if client else ''
+
+
+class FastPathRouter:
+    """ASGI application answering response-cache hits itself and passing the rest to `app`"""
+
+    def __init__(self, app):
+        self.app = app
+        self._views: Dict[str, Optional[type]] = {}
+        self._allowed_hosts = list(settings.ALLOWED_HOSTS)
+        if settings.DEBUG and not self._allowed_hosts:
+            self._allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+        self._headers, self._cors, self._cors_origin_headers = self._middleware_headers()
+        self._hsts = self._hsts_header()
+        cache_aliases = {'default', getattr(settings, 'RATELIMIT_USE_CACHE', 'default')}
+        self._caches_in_process = all(isinstance(caches[alias], LocMemCache) for alias in cache_aliases)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET' and not scope.get('root_path'):
+            if await self._serve_cached(scope, send):
+                return
+        await self.app(scope, receive, send)
+
+    async def _serve_cached(self, scope: Dict, send) -> bool:
+        """Send a cached response for the request; False if Django has to handle it"""
+        view_class = self._view_for(scope['path'])
+        if view_class is None:
+            return False
+        response_cache = get_response_cache()
+        if response_cache is None:
+            return False
+
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        # The browsable API renders HTML, and cross-origin rules other than "allow all" stay with Django
+        if 'text/html' in headers.get('accept', '') or ('origin' in headers and self._cors_origin_headers is None):
+            return False
+        if not self._host_allowed(headers) or (settings.SECURE_SSL_REDIRECT and scope.get('scheme') != 'https'):
+            return False
+
+        if self._caches_in_process:
+            found = self._lookup(scope, headers, view_class, response_cache)
+        else:
+            lookup = sync_to_async(self._lookup, thread_sensitive=False)
+            found = await lookup(scope, headers, view_class, response_cache)
+        if found is None:
+            return False
+        key, meta, variant, retry_after = found
+
+        if retry_after:
+            body = json.dumps({'error': 'Rate limit exceeded, slow down', 'status_code': 429}).encode('utf-8')
+            await self._send(send, scope, 429, [('Content-Type', 'application/json'),
+                                                ('Retry-After', str(math.ceil(retry_after)))], body, headers)
+            return True
+
+        if variant is None:
+            await self._send(send, scope, 304, [('ETag', meta['etag'])], b'', headers)
+        else:
+            try:
+                # Entries live on tmpfs and are small; reading them inline beats a thread hop
+                with open(response_cache.variant_path(key, meta, variant), 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                # Replaced by a newer render between reading the metadata and opening the file
+                metrics.increment('response_cache.miss')
+                return False
+            metrics.increment('response_cache.hit')
+            await self._send(send, scope, 200, [('Content-Type', meta['content_type'])] +
+                             response_cache.entry_headers(meta, variant), body, headers)
+        metrics.increment('fastpath.served')
+        return True
+
+    @staticmethod
+    def _lookup(scope: Dict, headers: Dict[str, str], view_class: type,
+                response_cache) -> Optional[Tuple[str, Dict, Optional[str], float]]:
+        """Entry key, metadata and variant of a cache hit plus the rate-limit verdict; None on a miss"""
+        key = response_cache.key_for_path(scope['path'], scope.get('query_string', b'').decode())
+        found = response_cache.negotiate(key, headers.get('if-none-match', ''), headers.get('accept-encoding', ''))
+        if found is None:
+            return None
+        meta, variant = found
+        retry_after = ratelimit.check_request(ScopeRequest(scope, headers), view_class.get_rate_limit_weight())
+        return key, meta, variant, retry_after
+
+    async def _send(self, send, scope: Dict, status: int, response_headers: List[Tuple[str, str]], body: bytes,
+                    headers: Dict[str, str]) -> None:
+        response_headers = response_headers + self._headers
+        if self._hsts and scope.get('scheme') == 'https':
+            response_headers.append(('Strict-Transport-Security', self._hsts))
+        if self._cors:
+            vary = [value for name, value in response_headers if name == 'Vary'] + ['origin']
+            response_headers = [item for item in response_headers if item[0] != 'Vary'] + [('Vary', ', '.join(vary))]
+            if 'origin' in headers:
+                response_headers += self._cors_origin_headers
+        if status != 304:
+            response_headers.append(('Content-Length', str(len(body))))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response_headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    def _view_for(self, path: str) -> Optional[type]:
+        """The view class for a path if its responses are cached, else None"""
+        try:
+            return self._views[path]
+        except KeyError:
+            pass
+        try:
+            view_class = getattr(resolve(path).func, 'view_class', None)
+        except Resolver404:
+            view_class = None
+        if not getattr(view_class, 'cache_responses', False):
+            view_class = None
+        if len(self._views) >= MAX_ROUTES:
+            self._views.clear()
+        self._views[path] = view_class
+        return view_class
+
+    def _host_allowed(self, headers: Dict[str, str]) -> bool:
+        """Django's ALLOWED_HOSTS check; failing requests go to Django for its 400"""
+        host = headers.get('host', '')
+        if settings.USE_X_FORWARDED_HOST and 'x-forwarded-host' in headers:
+            host = headers['x-forwarded-host']
+        domain, _ = split_domain_port(host)
+        return bool(domain) and validate_host(domain, self._allowed_hosts)
+
+    @staticmethod
+    def _middleware_headers() -> Tuple[List[Tuple[str, str]], bool, Optional[List[Tuple[str, str]]]]:
+        """Headers the installed middleware adds to every response
+
+        Returns the fixed headers, whether CORS applies (adding "origin" to Vary) and the headers
+        for requests with an Origin, or None if CORS decisions depend on the origin.
+        """
+        headers = []
+        if 'django.middleware.security.SecurityMiddleware' in settings.MIDDLEWARE:
+            if settings.SECURE_CONTENT_TYPE_NOSNIFF:
+                headers.append(('X-Content-Type-Options', 'nosniff'))
+            if settings.SECURE_REFERRER_POLICY:
+                policy = settings.SECURE_REFERRER_POLICY
+                if not isinstance(policy, str):
+                    policy = ','.join(policy)
+                headers.append(('Referrer-Policy', policy))
+            if settings.SECURE_CROSS_ORIGIN_OPENER_POLICY:
+                headers.append(('Cross-Origin-Opener-Policy', settings.SECURE_CROSS_ORIGIN_OPENER_POLICY))
+        if 'django.middleware.clickjacking.XFrameOptionsMiddleware' in settings.MIDDLEWARE:
+            headers.append(('X-Frame-Options', getattr(settings, 'X_FRAME_OPTIONS', 'DENY').upper()))
+
+        if 'corsheaders.middleware.CorsMiddleware' not in settings.MIDDLEWARE:
+            return headers, False, []
+        from corsheaders.conf import conf
+        if conf.CORS_URLS_REGEX != r'^.*$' or not conf.CORS_ALLOW_ALL_ORIGINS or conf.CORS_ALLOW_CREDENTIALS:
+            return headers, True, None
+        origin_headers = [('Access-Control-Allow-Origin', '*')]
+        if conf.CORS_EXPOSE_HEADERS:
+            origin_headers.append(('Access-Control-Expose-Headers', ', '.join(conf.CORS_EXPOSE_HEADERS)))
+        return headers, True, origin_headers
+
+    @staticmethod
+    def _hsts_header() -> Optional[str]:
+        """Strict-Transport-Security value SecurityMiddleware sends over https, if any"""
+        if 'django.middleware.security.SecurityMiddleware' not in settings.MIDDLEWARE or not settings.SECURE_HSTS_SECONDS:
+            return None
+        value = f"max-age={settings.SECURE_HSTS_SECONDS}"
+        if settings.SECURE_HSTS_INCLUDE_SUBDOMAINS:
+            value += '; includeSubDomains'
+        if settings.SECURE_HSTS_PRELOAD:
+            value += '; preload'
+        return value
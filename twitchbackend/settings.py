@@ -1,12 +1,200 @@
 
 
+import tempfile
 from pathlib import Path
 from decouple import config
 
 # Twitch API Configuration
 TWITCH_CLIENT_ID = config('TWITCH_CLIENT_ID')
-TWITCH_CLIENT_SECRET = config('TWITCH_CLIENT_SECRET')  
-TWITCH_ACCESS_TOKEN = config('TWITCH_ACCESS_TOKEN')
+# With a client secret, app access tokens are obtained and refreshed via the client-credentials
+# flow; TWITCH_ACCESS_TOKEN is only used as a static token when no secret is configured
+TWITCH_CLIENT_SECRET = config('TWITCH_CLIENT_SECRET', default='')
+TWITCH_ACCESS_TOKEN = config('TWITCH_ACCESS_TOKEN', default='')
+# Extra Twitch apps to spread Helix calls over, each with its own rate limit:
+# "client_id:client_secret,client_id:client_secret"
+TWITCH_CREDENTIALS = config(
+    'TWITCH_CREDENTIALS',
+    cast=lambda v: [tuple(s.strip() for s in item.split(':', 1)) for item in v.split(',') if item.strip()],
+    default=''
+)
+# Consecutive authentication failures after which a credential is benched, and for how long
+TWITCH_CREDENTIAL_FAILURE_THRESHOLD = config('TWITCH_CREDENTIAL_FAILURE_THRESHOLD', cast=int, default=3)
+TWITCH_CREDENTIAL_COOLDOWN = config('TWITCH_CREDENTIAL_COOLDOWN', cast=float, default=60.0)
+TWITCH_OAUTH_URL = config('TWITCH_OAUTH_URL', default='https://id.twitch.tv/oauth2')
+# Refresh tokens at least this many seconds before they expire
+TWITCH_TOKEN_REFRESH_MARGIN = config('TWITCH_TOKEN_REFRESH_MARGIN', cast=int, default=300)
+TWITCH_API_BASE_URL = config('TWITCH_API_BASE_URL', default='https://api.twitch.tv/helix')
+# Extra Streamlink plugin directories (comma separated); sideloaded plugins shadow built-in ones
+STREAMLINK_PLUGIN_DIRS = config('STREAMLINK_PLUGIN_DIRS', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()], default='')
+# Unix socket of the Streamlink resolver daemon (manage.py streamlink_resolver). When set,
+# HLS resolution runs there, deduplicated across all web workers, instead of in request threads.
+STREAMLINK_RESOLVER_SOCKET = config('STREAMLINK_RESOLVER_SOCKET', default='')
+STREAMLINK_RESOLVER_WORKERS = config('STREAMLINK_RESOLVER_WORKERS', cast=int, default=2)
+# Seconds the daemon reuses a resolution for repeated requests of the same URL
+STREAMLINK_RESOLVER_RESULT_TTL = config('STREAMLINK_RESOLVER_RESULT_TTL', cast=float, default=5.0)
+# Resolve in-process if the daemon cannot be reached
+STREAMLINK_RESOLVER_FALLBACK = config('STREAMLINK_RESOLVER_FALLBACK', cast=bool, default=True)
+
+# Record/replay of upstream traffic: '' (off), 'record' or 'replay'
+UPSTREAM_CASSETTE_MODE = config('UPSTREAM_CASSETTE_MODE', default='')
+UPSTREAM_CASSETTE_PATH = config('UPSTREAM_CASSETTE_PATH', default=str(Path(__file__).resolve().parent.parent / 'cassettes' / 'upstream.jsonl.gz'))
+# Multiplier for recorded latencies during replay (0 replays instantly)
+UPSTREAM_CASSETTE_LATENCY_SCALE = config('UPSTREAM_CASSETTE_LATENCY_SCALE', cast=float, default=1.0)
+
+# Upstream resilience (circuit breakers, stale fallback, hedged requests)
+TWITCH_CIRCUIT_FAILURE_THRESHOLD = config('TWITCH_CIRCUIT_FAILURE_THRESHOLD', cast=int, default=5)
+TWITCH_CIRCUIT_RECOVERY_TIMEOUT = config('TWITCH_CIRCUIT_RECOVERY_TIMEOUT', cast=float, default=30.0)
+TWITCH_STALE_TTL = config('TWITCH_STALE_TTL', cast=int, default=600)
+# Durable last-known-good store: hot stream lists, top categories, users and live HLS variants are
+# merged into this file every LKG_SAVE_INTERVAL seconds and loaded at startup, so they can be
+# served (marked stale) during an outage even after a restart. Empty disables it.
+LKG_STORE_PATH = config('LKG_STORE_PATH', default=str(Path(__file__).resolve().parent.parent / 'last_known_good.json.gz'))
+LKG_SAVE_INTERVAL = config('LKG_SAVE_INTERVAL', cast=float, default=60.0)
+LKG_MAX_AGE = config('LKG_MAX_AGE', cast=float, default=3600.0)
+LKG_MAX_ENTRIES = config('LKG_MAX_ENTRIES', cast=int, default=2000)
+TWITCH_HEDGED_REQUESTS = config('TWITCH_HEDGED_REQUESTS', cast=bool, default=False)
+TWITCH_HEDGE_MIN_DELAY = config('TWITCH_HEDGE_MIN_DELAY', cast=float, default=0.05)
+TWITCH_HEDGE_MIN_SAMPLES = config('TWITCH_HEDGE_MIN_SAMPLES', cast=int, default=20)
+
+# Retries for idempotent Helix GETs; the budget caps retries at a fraction of all calls
+TWITCH_RETRY_MAX_ATTEMPTS = config('TWITCH_RETRY_MAX_ATTEMPTS', cast=int, default=2)
+TWITCH_RETRY_BASE_DELAY = config('TWITCH_RETRY_BASE_DELAY', cast=float, default=0.2)
+TWITCH_RETRY_MAX_DELAY = config('TWITCH_RETRY_MAX_DELAY', cast=float, default=2.0)
+TWITCH_RETRY_MAX_WAIT = config('TWITCH_RETRY_MAX_WAIT', cast=float, default=5.0)
+TWITCH_RETRY_BUDGET_RATIO = config('TWITCH_RETRY_BUDGET_RATIO', cast=float, default=0.1)
+TWITCH_RETRY_BUDGET_RESERVE = config('TWITCH_RETRY_BUDGET_RESERVE', cast=float, default=10.0)
+
+# Request deadlines: overall budget per request, overridable per view as "ViewName=seconds,..."
+API_DEFAULT_DEADLINE = config('API_DEFAULT_DEADLINE', cast=float, default=15.0)
+API_ENDPOINT_DEADLINES = config(
+    'API_ENDPOINT_DEADLINES',
+    cast=lambda v: {k.strip(): float(t) for k, t in (item.split('=') for item in v.split(',') if item.strip())},
+    default=''
+)
+# Optional enrichment (Streamlink HLS lookups) is skipped once less than this many seconds remain
+API_ENRICHMENT_MIN_BUDGET = config('API_ENRICHMENT_MIN_BUDGET', cast=float, default=3.0)
+
+# Admission control: concurrent requests per view, overridable as "ViewName=limit,...".
+# Past ADMISSION_DEGRADE_RATIO of the limit requests run without HLS enrichment; beyond the
+# limit they wait briefly in a bounded queue, then are served stale data or a 503 with Retry-After.
+ADMISSION_ENABLED = config('ADMISSION_ENABLED', cast=bool, default=True)
+ADMISSION_DEFAULT_LIMIT = config('ADMISSION_DEFAULT_LIMIT', cast=int, default=16)
+ADMISSION_LIMITS = config(
+    'ADMISSION_LIMITS',
+    cast=lambda v: {k.strip(): int(n) for k, n in (item.split('=') for item in v.split(',') if item.strip())},
+    default=''
+)
+ADMISSION_DEGRADE_RATIO = config('ADMISSION_DEGRADE_RATIO', cast=float, default=0.75)
+ADMISSION_QUEUE_SIZE = config('ADMISSION_QUEUE_SIZE', cast=int, default=8)
+ADMISSION_QUEUE_TIMEOUT = config('ADMISSION_QUEUE_TIMEOUT', cast=float, default=1.0)
+ADMISSION_RETRY_AFTER = config('ADMISSION_RETRY_AFTER', cast=int, default=2)
+
+# Inbound rate limits protecting the shared Helix budget: weight units per client and period
+# (e.g. "600/m"; empty, the default, disables them). Views weigh requests by upstream cost,
+# overridable as "ViewName=weight,...". Clients sending a key from RATELIMIT_API_KEYS
+# ("key=limit,...") in RATELIMIT_API_KEY_HEADER get that limit, everyone else is limited per IP.
+# With DEBUG off, the same keys are required for health/circuits/ and health/metrics/.
+# Before enabling: counters live in the RATELIMIT_USE_CACHE cache, which must be shared
+# (Redis/Memcached) for the limits to hold across workers, and behind a reverse proxy
+# RATELIMIT_IP_META_KEY must be set, or every client shares the proxy's address and budget.
+RATELIMIT_RATE = config('RATELIMIT_RATE', default='')
+RATELIMIT_USE_CACHE = config('RATELIMIT_USE_CACHE', default='default')
+RATELIMIT_WEIGHTS = config(
+    'RATELIMIT_WEIGHTS',
+    cast=lambda v: {k.strip(): int(w) for k, w in (item.split('=') for item in v.split(',') if item.strip())},
+    default=''
+)
+RATELIMIT_API_KEY_HEADER = config('RATELIMIT_API_KEY_HEADER', default='HTTP_X_API_KEY')
+RATELIMIT_API_KEYS = config(
+    'RATELIMIT_API_KEYS',
+    cast=lambda v: {k.strip(): int(n) for k, n in (item.split('=') for item in v.split(',') if item.strip())},
+    default=''
+)
+# Behind a reverse proxy, the META key holding the client IP (e.g. HTTP_X_REAL_IP, or
+# HTTP_X_FORWARDED_FOR when the proxy appends to it), or the dotted path of a function(request)
+RATELIMIT_IP_META_KEY = config('RATELIMIT_IP_META_KEY', default='') or None
+
+# Live event streams: one shared poller per process, diffing snapshots every interval
+LIVE_EVENTS_POLL_INTERVAL = config('LIVE_EVENTS_POLL_INTERVAL', cast=float, default=5.0)
+LIVE_EVENTS_TOP_SIZE = config('LIVE_EVENTS_TOP_SIZE', cast=int, default=20)
+LIVE_EVENTS_MAX_CHANNELS = config('LIVE_EVENTS_MAX_CHANNELS', cast=int, default=100)
+LIVE_EVENTS_HEARTBEAT = config('LIVE_EVENTS_HEARTBEAT', cast=float, default=15.0)
+# Streams are closed after this long so clients reconnect and load spreads across workers
+LIVE_EVENTS_MAX_DURATION = config('LIVE_EVENTS_MAX_DURATION', cast=float, default=600.0)
+# Under WSGI every open stream holds a worker thread (gunicorn.conf.py runs 8 per process), so
+# at most this many are served per process and further clients get 503; 0 refuses them all.
+# ASGI streams hold no thread and are not limited.
+LIVE_EVENTS_SYNC_MAX_STREAMS = config('LIVE_EVENTS_SYNC_MAX_STREAMS', cast=int, default=2)
+
+# EventSub webhooks (stream.online, stream.offline, channel.update) invalidate cached live data.
+# The secret signs notifications; the callback is the public URL of eventsub/callback/.
+EVENTSUB_SECRET = config('EVENTSUB_SECRET', default='')
+EVENTSUB_CALLBACK_URL = config('EVENTSUB_CALLBACK_URL', default='')
+# Notifications older than this (seconds) are rejected as possible replays
+EVENTSUB_MAX_MESSAGE_AGE = config('EVENTSUB_MAX_MESSAGE_AGE', cast=int, default=600)
+
+# Cache TTLs for live data. With EventSub pushing changes they can be much longer; several
+# workers need a shared CACHE_BACKEND for one notification to reach all of them.
+STREAM_CACHE_TTL = config('STREAM_CACHE_TTL', cast=int, default=15)
+# Live status of channels with an active EventSub subscription, which are told when they go
+# offline. A channel counts as subscribed for EVENTSUB_SUBSCRIBED_TTL seconds after
+# `manage.py eventsub sync` or its last notification, and stops counting when revoked.
+EVENTSUB_STREAM_CACHE_TTL = config('EVENTSUB_STREAM_CACHE_TTL', cast=int, default=300)
+EVENTSUB_SUBSCRIBED_TTL = config('EVENTSUB_SUBSCRIBED_TTL', cast=int, default=86400)
+STREAM_LIST_CACHE_TTL = config('STREAM_LIST_CACHE_TTL', cast=int, default=60 if EVENTSUB_SECRET else 15)
+HLS_CACHE_TTL = config('HLS_CACHE_TTL', cast=int, default=600 if EVENTSUB_SECRET else 60)
+# Channel VODs are kept per channel (VOD_STORE_TTL seconds after the last change): metadata of
+# archived VODs does not change, so later views only fetch the newest VOD_SYNC_BATCH VODs every
+# VOD_SYNC_INTERVAL seconds, or refresh view counts in bulk every VOD_VIEW_COUNT_TTL seconds.
+# Resolved VOD playlists are cached for VOD_HLS_CACHE_TTL seconds.
+VOD_STORE_TTL = config('VOD_STORE_TTL', cast=int, default=86400)
+VOD_SYNC_INTERVAL = config('VOD_SYNC_INTERVAL', cast=float, default=30.0)
+VOD_SYNC_BATCH = config('VOD_SYNC_BATCH', cast=int, default=5)
+VOD_VIEW_COUNT_TTL = config('VOD_VIEW_COUNT_TTL', cast=float, default=600.0)
+VOD_HLS_CACHE_TTL = config('VOD_HLS_CACHE_TTL', cast=int, default=86400)
+# Live HLS manifest proxy: when set to the public URL of the hls/ endpoint (e.g.
+# https://api.example.com/api/v1/hls), live hls_url values point at it and every playlist is
+# fetched from Twitch once per TTL for all viewers. Segments still go straight to the CDN.
+HLS_PROXY_URL = config('HLS_PROXY_URL', default='')
+HLS_PROXY_MASTER_TTL = config('HLS_PROXY_MASTER_TTL', cast=float, default=30.0)
+# Live media playlists change every segment (about 2s on Twitch); keep this below that
+HLS_PROXY_MEDIA_TTL = config('HLS_PROXY_MEDIA_TTL', cast=float, default=1.0)
+# Stream lists are served from server-held snapshots of the ranked list per (language, game_id):
+# one bulk walk of this many streams (100 per Helix call) serves every limit, the sidebar and
+# later pages. Cursors pin their snapshot, which lives at most STREAM_SNAPSHOT_MAX_AGE seconds.
+STREAM_SNAPSHOT_SIZE = config('STREAM_SNAPSHOT_SIZE', cast=int, default=100)
+STREAM_SNAPSHOT_MAX_AGE = config('STREAM_SNAPSHOT_MAX_AGE', cast=float, default=300.0)
+STREAM_SNAPSHOT_MAX_ENTRIES = config('STREAM_SNAPSHOT_MAX_ENTRIES', cast=int, default=256)
+# categories/top/ adds live viewer totals, stream counts and top languages per game, folded
+# from a background walk of the live streams (100 per Helix call, at most
+# CATEGORY_STATS_MAX_PAGES calls) every CATEGORY_STATS_INTERVAL seconds. Past the page limit
+# only the most watched streams are counted. The walk stops after CATEGORY_STATS_IDLE_TIMEOUT
+# seconds without category requests. 0 disables the totals.
+CATEGORY_STATS_INTERVAL = config('CATEGORY_STATS_INTERVAL', cast=float, default=120.0)
+CATEGORY_STATS_MAX_PAGES = config('CATEGORY_STATS_MAX_PAGES', cast=int, default=100)
+CATEGORY_STATS_TOP_LANGUAGES = config('CATEGORY_STATS_TOP_LANGUAGES', cast=int, default=3)
+CATEGORY_STATS_IDLE_TIMEOUT = config('CATEGORY_STATS_IDLE_TIMEOUT', cast=float, default=900.0)
+# batch/: sub-requests per batch, and threads (shared by all batches) that execute them
+API_BATCH_MAX_REQUESTS = config('API_BATCH_MAX_REQUESTS', cast=int, default=20)
+API_BATCH_WORKERS = config('API_BATCH_WORKERS', cast=int, default=16)
+# Hot list endpoints keep their rendered responses (identity, gzip and, with the optional brotli
+# package, brotli) for this many seconds as files every worker serves directly. Keep the
+# directory on tmpfs (/dev/shm) so the files stay in memory. 0 disables the cache.
+RESPONSE_CACHE_TTL = config('RESPONSE_CACHE_TTL', cast=float, default=5.0)
+RESPONSE_CACHE_DIR = config(
+    'RESPONSE_CACHE_DIR',
+    default='/dev/shm/twitchback-responses' if Path('/dev/shm').is_dir() else str(Path(tempfile.gettempdir()) / 'twitchback-responses')
+)
+# Request profiling: requests carrying an X-Profile header signed with PROFILE_SECRET
+# (manage.py profile_header <path>) or picked at PROFILE_SAMPLE_RATE are stack-sampled every
+# PROFILE_INTERVAL seconds; folded stacks (flamegraph.pl, speedscope) and a per-stage timing
+# summary are written to PROFILE_DIR. Both empty/0 disables profiling entirely.
+PROFILE_SECRET = config('PROFILE_SECRET', default='')
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', cast=float, default=0.0)
+PROFILE_INTERVAL = config('PROFILE_INTERVAL', cast=float, default=0.005)
+PROFILE_DIR = config('PROFILE_DIR', default=str(Path(tempfile.gettempdir()) / 'twitchback-profiles'))
+# Under ASGI, answer response-cache hits from a router in front of Django (twitchbackend/fastpath.py)
+API_ASGI_FAST_PATH = config('API_ASGI_FAST_PATH', cast=bool, default=True)
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -64,6 +252,34 @@ REST_FRAMEWORK = {
 
 }
 
+# Lean startup: a pure JSON proxy never uses admin, sessions, messages, static files,
+# user auth or the browsable API, so skip loading them
+API_LEAN_STARTUP = config('API_LEAN_STARTUP', cast=bool, default=False)
+if API_LEAN_STARTUP:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in {
+        'django.contrib.admin',
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+    }]
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in {
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+    }]
+    REST_FRAMEWORK.update({
+        'DEFAULT_AUTHENTICATION_CLASSES': [],
+        'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+        'UNAUTHENTICATED_USER': None,
+    })
+
+# Import Streamlink during startup instead of on first use. gunicorn.conf.py turns this on
+# so the master loads it once and forked workers share the pages copy-on-write.
+STREAMLINK_PRELOAD = config('STREAMLINK_PRELOAD', cast=bool, default=False)
+
 # CORS settings (if using django-cors-headers)
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development
 # For production, specify allowed origins:
@@ -101,6 +317,17 @@ DATABASES = {
 }
 
 
+# Cache
+# Point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached to share state across workers
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='twitchback'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,8 +1,12 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from .views import root_view
 urlpatterns = [
         path('', root_view, name='root'),
-    path('admin/', admin.site.urls),
     path('api/v1/', include('api.urls')),
-  ]
\ No newline at end of file
+  ]
+
+# Admin is left out in lean startup mode
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns.append(path('admin/', admin.site.urls))